@@ -3,3 +3,18 @@ from django.apps import AppConfig
 
 class CommonConfig(AppConfig):
     name = 'common'
+
+    def ready(self):
+        from django.core.signals import request_started
+
+        from common import invalidation, persisted_queries
+
+        request_started.connect(invalidation.start_listening)
+
+        # Pre-warm the parsed document cache with allowlisted queries
+        if persisted_queries.get_allowlist():
+            from graphene_django.settings import graphene_settings
+
+            persisted_queries.warm_document_cache(
+                graphene_settings.SCHEMA.graphql_schema
+            )
@@ -0,0 +1,337 @@
+"""
+Benchmarks of the GraphQL operations used by the app.
+
+Operations are posted with the test client, so they run through the
+middleware, JWT authentication and the GraphQL view, as the first member
+of the first team of a dataset generated by ``generate_dataset``. The
+response cache is disabled, every execution runs the resolvers.
+
+For every operation the latency percentiles of the timed executions, the
+SQL queries of an execution and the peak of memory traced by tracemalloc
+during an execution are recorded. ``compare`` finds regressions of the
+results against a baseline, see ``python3 manage.py benchmarkgraphql``.
+"""
+
+import datetime
+import json
+import statistics
+import time
+import tracemalloc
+import typing
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connection
+from django.test import Client, override_settings
+from django.utils import timezone
+from graphql_jwt.shortcuts import get_token
+
+from tasks.models import TaskInstance, TaskInstanceCompletion
+from teams.models import Team
+
+# Options of generate_dataset
+DATASETS = {
+    "small": {"teams": 10, "months": 3},
+    "medium": {"teams": 100, "months": 12},
+    "large": {"teams": 1000, "months": 24},
+}
+# Of the generated users, their password and the password of teams
+PREFIX = "benchmark"
+
+# Tail latency of a few dozens of executions is too noisy to be gated
+GATED = ("p50", "queries", "memory")
+# Smaller increases are noise, in milliseconds and bytes
+MIN_INCREASES = {"p50": 1, "queries": 0, "memory": 64 * 1024}
+
+Results = typing.Dict[str, typing.Dict[str, typing.Dict[str, float]]]
+
+
+class Execution(typing.NamedTuple):
+    variables: dict
+    user: typing.Optional[typing.Any] = None  # Anonymous
+
+
+class Context:
+    """The dataset the operations run against."""
+
+    def __init__(self):
+        self.user = get_user_model().objects.get(username=f"{PREFIX}-0-0")
+        self.team = Team.objects.filter(members=self.user).get()
+        self.password = make_password(PREFIX)
+        self.joined = 0
+
+
+class Operation(typing.NamedTuple):
+    name: str
+    query: str
+    # Runs before every execution, outside of the measurement
+    prepare: typing.Callable[[Context], Execution]
+
+
+def team_variables(context: Context) -> Execution:
+    return Execution({"teamId": context.team.id}, context.user)
+
+
+def logged_in(context: Context) -> Execution:
+    return Execution({}, context.user)
+
+
+def points_of_last_month(context: Context) -> Execution:
+    now = timezone.now()
+    return Execution(
+        {
+            "teamId": context.team.id,
+            "from": (now - datetime.timedelta(days=30)).isoformat(),
+            "to": now.isoformat(),
+        },
+        context.user,
+    )
+
+
+def task_instance_to_complete(context: Context) -> Execution:
+    # Completing a recurring task creates its next instance
+    task_instance = (
+        TaskInstance.objects.filter(
+            task__team=context.team,
+            task__is_recurring=True,
+            completed=False,
+            deleted_at=None,
+        )
+        .order_by("id")
+        .first()
+    )
+    return Execution({"taskInstance": task_instance.id}, context.user)
+
+
+def completion_to_revert(context: Context) -> Execution:
+    # Reverts completions submitted by the previous operation first
+    completion = TaskInstanceCompletion.objects.filter(
+        task_instance__task__team=context.team, deleted_at=None
+    ).latest("id")
+    return Execution({"id": completion.id}, context.user)
+
+
+def user_to_join(context: Context) -> Execution:
+    context.joined += 1
+    user = get_user_model().objects.create(
+        username=f"{PREFIX}-joining-{context.joined}", password=context.password
+    )
+    return Execution({"teamId": context.team.id, "password": PREFIX}, user)
+
+
+def credentials(context: Context) -> Execution:
+    return Execution({"username": context.user.username, "password": PREFIX})
+
+
+OPERATIONS = [
+    Operation(
+        "tasks",
+        """query Tasks($teamId: Int!) {
+            tasks(teamId: $teamId) {
+                id name description basePointsPrize refreshInterval isRecurring active
+            }
+        }""",
+        team_variables,
+    ),
+    Operation(
+        "activeTaskInstances",
+        """query ActiveTaskInstances($teamId: Int!) {
+            taskInstances(teamId: $teamId, onlyActive: true) {
+                id activeFrom currentPrize task { id name }
+            }
+        }""",
+        team_variables,
+    ),
+    Operation(
+        "completions",
+        """query Completions($teamId: Int!) {
+            completions(teamId: $teamId) {
+                id createdAt pointsGranted
+                userWhoCompletedTask { id username }
+                taskInstance { id task { id name } }
+            }
+        }""",
+        team_variables,
+    ),
+    Operation(
+        "teamMembersPoints",
+        """query TeamMembersPoints($teamId: Int!) {
+            teamMembersPoints(teamId: $teamId) { member { id username } points }
+        }""",
+        team_variables,
+    ),
+    Operation(
+        "teamMembersPointsOfLastMonth",
+        """query TeamMembersPointsOfLastMonth(
+            $teamId: Int!, $from: DateTime, $to: DateTime
+        ) {
+            teamMembersPoints(teamId: $teamId, fromDatetime: $from, toDatetime: $to) {
+                member { id username } points
+            }
+        }""",
+        points_of_last_month,
+    ),
+    Operation(
+        "dashboard",
+        """query Dashboard {
+            dashboard {
+                team { id name }
+                activeTaskInstances { id activeFrom currentPrize task { id name } }
+                recentCompletions {
+                    id createdAt pointsGranted
+                    userWhoCompletedTask { id username }
+                    taskInstance { id task { id name } }
+                }
+                membersPoints { member { id username } points }
+            }
+        }""",
+        logged_in,
+    ),
+    Operation(
+        "submitTaskInstanceCompletion",
+        """mutation SubmitTaskInstanceCompletion($taskInstance: ID!) {
+            submitTaskInstanceCompletion(input: {taskInstance: $taskInstance}) {
+                errors { field messages }
+                taskInstanceCompletion { id pointsGranted taskInstance { id completed } }
+            }
+        }""",
+        task_instance_to_complete,
+    ),
+    Operation(
+        "revertTaskInstanceCompletion",
+        """mutation RevertTaskInstanceCompletion($id: ID!) {
+            revertTaskInstanceCompletion(id: $id) {
+                errors { field messages }
+                taskInstanceCompletion { id taskInstance { id completed active } }
+            }
+        }""",
+        completion_to_revert,
+    ),
+    Operation(
+        "joinTeam",
+        """mutation JoinTeam($teamId: Int!, $password: String!) {
+            joinTeam(teamId: $teamId, password: $password) { team { id name } }
+        }""",
+        user_to_join,
+    ),
+    Operation(
+        "tokenAuth",
+        """mutation TokenAuth($username: String!, $password: String!) {
+            tokenAuth(username: $username, password: $password) { token }
+        }""",
+        credentials,
+    ),
+]
+
+
+def prepare(operation: Operation, context: Context) -> typing.Tuple[str, dict]:
+    """Returns the body and headers of a request executing the operation."""
+    execution = operation.prepare(context)
+    headers = {}
+    if execution.user is not None:
+        headers["HTTP_AUTHORIZATION"] = f"JWT {get_token(execution.user)}"
+    body = json.dumps({"query": operation.query, "variables": execution.variables})
+    return body, headers
+
+
+def execute(client: Client, operation: Operation, body: str, headers: dict) -> None:
+    response = client.post(
+        "/graphql/", body, content_type="application/json", **headers
+    )
+    result = json.loads(response.content)
+    errors = result.get("errors") or [
+        # Of serializer mutations
+        error
+        for data in (result.get("data") or {}).values()
+        if isinstance(data, dict)
+        for error in data.get("errors") or []
+    ]
+    if response.status_code != 200 or errors:
+        raise RuntimeError(f"{operation.name} failed: {json.dumps(errors)}")
+
+
+def count_query(queries: list):
+    # Unlike CaptureQueriesContext, not limited by the size of the queries log
+    def wrapper(execute, sql, params, many, context):
+        queries.append(sql)
+        return execute(sql, params, many, context)
+
+    return wrapper
+
+
+def measure(
+    client: Client, operation: Operation, context: Context, iterations: int, warmup: int
+) -> typing.Dict[str, float]:
+    """
+    Executes the operation ``warmup`` times counting its SQL queries,
+    ``iterations`` times timing it and once tracing memory allocations.
+    """
+    for _ in range(warmup):
+        request = prepare(operation, context)
+        queries = []
+        with connection.execute_wrapper(count_query(queries)):
+            execute(client, operation, *request)
+
+    latencies = []
+    for _ in range(iterations):
+        request = prepare(operation, context)
+        start = time.perf_counter()
+        execute(client, operation, *request)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    request = prepare(operation, context)
+    tracemalloc.start()
+    try:
+        execute(client, operation, *request)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    percentiles = statistics.quantiles(latencies, n=100, method="inclusive")
+    return {
+        "p50": round(percentiles[49], 3),
+        "p95": round(percentiles[94], 3),
+        "p99": round(percentiles[98], 3),
+        "queries": len(queries),
+        "memory": peak,
+    }
+
+
+def run(iterations: int, warmup: int) -> typing.Dict[str, typing.Dict[str, float]]:
+    """Measures the operations on the generated dataset in the database."""
+    context = Context()
+    client = Client()
+    with override_settings(
+        ALLOWED_HOSTS=["testserver"],
+        DEBUG=False,
+        DATABASE_REPLICAS=[],
+        GRAPHQL_RESPONSE_CACHE={**settings.GRAPHQL_RESPONSE_CACHE, "ACTIVE": False},
+    ):
+        return {
+            operation.name: measure(client, operation, context, iterations, warmup)
+            for operation in OPERATIONS
+        }
+
+
+def compare(baseline: Results, results: Results, tolerance: float) -> typing.List[str]:
+    """
+    Returns regressions of the results against the baseline: more SQL
+    queries, or median latency or memory higher by more than the tolerance
+    (a fraction of the baseline). Operations missing in the baseline are
+    not compared.
+    """
+    regressions = []
+    for dataset, operations in results.items():
+        for name, measured in operations.items():
+            base = baseline.get(dataset, {}).get(name)
+            if base is None:
+                continue
+            for key in GATED:
+                allowed = 0 if key == "queries" else base[key] * tolerance
+                increase = measured[key] - base[key]
+                if increase > max(allowed, MIN_INCREASES[key]):
+                    regressions.append(
+                        f"{dataset} {name}: {key} {base[key]} -> {measured[key]}"
+                    )
+    return regressions
@@ -0,0 +1,72 @@
+"""
+Routing of GraphQL queries to read replicas.
+
+Reads go to the primary database unless they run inside ``use_replicas()``,
+which the GraphQL view uses for query operations. Users who just executed
+a mutation stick to the primary for ``STICKY_SECONDS``, so they see their own
+writes before they reach the replicas. Replicas are configured with
+``DATABASE_REPLICA_URLS``, see homekeeper/settings.py.
+"""
+
+import contextlib
+import contextvars
+import random
+import typing
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+STICKY_KEY = "db-sticky:{}"
+
+_replicas_allowed: contextvars.ContextVar[bool] = contextvars.ContextVar(
+    "replicas_allowed", default=False
+)
+
+
+def get_replicas() -> typing.List[str]:
+    return getattr(settings, "DATABASE_REPLICAS", [])
+
+
+@contextlib.contextmanager
+def use_replicas():
+    """Allows reads in the block to be served by replicas."""
+    token = _replicas_allowed.set(True)
+    try:
+        yield
+    finally:
+        _replicas_allowed.reset(token)
+
+
+def stick_to_primary(user_id: int) -> None:
+    cache.set(
+        STICKY_KEY.format(user_id),
+        True,
+        timeout=settings.DATABASE_REPLICA_ROUTING["STICKY_SECONDS"],
+    )
+
+
+def is_sticky(user_id: int) -> bool:
+    return cache.get(STICKY_KEY.format(user_id)) is not None
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints) -> typing.Optional[str]:
+        replicas = get_replicas()
+        if (
+            not replicas
+            or not _replicas_allowed.get()
+            # Transactions see their own uncommitted writes on the primary only
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return None
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints) -> typing.Optional[str]:
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints) -> typing.Optional[bool]:
+        databases = {DEFAULT_DB_ALIAS, *get_replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
@@ -0,0 +1,193 @@
+"""
+Fast path of hot list fields (``GRAPHQL_FAST_LISTS=True``).
+
+Resolving thousands of DjangoObjectType nodes mostly spends CPU on building
+model instances (and their related instances) and on properties computed
+per node. On the fast path rows are read with ``.values()`` instead, only
+the columns of the selected fields, and passed to graphene as instances of
+the object types themselves, so default resolvers just read attributes.
+
+A ``Shape`` describes which GraphQL fields of a type can be read this way:
+columns, related objects, SQL expressions (e.g. ``active``) and values
+computed from other columns (e.g. ``currentPrize``). When a query selects
+any other field, or uses directives, ``resolve`` returns None and the field
+is resolved with models as usual.
+"""
+
+import typing
+
+from django.conf import settings
+from django.db.models import BooleanField, ExpressionWrapper, Q, QuerySet
+from graphene.utils.str_converters import to_snake_case
+from graphql import GraphQLResolveInfo
+from graphql.language import (
+    FieldNode,
+    FragmentSpreadNode,
+    InlineFragmentNode,
+    SelectionSetNode,
+)
+
+# GraphQL field name -> selected subfields (None for scalars)
+Selection = typing.Dict[str, typing.Optional[dict]]
+
+
+class Shape(typing.NamedTuple):
+    type: type
+    # Attribute -> lookup of the column, relative to the shape
+    columns: typing.Dict[str, str]
+    # Attribute -> (lookup of the relation, shape of the related object)
+    relations: typing.Dict[str, typing.Tuple[str, "Shape"]] = {}
+    # Attribute -> filter of the value at a lookup prefix, evaluated in SQL
+    conditions: typing.Dict[str, typing.Callable[[str], Q]] = {}
+    # Attribute -> (lookups of the arguments, function computing the value)
+    computed: typing.Dict[
+        str, typing.Tuple[typing.Tuple[str, ...], typing.Callable[..., typing.Any]]
+    ] = {}
+
+
+def is_active() -> bool:
+    return getattr(settings, "GRAPHQL_FAST_LISTS", {}).get("ACTIVE", False)
+
+
+def get_selection(
+    selection_set: SelectionSetNode, info: GraphQLResolveInfo
+) -> typing.Optional[Selection]:
+    """Returns selected fields, merged from fragments, None with directives."""
+    selection: Selection = {}
+    for node in selection_set.selections:
+        if node.directives:
+            return None
+        if isinstance(node, FieldNode):
+            if node.name.value == "__typename":
+                continue
+            subselection = None
+            if node.selection_set is not None:
+                subselection = get_selection(node.selection_set, info)
+                if subselection is None:
+                    return None
+            merge(selection, {node.name.value: subselection})
+            continue
+        if isinstance(node, FragmentSpreadNode):
+            node = info.fragments[node.name.value]
+        elif not isinstance(node, InlineFragmentNode):
+            return None
+        fragment_selection = get_selection(node.selection_set, info)
+        if fragment_selection is None:
+            return None
+        merge(selection, fragment_selection)
+    return selection
+
+
+def merge(selection: Selection, other: Selection) -> None:
+    for name, subselection in other.items():
+        if isinstance(selection.get(name), dict) and subselection is not None:
+            merge(selection[name], subselection)
+        else:
+            selection[name] = subselection
+
+
+class Plan:
+    """Columns and annotations to read, and how to build objects of rows."""
+
+    def __init__(self):
+        self.lookups: typing.List[str] = []
+        self.annotations: typing.Dict[str, ExpressionWrapper] = {}
+
+    def add(self, shape: Shape, selection: Selection, prefix: str = ""):
+        """
+        Returns a function building the object of a row, None when a selected
+        field is not in the shape.
+        """
+        builders = []
+        for name, subselection in selection.items():
+            attribute = to_snake_case(name)
+            if attribute in shape.columns and subselection is None:
+                builders.append(
+                    self.column(attribute, prefix + shape.columns[attribute])
+                )
+            elif attribute in shape.relations and subselection is not None:
+                lookup, related_shape = shape.relations[attribute]
+                build = self.add(related_shape, subselection, f"{prefix}{lookup}__")
+                if build is None:
+                    return None
+                builders.append(self.relation(attribute, build))
+            elif attribute in shape.conditions and subselection is None:
+                alias = f"_fast_{prefix.replace('__', '_')}{attribute}"
+                self.annotations[alias] = ExpressionWrapper(
+                    shape.conditions[attribute](prefix), output_field=BooleanField()
+                )
+                builders.append(self.column(attribute, alias))
+            elif attribute in shape.computed and subselection is None:
+                lookups, function = shape.computed[attribute]
+                keys = [prefix + lookup for lookup in lookups]
+                self.lookups.extend(keys)
+                builders.append(self.computed_value(attribute, keys, function))
+            else:
+                return None
+
+        object_type = shape.type
+
+        def build(row: dict):
+            # Attributes of unselected fields are never read, skips __init__
+            node = object_type.__new__(object_type)
+            for builder in builders:
+                builder(row, node.__dict__)
+            return node
+
+        return build
+
+    def column(self, attribute: str, key: str):
+        if key not in self.annotations:
+            self.lookups.append(key)
+
+        # DjangoObjectType resolves id from pk
+        attributes = ("id", "pk") if attribute == "id" else (attribute,)
+
+        def build(row: dict, values: dict):
+            value = row[key]
+            for name in attributes:
+                values[name] = value
+
+        return build
+
+    @staticmethod
+    def relation(attribute: str, build_related):
+        def build(row: dict, values: dict):
+            values[attribute] = build_related(row)
+
+        return build
+
+    @staticmethod
+    def computed_value(attribute: str, keys: typing.List[str], function):
+        def build(row: dict, values: dict):
+            values[attribute] = function(*(row[key] for key in keys))
+
+        return build
+
+
+def resolve(
+    info: GraphQLResolveInfo, queryset: QuerySet, shape: Shape
+) -> typing.Optional[list]:
+    """
+    Returns objects of the shape's type for rows of the queryset, read with
+    values(), or None when the fast path is off or can't serve the selection.
+    """
+    if not is_active():
+        return None
+    selection: Selection = {}
+    for field_node in info.field_nodes:
+        if field_node.selection_set is None:
+            return None
+        field_selection = get_selection(field_node.selection_set, info)
+        if field_selection is None:
+            return None
+        merge(selection, field_selection)
+
+    plan = Plan()
+    build = plan.add(shape, selection)
+    if build is None:
+        return None
+    rows = queryset.annotate(**plan.annotations).values(
+        *dict.fromkeys(plan.lookups), *plan.annotations
+    )
+    return [build(row) for row in rows]
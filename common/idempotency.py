@@ -0,0 +1,148 @@
+"""
+Idempotency keys for mutations.
+
+Mobile clients retry requests on flaky connections, which must not complete
+a task twice. A mutation sent with an ``Idempotency-Key`` header (or
+``extensions.idempotencyKey``) is executed once per user and key, retries
+get the stored response. Only responses of mutations that committed without
+errors are stored, keys of failed ones are released. A key claimed by a
+request that never finished (e.g. a crashed worker) can be claimed again
+after ``GRAPHQL_IDEMPOTENCY["LEASE"]`` seconds. Keys expire after
+``GRAPHQL_IDEMPOTENCY["TTL"]`` seconds and are removed by
+``python manage.py purgeidempotencykeys``.
+"""
+
+import datetime
+import hashlib
+import json
+import typing
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from common.models import IdempotencyKey
+
+IDEMPOTENCY_KEY_HEADER = "HTTP_IDEMPOTENCY_KEY"
+MAX_KEY_LENGTH = IdempotencyKey._meta.get_field("key").max_length
+
+
+class IdempotencyKeyError(Exception):
+    status_code = 400
+
+
+class IdempotencyKeyInProgress(IdempotencyKeyError):
+    status_code = 409
+
+    def __init__(self):
+        super().__init__("A request with this Idempotency-Key is in progress.")
+
+
+class IdempotencyKeyMismatch(IdempotencyKeyError):
+    status_code = 422
+
+    def __init__(self):
+        super().__init__("Idempotency-Key was used with a different request.")
+
+
+class Replay(Exception):
+    """Raised to answer with the stored response instead of executing."""
+
+    def __init__(self, record: IdempotencyKey):
+        super().__init__()
+        self.record = record
+
+
+def get_ttl() -> datetime.timedelta:
+    return datetime.timedelta(
+        seconds=getattr(settings, "GRAPHQL_IDEMPOTENCY", {}).get("TTL", 24 * 60 * 60)
+    )
+
+
+def get_lease() -> datetime.timedelta:
+    return datetime.timedelta(
+        seconds=getattr(settings, "GRAPHQL_IDEMPOTENCY", {}).get("LEASE", 60)
+    )
+
+
+def get_key(request, extensions: dict) -> typing.Optional[str]:
+    key = request.META.get(IDEMPOTENCY_KEY_HEADER) or extensions.get("idempotencyKey")
+    if key is None:
+        return None
+    if not isinstance(key, str) or not 0 < len(key) <= MAX_KEY_LENGTH:
+        raise ValueError(
+            f"Idempotency-Key must be a string of at most {MAX_KEY_LENGTH} characters."
+        )
+    return key
+
+
+def get_request_hash(
+    query: str, variables: typing.Optional[dict], operation_name: typing.Optional[str]
+) -> str:
+    payload = json.dumps([query, variables or {}, operation_name], sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def claim(user_id: int, key: str, request_hash: str) -> IdempotencyKey:
+    """
+    Returns the record of the given key, a new one (without a response)
+    if the key was not used yet.
+
+    Raises:
+        Replay: when the request was already executed.
+        IdempotencyKeyInProgress: when the first request did not finish yet
+            and its lease did not run out.
+        IdempotencyKeyMismatch: when the key was used with a different request.
+    """
+    now = timezone.now()
+    IdempotencyKey.objects.filter(user=user_id, key=key).filter(
+        Q(expires_at__lte=now) | Q(response=None, created_at__lte=now - get_lease())
+    ).delete()
+    try:
+        # Savepoint, so the unique constraint decides between concurrent requests
+        with transaction.atomic():
+            return IdempotencyKey.objects.create(
+                user_id=user_id,
+                key=key,
+                request_hash=request_hash,
+                expires_at=now + get_ttl(),
+            )
+    except IntegrityError:
+        record = IdempotencyKey.objects.get(user=user_id, key=key)
+
+    if record.request_hash != request_hash:
+        raise IdempotencyKeyMismatch()
+    if record.response is None:
+        raise IdempotencyKeyInProgress()
+    raise Replay(record)
+
+
+def store(record: IdempotencyKey, response: str, status_code: int) -> None:
+    """Stores the response, unless the key was claimed again meanwhile."""
+    IdempotencyKey.objects.filter(id=record.id, response=None).update(
+        response=response, status_code=status_code
+    )
+
+
+def release(record: IdempotencyKey) -> None:
+    """Frees the key of a request that failed without a response."""
+    record.delete()
+
+
+def purge_expired(batch_size: int = 1000) -> int:
+    """
+    Deletes expired keys in batches, so the table is not locked for long.
+    Returns the number of deleted keys.
+    """
+    now = timezone.now()
+    deleted = 0
+    while True:
+        ids = list(
+            IdempotencyKey.objects.filter(expires_at__lte=now).values_list(
+                "id", flat=True
+            )[:batch_size]
+        )
+        if not ids:
+            return deleted
+        deleted += IdempotencyKey.objects.filter(id__in=ids).delete()[0]
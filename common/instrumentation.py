@@ -0,0 +1,231 @@
+"""
+Timing and SQL query counts of GraphQL operations and resolvers.
+
+The GraphQL view measures every operation with ``measure_operation`` and
+``InstrumentationMiddleware`` attributes the time of resolvers and the SQL
+queries they run to their fields (e.g. ``Query.completions``,
+``TaskInstanceType.currentPrize``). Fields are aggregated per operation, so
+a list of a thousand task instances adds one observation of
+``TaskInstanceType.currentPrize`` rather than a thousand. Queries run
+outside of resolvers, e.g. when lazy querysets returned by resolvers are
+iterated, count for the operation only. The numbers are exposed by the
+metrics endpoint and recorded only when it is enabled (``METRICS_TOKEN``).
+When the slow operation log is enabled, SQL statements are captured too and
+operations over its threshold are logged (see common/slow_log.py). When
+memory profiling is enabled, memory allocated by resolvers is counted too
+(see common/memory_profiling.py). The view adds the middleware only when
+one of them is enabled, so resolvers are not wrapped otherwise.
+"""
+
+import contextlib
+import contextvars
+import time
+import tracemalloc
+import typing
+
+from django.conf import settings
+from django.db import connections
+from graphql import OperationDefinitionNode
+
+from common import memory_profiling, metrics, slow_log
+
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+operation_duration = metrics.Histogram(
+    "homekeeper_graphql_operation_duration_seconds",
+    "Execution time of GraphQL operations.",
+    ["operation", "type"],
+)
+operation_queries = metrics.Histogram(
+    "homekeeper_graphql_operation_sql_queries",
+    "SQL queries of GraphQL operations.",
+    ["operation", "type"],
+    buckets=QUERY_BUCKETS,
+)
+operation_sql_duration = metrics.Histogram(
+    "homekeeper_graphql_operation_sql_seconds",
+    "Time of SQL queries of GraphQL operations.",
+    ["operation", "type"],
+)
+field_duration = metrics.Histogram(
+    "homekeeper_graphql_field_duration_seconds",
+    "Time spent in resolvers of the field per operation.",
+    ["field"],
+)
+field_calls = metrics.Counter(
+    "homekeeper_graphql_field_calls_total",
+    "Calls of resolvers of the field.",
+    ["field"],
+)
+field_queries = metrics.Counter(
+    "homekeeper_graphql_field_sql_queries_total",
+    "SQL queries run by resolvers of the field.",
+    ["field"],
+)
+field_allocated = metrics.Counter(
+    "homekeeper_graphql_field_allocated_bytes_total",
+    "Memory allocated by resolvers of the field and in use when they return.",
+    ["field"],
+)
+field_sql_duration = metrics.Counter(
+    "homekeeper_graphql_field_sql_seconds_total",
+    "Time of SQL queries run by resolvers of the field.",
+    ["field"],
+)
+
+
+class FieldStats:
+    __slots__ = ("name", "calls", "duration", "queries", "sql_duration", "allocated")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.calls = 0
+        self.duration = 0.0
+        self.queries = 0
+        self.sql_duration = 0.0
+        self.allocated = 0
+
+
+class OperationRecorder:
+    def __init__(self, capture_statements: bool = False, trace_memory: bool = False):
+        self.trace_memory = trace_memory
+        self.statements: typing.Optional[typing.List[slow_log.Statement]] = (
+            [] if capture_statements else None
+        )
+        self.queries = 0
+        self.sql_duration = 0.0
+        self.fields: typing.Dict[str, FieldStats] = {}
+        self.current_field: typing.Optional[FieldStats] = None
+
+    def get_field(self, name: str) -> FieldStats:
+        stats = self.fields.get(name)
+        if stats is None:
+            stats = self.fields[name] = FieldStats(name)
+        return stats
+
+    def __call__(self, execute, sql, params, many, context):
+        """Database execute wrapper counting queries."""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.queries += 1
+            self.sql_duration += duration
+            field = self.current_field
+            if field is not None:
+                field.queries += 1
+                field.sql_duration += duration
+            if self.statements is not None:
+                self.statements.append(
+                    slow_log.Statement(
+                        sql,
+                        params,
+                        duration,
+                        context["connection"].alias,
+                        field.name if field is not None else None,
+                    )
+                )
+
+
+_recorder: contextvars.ContextVar[typing.Optional[OperationRecorder]] = (
+    contextvars.ContextVar("instrumentation_recorder", default=None)
+)
+
+
+def is_active() -> bool:
+    return bool(settings.METRICS["TOKEN"])
+
+
+def is_measuring() -> bool:
+    """Tells whether operations are measured, for metrics or any of the logs."""
+    return (
+        is_active()
+        or slow_log.get_threshold() is not None
+        or memory_profiling.is_active()
+    )
+
+
+def get_operation_labels(
+    operation_ast: typing.Optional[OperationDefinitionNode],
+    operation_name: typing.Optional[str],
+) -> metrics.Labels:
+    if operation_ast is None:
+        return {"operation": "_unknown", "type": "_unknown"}
+    if operation_name is None and operation_ast.name is not None:
+        operation_name = operation_ast.name.value
+    return {
+        "operation": operation_name or "_anonymous",
+        "type": operation_ast.operation.value,
+    }
+
+
+@contextlib.contextmanager
+def measure_operation(
+    operation_ast: typing.Optional[OperationDefinitionNode],
+    operation_name: typing.Optional[str],
+    variables: typing.Optional[dict] = None,
+):
+    threshold = slow_log.get_threshold()
+    trace_memory = memory_profiling.is_active()
+    if not is_active() and threshold is None and not trace_memory:
+        yield
+        return
+
+    labels = get_operation_labels(operation_ast, operation_name)
+    recorder = OperationRecorder(
+        capture_statements=threshold is not None, trace_memory=trace_memory
+    )
+    token = _recorder.set(recorder)
+    start = time.perf_counter()
+    try:
+        with contextlib.ExitStack() as stack:
+            if trace_memory:
+                stack.enter_context(memory_profiling.measure(labels))
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(recorder))
+            yield
+    finally:
+        duration = time.perf_counter() - start
+        _recorder.reset(token)
+        if is_active():
+            record(labels, duration, recorder)
+        if threshold is not None and duration >= threshold:
+            slow_log.log_operation(labels, variables, duration, recorder.statements)
+
+
+def record(labels: metrics.Labels, duration: float, recorder: OperationRecorder):
+    operation_duration.observe(duration, **labels)
+    operation_queries.observe(recorder.queries, **labels)
+    operation_sql_duration.observe(recorder.sql_duration, **labels)
+    for name, stats in recorder.fields.items():
+        field_duration.observe(stats.duration, field=name)
+        field_calls.inc(stats.calls, field=name)
+        field_queries.inc(stats.queries, field=name)
+        field_sql_duration.inc(stats.sql_duration, field=name)
+        if recorder.trace_memory:
+            field_allocated.inc(stats.allocated, field=name)
+
+
+class InstrumentationMiddleware:
+    """Graphene middleware measuring resolvers of operations being measured."""
+
+    def resolve(self, next, root, info, **args):
+        recorder = _recorder.get()
+        if recorder is None:
+            return next(root, info, **args)
+
+        stats = recorder.get_field(f"{info.parent_type.name}.{info.field_name}")
+        parent_field = recorder.current_field
+        recorder.current_field = stats
+        if recorder.trace_memory:
+            memory, _ = tracemalloc.get_traced_memory()
+        start = time.perf_counter()
+        try:
+            return next(root, info, **args)
+        finally:
+            stats.calls += 1
+            stats.duration += time.perf_counter() - start
+            if recorder.trace_memory:
+                stats.allocated += tracemalloc.get_traced_memory()[0] - memory
+            recorder.current_field = parent_field
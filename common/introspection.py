@@ -0,0 +1,72 @@
+"""
+In-memory cache of introspection (``__schema``/``__type``) results.
+
+Tools like GraphiQL or Flutter Artemis codegen send introspection queries
+often, while the answer only changes together with the schema object.
+Results are kept per schema object, so replacing the schema invalidates them.
+Least recently used results are evicted beyond as many documents as the
+parse_and_validate cache keeps, clients can't grow the cache without bound.
+"""
+import collections
+import json
+import threading
+import typing
+import weakref
+
+from graphql import ExecutionResult, GraphQLSchema, OperationType
+from graphql.language import FieldNode, OperationDefinitionNode
+
+from common import persisted_queries
+
+INTROSPECTION_FIELDS = {"__schema", "__type", "__typename"}
+MAX_RESULTS = persisted_queries.parse_and_validate.cache_parameters()["maxsize"]
+
+_cache: "weakref.WeakKeyDictionary[GraphQLSchema, collections.OrderedDict]" = (
+    weakref.WeakKeyDictionary()
+)
+_lock = threading.Lock()
+
+
+def is_introspection(operation_ast: typing.Optional[OperationDefinitionNode]) -> bool:
+    """Tells whether the operation selects introspection fields only."""
+    if operation_ast is None or operation_ast.operation != OperationType.QUERY:
+        return False
+    selections = operation_ast.selection_set.selections
+    return bool(selections) and all(
+        isinstance(selection, FieldNode)
+        and selection.name.value in INTROSPECTION_FIELDS
+        for selection in selections
+    )
+
+
+def get_or_execute(
+    schema: GraphQLSchema,
+    query: str,
+    operation_name: typing.Optional[str],
+    variables: typing.Optional[dict],
+    execute: typing.Callable[[], ExecutionResult],
+) -> ExecutionResult:
+    """
+    Returns the cached introspection result, calls ``execute`` on a miss.
+    Results with errors are not cached.
+    """
+    key = (query, operation_name, json.dumps(variables or {}, sort_keys=True))
+    with _lock:
+        results = _cache.setdefault(schema, collections.OrderedDict())
+        result = results.get(key)
+        if result is not None:
+            results.move_to_end(key)
+            return result
+
+    result = execute()
+    if not result.errors:
+        with _lock:
+            results[key] = result
+            if len(results) > MAX_RESULTS:
+                results.popitem(last=False)
+    return result
+
+
+def clear() -> None:
+    with _lock:
+        _cache.clear()
@@ -0,0 +1,177 @@
+"""
+Invalidation of process-local caches across workers.
+
+With the local memory cache every worker keeps its own team and membership
+versions (see teams/versions.py), so a write handled by one worker would
+not invalidate responses cached by the others. Committed invalidations are
+broadcast on a bus and every worker runs the handler registered for their
+kind, e.g. bumps its local versions. The bus is selected with
+``CACHE_INVALIDATION["BACKEND"]``:
+
+- ``LocalBus`` (default) for a single worker or a cache shared by workers,
+- ``PostgresBus`` broadcasts with LISTEN/NOTIFY,
+- ``PollingBus`` stores invalidations in a table polled by every worker,
+  for SQLite.
+"""
+
+import datetime
+import functools
+import json
+import logging
+import threading
+import time
+import typing
+import uuid
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from common import listen_notify
+from common.models import CacheInvalidation
+
+logger = logging.getLogger(__name__)
+
+Handler = typing.Callable[[typing.List[str]], None]
+
+_handlers: typing.Dict[str, Handler] = {}
+
+
+def register(kind: str, handler: Handler) -> None:
+    """Registers the handler evicting local entries for invalidations of the kind."""
+    _handlers[kind] = handler
+
+
+def dispatch(kind: str, keys: typing.List[str]) -> None:
+    handler = _handlers.get(kind)
+    if handler is None:
+        logger.warning("No handler of %s invalidations", kind)
+        return
+    handler(keys)
+
+
+class LocalBus:
+    """Does not broadcast, caches of this process are invalidated directly."""
+
+    def __init__(self):
+        # Invalidations sent by this worker are not handled twice
+        self.origin = uuid.uuid4().hex
+
+    def publish(self, kind: str, keys: typing.List[str]) -> None:
+        pass
+
+    def start(self) -> None:
+        pass
+
+    def receive(self, origin: str, kind: str, keys: typing.List[str]) -> None:
+        if origin != self.origin:
+            dispatch(kind, keys)
+
+
+class PostgresBus(LocalBus):
+    NOTIFY_CHANNEL = "homekeeper_invalidation"
+
+    def __init__(self):
+        super().__init__()
+        self.listener = listen_notify.PostgresListener(
+            self.NOTIFY_CHANNEL, self.on_notify
+        )
+
+    def publish(self, kind: str, keys: typing.List[str]) -> None:
+        listen_notify.notify(
+            self.NOTIFY_CHANNEL,
+            json.dumps({"origin": self.origin, "kind": kind, "keys": keys}),
+        )
+
+    def start(self) -> None:
+        self.listener.start()
+
+    def on_notify(self, payload: str) -> None:
+        try:
+            data = json.loads(payload)
+            self.receive(data["origin"], data["kind"], data["keys"])
+        except (ValueError, KeyError):
+            logger.warning("Invalid invalidation payload %s", payload)
+
+
+class PollingBus(LocalBus):
+    """
+    Stores invalidations in the CacheInvalidation table, a daemon thread of
+    every worker polls it for rows newer than the last one it has seen.
+    Rows are kept for ``RETENTION`` and then deleted by the pollers.
+    """
+
+    RETENTION = 10 * 60  # seconds
+
+    def __init__(self):
+        super().__init__()
+        self.poll_interval = settings.CACHE_INVALIDATION.get("POLL_INTERVAL", 1)
+        self.last_id: typing.Optional[int] = None
+        self.last_purge = 0.0
+        self._thread: typing.Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def publish(self, kind: str, keys: typing.List[str]) -> None:
+        CacheInvalidation.objects.create(kind=kind, keys=keys, origin=self.origin)
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self.run, name="invalidation-poller", daemon=True
+                )
+                self._thread.start()
+
+    def run(self) -> None:
+        while True:
+            try:
+                self.poll()
+            except Exception:
+                logger.exception("Polling of invalidations failed")
+                connection.close()
+            time.sleep(self.poll_interval)
+
+    def poll(self) -> None:
+        if self.last_id is None:
+            # Caches of a new worker are empty, older invalidations do not matter
+            self.last_id = (
+                CacheInvalidation.objects.aggregate(Max("id"))["id__max"] or 0
+            )
+            return
+
+        for invalidation in CacheInvalidation.objects.filter(
+            id__gt=self.last_id
+        ).order_by("id"):
+            self.receive(invalidation.origin, invalidation.kind, invalidation.keys)
+            self.last_id = invalidation.id
+
+        if time.monotonic() - self.last_purge > self.RETENTION:
+            self.last_purge = time.monotonic()
+            CacheInvalidation.objects.filter(
+                created_at__lt=timezone.now()
+                - datetime.timedelta(seconds=self.RETENTION)
+            ).delete()
+
+
+@functools.lru_cache(maxsize=None)
+def get_bus() -> LocalBus:
+    return import_string(settings.CACHE_INVALIDATION["BACKEND"])()
+
+
+def broadcast(kind: str, keys: typing.List[str]) -> None:
+    """
+    Sends the invalidation to other workers. Call it after the local
+    invalidation, once the transaction is committed. Failures are logged,
+    the committed request does not fail because of them.
+    """
+    try:
+        get_bus().publish(kind, keys)
+    except Exception:
+        logger.exception("Failed to broadcast %s invalidation", kind)
+
+
+def start_listening(**kwargs) -> None:
+    """Starts receiving invalidations, connected to the request_started signal."""
+    get_bus().start()
@@ -0,0 +1,88 @@
+"""
+PostgreSQL LISTEN/NOTIFY helpers shared by the pub/sub backend of
+subscriptions and the cache invalidation bus.
+"""
+
+import logging
+import select
+import threading
+import time
+import typing
+
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+
+def notify(channel: str, payload: str) -> None:
+    """Sends the payload (at most 8000 bytes) to listeners of all processes."""
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_notify(%s, %s)", [channel, payload])
+
+
+class PostgresListener:
+    """
+    LISTENs to a channel in a daemon thread with its own connection and
+    calls ``callback`` with the payload of every notification.
+    The connection is reopened after errors.
+    """
+
+    RECONNECT_DELAY = 1  # seconds
+
+    def __init__(self, channel: str, callback: typing.Callable[[str], None]):
+        self.channel = channel
+        self.callback = callback
+        self.listening = threading.Event()
+        self._thread: typing.Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self.listen, name=f"listen-{self.channel}", daemon=True
+                )
+                self._thread.start()
+
+    def connect(self):
+        # A dedicated connection of the driver Django uses (psycopg 3 or
+        # psycopg2), not one of the pool (DATABASE_POOL), that stays LISTENing
+        conn = connection.Database.connect(**connection.get_connection_params())
+        conn.autocommit = True
+        with conn.cursor() as cursor:
+            cursor.execute(f'LISTEN "{self.channel}"')
+        self.listening.set()
+        return conn
+
+    def listen(self) -> None:
+        while True:
+            try:
+                conn = self.connect()
+                try:
+                    self.poll(conn)
+                finally:
+                    self.listening.clear()
+                    conn.close()
+            except Exception:
+                logger.exception("Listener of %s failed, reconnecting", self.channel)
+                time.sleep(self.RECONNECT_DELAY)
+
+    def poll(self, conn) -> None:
+        from django.db.backends.postgresql.psycopg_any import is_psycopg3
+
+        if is_psycopg3:
+            for notification in conn.notifies():
+                self.handle(notification.payload)
+            return
+        while True:
+            if select.select([conn], [], [], 5) == ([], [], []):
+                continue
+            conn.poll()
+            while conn.notifies:
+                self.handle(conn.notifies.pop(0).payload)
+
+    def handle(self, payload: str) -> None:
+        try:
+            self.callback(payload)
+        except Exception:
+            logger.exception("Failed to handle notification %s", payload)
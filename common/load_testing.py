@@ -0,0 +1,318 @@
+"""
+Load testing of a running server with the traffic of households.
+
+Every virtual user is a thread logging in as a user generated by
+``generate_dataset`` and sending GraphQL requests over its own keep-alive
+connection, one at a time, picking operations by the weights of the mix:
+
+- ``dashboard``: polls active task instances and points of the team,
+- ``complete``: completes an active task instance seen on the dashboard,
+- ``revert``: reverts a completion the user submitted,
+- ``login``: obtains a new token,
+- ``join``: joins another team of the dataset.
+
+Operations which can't be run yet (nothing to complete or revert, no team
+to join) are skipped in the pick. Latency is measured from sending the
+request to reading the whole response. See ``python3 manage.py loadtest``.
+"""
+
+import collections
+import http.client
+import json
+import random
+import statistics
+import threading
+import time
+import typing
+import urllib.parse
+
+DEFAULT_MIX = "dashboard=70,complete=12,revert=3,login=10,join=5"
+
+DASHBOARD = """query Dashboard($teamId: Int!) {
+    taskInstances(teamId: $teamId, onlyActive: true) {
+        id activeFrom currentPrize task { id name }
+    }
+    teamMembersPoints(teamId: $teamId) { member { id username } points }
+}"""
+
+SUBMIT_COMPLETION = """mutation SubmitCompletion($taskInstance: ID!) {
+    submitTaskInstanceCompletion(input: {taskInstance: $taskInstance}) {
+        errors { field messages }
+        taskInstanceCompletion { id pointsGranted }
+    }
+}"""
+
+REVERT_COMPLETION = """mutation RevertCompletion($id: ID!) {
+    revertTaskInstanceCompletion(id: $id) {
+        errors { field messages }
+        taskInstanceCompletion { id }
+    }
+}"""
+
+TOKEN_AUTH = """mutation TokenAuth($username: String!, $password: String!) {
+    tokenAuth(username: $username, password: $password) { token }
+}"""
+
+JOIN_TEAM = """mutation JoinTeam($teamId: Int!, $password: String!) {
+    joinTeam(teamId: $teamId, password: $password) { team { id } }
+}"""
+
+MY_TEAMS = "query MyTeams { myTeams { id } }"
+
+TEAMS = "query Teams { teams { id } }"
+
+
+class LoadTestError(Exception):
+    pass
+
+
+def parse_mix(value: str) -> typing.Dict[str, float]:
+    """Parses weights of operations, e.g. ``dashboard=70,complete=12``."""
+    mix = {}
+    for item in value.split(","):
+        name, _, weight = item.partition("=")
+        if name not in VirtualUser.operations:
+            raise ValueError(f"Unknown operation {name}")
+        mix[name] = float(weight)
+    return mix
+
+
+class GraphQLClient:
+    """Sends GraphQL requests over a keep-alive HTTP connection."""
+
+    def __init__(self, url: str, timeout: float):
+        parts = urllib.parse.urlsplit(url)
+        connection_class = (
+            http.client.HTTPSConnection
+            if parts.scheme == "https"
+            else http.client.HTTPConnection
+        )
+        self.connection = connection_class(parts.hostname, parts.port, timeout=timeout)
+        self.path = parts.path or "/"
+        self.token = None
+
+    def execute(self, query: str, variables: dict = None) -> dict:
+        headers = {"Content-Type": "application/json"}
+        if self.token:
+            headers["Authorization"] = f"JWT {self.token}"
+        try:
+            self.connection.request(
+                "POST",
+                self.path,
+                json.dumps({"query": query, "variables": variables}),
+                headers,
+            )
+            response = self.connection.getresponse()
+            content = response.read()
+        except (OSError, http.client.HTTPException) as e:
+            # Reconnects on the next request
+            self.connection.close()
+            raise LoadTestError(type(e).__name__)
+        try:
+            result = json.loads(content)
+        except ValueError:
+            raise LoadTestError(f"HTTP {response.status}")
+        if result.get("errors"):
+            raise LoadTestError(result["errors"][0]["message"])
+        for payload in (result.get("data") or {}).values():
+            if isinstance(payload, dict) and payload.get("errors"):
+                raise LoadTestError(payload["errors"][0]["messages"][0])
+        if response.status != 200:
+            raise LoadTestError(f"HTTP {response.status}")
+        return result["data"]
+
+    def close(self):
+        self.connection.close()
+
+
+class Recorder:
+    """Latency and errors of operations of all virtual users."""
+
+    def __init__(self):
+        self.latencies = collections.defaultdict(list)
+        self.errors = collections.Counter()
+        self.messages = collections.Counter()
+        self.lock = threading.Lock()
+
+    def record(self, operation: str, latency: float, error: str = None):
+        with self.lock:
+            self.latencies[operation].append(latency)
+            if error is not None:
+                self.errors[operation] += 1
+                self.messages[f"{operation}: {error}"] += 1
+
+    def summarize(self, elapsed: float) -> typing.Dict[str, typing.Dict[str, float]]:
+        """Throughput, error rate and latency percentiles (ms) by operation."""
+        summary = {}
+        latencies = {**self.latencies}
+        latencies["total"] = [
+            latency for measured in self.latencies.values() for latency in measured
+        ]
+        errors = {**self.errors, "total": sum(self.errors.values())}
+        for operation, measured in latencies.items():
+            if not measured:
+                continue
+            if len(measured) > 1:
+                percentiles = statistics.quantiles(measured, n=100, method="inclusive")
+                p50, p95, p99 = percentiles[49], percentiles[94], percentiles[98]
+            else:
+                p50 = p95 = p99 = measured[0]
+            summary[operation] = {
+                "requests": len(measured),
+                "throughput": len(measured) / elapsed,
+                "error_rate": errors.get(operation, 0) / len(measured),
+                "p50": p50 * 1000,
+                "p95": p95 * 1000,
+                "p99": p99 * 1000,
+            }
+        return summary
+
+
+class VirtualUser:
+    operations = ("dashboard", "complete", "revert", "login", "join")
+
+    def __init__(self, client, username, password, team_ids, mix, recorder, rng):
+        self.client = client
+        self.username = username
+        self.password = password
+        self.team_ids = team_ids  # Of the dataset
+        self.mix = mix
+        self.recorder = recorder
+        self.rng = rng
+        self.active_instances = []
+        self.completions = []
+
+    def start(self):
+        """Logs in and finds teams of the user, not measured."""
+        try:
+            data = self.client.execute(
+                TOKEN_AUTH, {"username": self.username, "password": self.password}
+            )
+            self.client.token = data["tokenAuth"]["token"]
+            data = self.client.execute(MY_TEAMS)
+        except LoadTestError as e:
+            raise LoadTestError(f"{self.username} can't log in: {e}")
+        self.my_team_ids = {int(team["id"]) for team in data["myTeams"]}
+        if not self.my_team_ids:
+            raise LoadTestError(f"{self.username} is not a member of a team")
+        self.team_id = min(self.my_team_ids)
+
+    def step(self):
+        available = {
+            "dashboard": True,
+            "complete": self.active_instances,
+            "revert": self.completions,
+            "login": True,
+            "join": len(self.my_team_ids) < len(self.team_ids),
+        }
+        operations = [
+            name for name, weight in self.mix.items() if weight and available[name]
+        ]
+        if not operations:
+            return
+        operation = self.rng.choices(
+            operations, [self.mix[name] for name in operations]
+        )[0]
+        getattr(self, operation)()
+
+    def measure(self, operation: str, query: str, variables: dict = None):
+        start = time.perf_counter()
+        try:
+            data = self.client.execute(query, variables)
+        except LoadTestError as e:
+            self.recorder.record(operation, time.perf_counter() - start, str(e))
+            return None
+        self.recorder.record(operation, time.perf_counter() - start)
+        return data
+
+    def dashboard(self):
+        data = self.measure("dashboard", DASHBOARD, {"teamId": self.team_id})
+        if data is not None:
+            self.active_instances = [
+                instance["id"] for instance in data["taskInstances"]
+            ]
+
+    def complete(self):
+        task_instance = self.active_instances.pop(
+            self.rng.randrange(len(self.active_instances))
+        )
+        data = self.measure(
+            "complete", SUBMIT_COMPLETION, {"taskInstance": task_instance}
+        )
+        if data is not None:
+            payload = data["submitTaskInstanceCompletion"]
+            self.completions.append(payload["taskInstanceCompletion"]["id"])
+
+    def revert(self):
+        self.measure("revert", REVERT_COMPLETION, {"id": self.completions.pop()})
+
+    def login(self):
+        data = self.measure(
+            "login",
+            TOKEN_AUTH,
+            {"username": self.username, "password": self.password},
+        )
+        if data is not None:
+            self.client.token = data["tokenAuth"]["token"]
+
+    def join(self):
+        team_id = self.rng.choice(sorted(set(self.team_ids) - self.my_team_ids))
+        # Joined or not, a retry would fail as already a member
+        self.my_team_ids.add(team_id)
+        self.measure("join", JOIN_TEAM, {"teamId": team_id, "password": self.password})
+
+
+def run(
+    url: str,
+    usernames: typing.List[str],
+    password: str,
+    mix: typing.Dict[str, float],
+    duration: float,
+    think_time: float = 0,
+    timeout: float = 30,
+    seed: int = 0,
+) -> typing.Tuple[Recorder, float]:
+    """
+    Runs a virtual user for every username for the duration (seconds),
+    waiting think_time (seconds) between requests. Returns the recorder
+    and the elapsed time.
+    """
+    client = GraphQLClient(url, timeout)
+    try:
+        team_ids = [int(team["id"]) for team in client.execute(TEAMS)["teams"]]
+    finally:
+        client.close()
+    recorder = Recorder()
+    users = [
+        VirtualUser(
+            GraphQLClient(url, timeout),
+            username,
+            password,
+            team_ids,
+            mix,
+            recorder,
+            random.Random(f"{seed}-{username}"),
+        )
+        for username in usernames
+    ]
+    for user in users:
+        user.start()
+
+    start = time.perf_counter()
+    deadline = start + duration
+
+    def loop(user: VirtualUser):
+        try:
+            while time.perf_counter() < deadline:
+                user.step()
+                if think_time:
+                    time.sleep(user.rng.expovariate(1 / think_time))
+        finally:
+            user.client.close()
+
+    threads = [threading.Thread(target=loop, args=(user,)) for user in users]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return recorder, time.perf_counter() - start
@@ -0,0 +1,54 @@
+import statistics
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure latency of acquiring a database connection by concurrent "
+        "threads, e.g. with and without DATABASE_POOL=True"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=8)
+        parser.add_argument("--iterations", type=int, default=100)
+        parser.add_argument("--database", default="default")
+
+    def handle(self, *args, **options):
+        latencies = []
+        lock = threading.Lock()
+
+        def worker():
+            # Every thread has its own connection, as in threaded servers
+            connection = connections[options["database"]]
+            measured = []
+            try:
+                for _ in range(options["iterations"]):
+                    start = time.perf_counter_ns()
+                    connection.ensure_connection()
+                    measured.append((time.perf_counter_ns() - start) / 1000)
+                    # Returns the connection to the pool or closes it
+                    connection.close()
+            finally:
+                connection.close()
+            with lock:
+                latencies.extend(measured)
+
+        threads = [threading.Thread(target=worker) for _ in range(options["threads"])]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        percentiles = statistics.quantiles(latencies, n=100)
+        self.stdout.write(
+            f"{len(latencies)} connections by {options['threads']} threads: "
+            f"mean {statistics.mean(latencies):.1f} us, "
+            f"p50 {percentiles[49]:.1f} us, p99 {percentiles[98]:.1f} us, "
+            f"{len(latencies) / elapsed:.0f} connections/s"
+        )
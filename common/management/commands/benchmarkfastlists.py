@@ -0,0 +1,138 @@
+import datetime
+import json
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, override_settings
+from django.utils import timezone
+from graphql_jwt.shortcuts import get_token
+
+from common.management.commands.benchmarkgraphql import TestDatabase
+from tasks.models import Task, TaskInstance, TaskInstanceCompletion
+from teams.models import Team
+
+FIELDS = {
+    "tasks": """query Tasks($teamId: Int!) {
+        tasks(teamId: $teamId) {
+            id name description basePointsPrize refreshInterval isRecurring active
+        }
+    }""",
+    "taskInstances": """query TaskInstances($teamId: Int!) {
+        taskInstances(teamId: $teamId) {
+            id activeFrom completed active currentPrize task { id name }
+        }
+    }""",
+    "completions": """query Completions($teamId: Int!) {
+        completions(teamId: $teamId) {
+            id createdAt pointsGranted
+            userWhoCompletedTask { id username }
+            taskInstance { id task { id name } }
+        }
+    }""",
+}
+
+
+def create_rows(rows: int) -> Team:
+    """Creates a team with the number of tasks, instances and completions."""
+    user = get_user_model().objects.create_user(username="fastlists")
+    team = Team.objects.create(name="Fast lists", created_by=user)
+    team.members.add(user)
+    now = timezone.now()
+    # Without signals, every task has a single instance
+    tasks = Task.objects.bulk_create(
+        Task(
+            name=f"Task {i}",
+            team=team,
+            base_points_prize=i % 10 + 1,
+            refresh_interval=datetime.timedelta(days=i % 7 + 1),
+            is_recurring=i % 2 == 0,
+            created_by=user,
+        )
+        for i in range(rows)
+    )
+    task_instances = TaskInstance.objects.bulk_create(
+        TaskInstance(
+            task=task,
+            active_from=now - datetime.timedelta(days=i % 30),
+            completed=i % 2 == 1,
+            created_by=user,
+        )
+        for i, task in enumerate(tasks)
+    )
+    TaskInstanceCompletion.objects.bulk_create(
+        TaskInstanceCompletion(
+            task_instance=task_instance,
+            user_who_completed_task=user,
+            points_granted=task_instance.task.base_points_prize,
+            created_by=user,
+        )
+        for task_instance in task_instances
+        if task_instance.completed
+    )
+    return team
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare CPU time per 1,000 rows of the hot list fields resolved "
+        "with models and with the values() fast path (GRAPHQL_FAST_LISTS), "
+        "in a new test database (an existing one is destroyed)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rows", type=int, default=2000, help="Tasks, half of them completed"
+        )
+        parser.add_argument("--iterations", type=int, default=5)
+
+    def handle(self, *args, **options):
+        with self.test_database(), override_settings(
+            ALLOWED_HOSTS=["testserver"],
+            DEBUG=False,
+            DATABASE_REPLICAS=[],
+            GRAPHQL_RESPONSE_CACHE={
+                **settings.GRAPHQL_RESPONSE_CACHE,
+                "ACTIVE": False,
+            },
+        ):
+            team = create_rows(options["rows"])
+            client = Client(HTTP_AUTHORIZATION=f"JWT {get_token(team.members.get())}")
+            self.stdout.write(
+                f"{'field':<15} {'rows':>6} {'models ms/1k':>13} "
+                f"{'values ms/1k':>13} {'speedup':>8}"
+            )
+            for field, query in FIELDS.items():
+                body = json.dumps({"query": query, "variables": {"teamId": team.id}})
+                data, cpu = self.measure(client, body, False, options["iterations"])
+                fast_data, fast_cpu = self.measure(
+                    client, body, True, options["iterations"]
+                )
+                if fast_data != data:
+                    raise CommandError(f"{field} differs on the fast path")
+                per_rows = 1000 / len(data[field])
+                self.stdout.write(
+                    f"{field:<15} {len(data[field]):>6} {cpu * per_rows:>13.1f} "
+                    f"{fast_cpu * per_rows:>13.1f} {cpu / fast_cpu:>7.1f}x"
+                )
+
+    def test_database(self):
+        return TestDatabase()
+
+    @staticmethod
+    def measure(client, body, fast, iterations):
+        """Returns the data and the median CPU time (ms) of executions."""
+        times = []
+        with override_settings(GRAPHQL_FAST_LISTS={"ACTIVE": fast}):
+            for _ in range(iterations + 1):  # The first one warms up
+                start = time.process_time()
+                response = client.post(
+                    "/graphql/", body, content_type="application/json"
+                )
+                times.append((time.process_time() - start) * 1000)
+                result = json.loads(response.content)
+                if result.get("errors"):
+                    raise CommandError(json.dumps(result["errors"]))
+        return result["data"], statistics.median(times[1:])
@@ -0,0 +1,123 @@
+import json
+import os
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from common import benchmarks
+from tasks import signals  # noqa: F401, completions update task instances
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the GraphQL operations of the app against generated "
+        "datasets, each in a new test database (an existing one is "
+        "destroyed), and compare latency, SQL queries and memory with the "
+        "baseline. Fails on regressions, --save stores the results as the "
+        "baseline instead"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--datasets",
+            nargs="+",
+            choices=list(benchmarks.DATASETS),
+            default=["small", "medium"],
+        )
+        parser.add_argument("--iterations", type=int, default=20)
+        parser.add_argument("--warmup", type=int, default=2)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--baseline",
+            default=os.path.join(settings.BASE_DIR, "benchmark_baseline.json"),
+        )
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=0.2,
+            help="Allowed increase of latency and memory, a fraction of the baseline",
+        )
+        parser.add_argument("--save", action="store_true")
+
+    def handle(self, *args, **options):
+        if options["iterations"] < 2 or options["warmup"] < 1:
+            raise CommandError("At least 2 iterations and 1 warmup are required")
+        baseline = self.load_baseline(options["baseline"])
+
+        results = {}
+        for dataset in options["datasets"]:
+            with self.test_database():
+                self.stdout.write(f"Generating the {dataset} dataset")
+                call_command(
+                    "generate_dataset",
+                    seed=options["seed"],
+                    prefix=benchmarks.PREFIX,
+                    stdout=self.stdout,
+                    **benchmarks.DATASETS[dataset],
+                )
+                cache.clear()
+                try:
+                    results[dataset] = benchmarks.run(
+                        options["iterations"], options["warmup"]
+                    )
+                except RuntimeError as e:
+                    raise CommandError(e)
+            self.write_results(dataset, results[dataset], baseline["datasets"])
+
+        if options["save"]:
+            baseline["datasets"].update(results)
+            with open(options["baseline"], "w") as f:
+                json.dump(baseline, f, indent=2, sort_keys=True)
+            self.stdout.write(f"Baseline saved to {options['baseline']}")
+            return
+        regressions = benchmarks.compare(
+            baseline["datasets"], results, options["tolerance"]
+        )
+        if regressions:
+            raise CommandError("Regressions:\n" + "\n".join(regressions))
+
+    def load_baseline(self, path: str) -> dict:
+        try:
+            with open(path) as f:
+                baseline = json.load(f)
+        except FileNotFoundError:
+            self.stderr.write(f"No baseline in {path}, run with --save to store one")
+            return {"database": connection.vendor, "datasets": {}}
+        if baseline["database"] != connection.vendor:
+            raise CommandError(
+                f"The baseline was recorded on {baseline['database']}, "
+                f"not {connection.vendor}"
+            )
+        return baseline
+
+    def test_database(self):
+        return TestDatabase()
+
+    def write_results(self, dataset, results, baseline):
+        self.stdout.write(
+            f"{dataset:<30} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+            f"{'queries':>8} {'memory KiB':>11} {'baseline p50':>13}"
+        )
+        for name, measured in results.items():
+            base = baseline.get(dataset, {}).get(name, {}).get("p50")
+            self.stdout.write(
+                f"{name:<30} {measured['p50']:>9.1f} {measured['p95']:>9.1f} "
+                f"{measured['p99']:>9.1f} {measured['queries']:>8} "
+                f"{measured['memory'] / 1024:>11.0f} "
+                f"{'-' if base is None else f'{base:.1f}':>13}"
+            )
+
+
+class TestDatabase:
+    """Creates a test database for the default alias and destroys it."""
+
+    def __enter__(self):
+        self.old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False
+        )
+
+    def __exit__(self, *exc_info):
+        connection.creation.destroy_test_db(self.old_name, verbosity=0)
@@ -0,0 +1,55 @@
+import json
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from graphene_django.settings import graphene_settings
+
+from common import persisted_queries
+
+
+class Command(BaseCommand):
+    help = (
+        "Save client operations (.graphql files) into the persisted queries "
+        "allowlist, keyed by sha256 hash of the query text"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "paths",
+            nargs="+",
+            help=".graphql files or directories containing them",
+        )
+        parser.add_argument(
+            "--out",
+            default=settings.GRAPHQL_PERSISTED_QUERIES["ALLOWLIST_PATH"],
+            help="Output allowlist file",
+        )
+
+    def handle(self, *args, **options):
+        schema = graphene_settings.SCHEMA.graphql_schema
+        allowlist = {}
+        for path in self.collect_files(options["paths"]):
+            # Clients hash the exact query text they send
+            query = path.read_text(encoding="utf-8")
+            _, errors = persisted_queries.parse_and_validate(schema, query)
+            if errors:
+                raise CommandError(
+                    f"{path}: " + "; ".join(error.message for error in errors)
+                )
+            allowlist[persisted_queries.query_hash(query)] = query
+
+        with open(options["out"], "w", encoding="utf-8") as f:
+            json.dump(allowlist, f, indent=2, sort_keys=True)
+        self.stdout.write(f"Saved {len(allowlist)} queries to {options['out']}")
+
+    @staticmethod
+    def collect_files(paths):
+        for path in map(Path, paths):
+            if path.is_dir():
+                yield from sorted(path.rglob("*.graphql"))
+            elif path.exists():
+                yield path
+            else:
+                raise CommandError(f"{path} does not exist")
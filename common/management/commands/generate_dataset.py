@@ -0,0 +1,236 @@
+import datetime
+import random
+import time
+import typing
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from tasks.models import Task, TaskInstance, TaskInstanceCompletion, prize_at
+from teams import membership_index
+from teams.models import Team
+from users.models import Profile
+
+REFRESH_INTERVALS = [datetime.timedelta(days=days) for days in (1, 2, 3, 7, 14, 30)]
+# Share of single occurrence tasks that are never completed
+NOT_COMPLETED_RATIO = 0.3
+TEAMS_PER_CHUNK = 50
+
+Timeline = typing.List[
+    typing.Tuple[datetime.datetime, typing.Optional[datetime.datetime]]
+]
+
+
+def build_timeline(
+    rng: random.Random,
+    created_at: datetime.datetime,
+    refresh_interval: typing.Optional[datetime.timedelta],
+    end: datetime.datetime,
+) -> Timeline:
+    """
+    Returns (active_from, completed_at) of instances of a task, completed_at
+    is None for the last one. Follows tasks.signals: a completion of
+    a recurring task creates the next instance active from the completion
+    plus the refresh interval.
+    """
+    timeline = []
+    active_from = created_at
+    while True:
+        if refresh_interval is not None:
+            completed_at = active_from + refresh_interval * rng.uniform(0.05, 1.5)
+        else:
+            completed_at = active_from + datetime.timedelta(days=rng.uniform(0.1, 21))
+            if rng.random() < NOT_COMPLETED_RATIO:
+                completed_at = end
+        if completed_at >= end:
+            timeline.append((active_from, None))
+            return timeline
+        timeline.append((active_from, completed_at))
+        if refresh_interval is None:
+            return timeline
+        active_from = completed_at + refresh_interval
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate teams with members, tasks and months of completion history "
+        "with bulk inserts, bypassing signals. The data is deterministic for "
+        "the seed and the end date"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--teams", type=int, default=100)
+        parser.add_argument("--members", type=int, default=4, help="per team")
+        parser.add_argument("--tasks", type=int, default=20, help="per team")
+        parser.add_argument(
+            "--recurring-ratio",
+            type=float,
+            default=0.7,
+            help="Share of recurring tasks",
+        )
+        parser.add_argument("--months", type=int, default=12, help="of history")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--end",
+            type=datetime.date.fromisoformat,
+            default=timezone.now().date(),
+            help="Date (YYYY-MM-DD) at which the history ends, today by default",
+        )
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument(
+            "--prefix",
+            default="dataset",
+            help="Prefix of usernames, the password of users and teams",
+        )
+
+    def handle(self, *args, **options):
+        if (
+            get_user_model()
+            .objects.filter(username__startswith=f"{options['prefix']}-")
+            .exists()
+        ):
+            raise CommandError(
+                f"Users with the {options['prefix']} prefix exist, use another one"
+            )
+        self.options = options
+        self.rng = random.Random(options["seed"])
+        self.end = datetime.datetime.combine(
+            options["end"], datetime.time(), tzinfo=datetime.timezone.utc
+        )
+        self.start = self.end - datetime.timedelta(days=30 * options["months"])
+        # Hashing is slow, every user and team shares the password
+        self.password = make_password(options["prefix"])
+        self.counts = {"users": 0, "tasks": 0, "task instances": 0, "completions": 0}
+
+        start = time.perf_counter()
+        for first in range(0, options["teams"], TEAMS_PER_CHUNK):
+            with transaction.atomic():
+                self.generate_teams(
+                    range(first, min(first + TEAMS_PER_CHUNK, options["teams"]))
+                )
+        path = membership_index.get_path()
+        if path:
+            membership_index.build(path)
+
+        self.stdout.write(
+            ", ".join(f"{count} {name}" for name, count in self.counts.items())
+            + f" generated in {time.perf_counter() - start:.1f} s"
+        )
+
+    def bulk_create(self, model, objects):
+        return model.objects.bulk_create(objects, batch_size=self.options["batch_size"])
+
+    def generate_teams(self, numbers: range):
+        rng = self.rng
+        members = [
+            [
+                get_user_model()(
+                    username=f"{self.options['prefix']}-{number}-{member}",
+                    password=self.password,
+                    date_joined=self.start,
+                )
+                for member in range(self.options["members"])
+            ]
+            for number in numbers
+        ]
+        # Primary keys are set on the same objects
+        users = self.bulk_create(
+            get_user_model(),
+            [user for team_members in members for user in team_members],
+        )
+        self.bulk_create(Profile, [Profile(user=user) for user in users])
+        teams = self.bulk_create(
+            Team,
+            [
+                Team(
+                    name=f"Team {number}",
+                    password=self.password,
+                    created_by=team_members[0],
+                    created_at=self.start + datetime.timedelta(days=rng.uniform(0, 7)),
+                )
+                for number, team_members in zip(numbers, members)
+            ],
+        )
+        self.bulk_create(
+            Team.members.through,
+            [
+                Team.members.through(team_id=team.id, user_id=user.id)
+                for team, team_members in zip(teams, members)
+                for user in team_members
+            ],
+        )
+        tasks = self.bulk_create(
+            Task,
+            [
+                self.build_task(team, team_members)
+                for team, team_members in zip(teams, members)
+                for _ in range(self.options["tasks"])
+            ],
+        )
+        self.generate_history(tasks, dict(zip((team.id for team in teams), members)))
+        self.counts["users"] += len(users)
+        self.counts["tasks"] += len(tasks)
+
+    def build_task(self, team: Team, members) -> Task:
+        rng = self.rng
+        is_recurring = rng.random() < self.options["recurring_ratio"]
+        span = (self.end - team.created_at) * 0.2
+        return Task(
+            name=f"Task {rng.randrange(10**6)}",
+            team=team,
+            base_points_prize=rng.randint(1, 10),
+            refresh_interval=rng.choice(REFRESH_INTERVALS) if is_recurring else None,
+            is_recurring=is_recurring,
+            created_by=rng.choice(members),
+            created_at=team.created_at + span * rng.random(),
+        )
+
+    def generate_history(self, tasks: typing.List[Task], members_by_team):
+        instances = []
+        completions = []  # Index of the instance, completed at
+        for task in tasks:
+            created_at = task.created_at
+            timeline = build_timeline(
+                self.rng, task.created_at, task.refresh_interval, self.end
+            )
+            for active_from, completed_at in timeline:
+                instances.append(
+                    TaskInstance(
+                        task=task,
+                        active_from=active_from,
+                        completed=completed_at is not None,
+                        created_at=created_at,
+                    )
+                )
+                if completed_at is not None:
+                    completions.append((len(instances) - 1, completed_at))
+                    created_at = completed_at
+
+        instances = self.bulk_create(TaskInstance, instances)
+        self.bulk_create(
+            TaskInstanceCompletion,
+            [
+                TaskInstanceCompletion(
+                    task_instance=instances[i],
+                    user_who_completed_task=user,
+                    created_by=user,
+                    created_at=completed_at,
+                    # TaskInstance.current_prize at the moment of the completion
+                    points_granted=prize_at(
+                        instances[i].task.base_points_prize,
+                        instances[i].task.refresh_interval,
+                        instances[i].active_from,
+                        completed_at,
+                    ),
+                )
+                for i, completed_at in completions
+                for user in [
+                    self.rng.choice(members_by_team[instances[i].task.team_id])
+                ]
+            ],
+        )
+        self.counts["task instances"] += len(instances)
+        self.counts["completions"] += len(completions)
@@ -0,0 +1,146 @@
+import contextlib
+import http.client
+import json
+import subprocess
+import time
+import urllib.parse
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from common import load_testing
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay a mix of household traffic (dashboard polls, completions, "
+        "reverts, logins, joins) by concurrent virtual users against a server "
+        "and report throughput, latency and errors by operation. Users are "
+        "those of generate_dataset. --server starts the WSGI or ASGI "
+        "application with gunicorn at the URL, otherwise it must be running"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--url", default="http://localhost:8000/graphql/")
+        parser.add_argument("--server", choices=["wsgi", "asgi"])
+        parser.add_argument("--workers", type=int, default=2, help="of the server")
+        parser.add_argument(
+            "--threads", type=int, default=4, help="per worker of the WSGI server"
+        )
+        parser.add_argument("--users", type=int, default=20, help="virtual users")
+        parser.add_argument(
+            "--members",
+            type=int,
+            default=4,
+            help="per team of the dataset, users of a team are picked first",
+        )
+        parser.add_argument(
+            "--prefix", default="dataset", help="of the dataset, also the password"
+        )
+        parser.add_argument(
+            "--mix",
+            type=load_testing.parse_mix,
+            default=load_testing.DEFAULT_MIX,
+            help=f"Weights of operations, {load_testing.DEFAULT_MIX} by default",
+        )
+        parser.add_argument("--duration", type=float, default=60, help="seconds")
+        parser.add_argument(
+            "--think-time",
+            type=float,
+            default=1,
+            help="Mean seconds a virtual user waits between requests",
+        )
+        parser.add_argument("--timeout", type=float, default=30, help="seconds")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--output", help="Write the summary as JSON to the file")
+
+    def handle(self, *args, **options):
+        usernames = [
+            f"{options['prefix']}-{user // options['members']}-"
+            f"{user % options['members']}"
+            for user in range(options["users"])
+        ]
+        with self.start_server(options):
+            try:
+                recorder, elapsed = load_testing.run(
+                    options["url"],
+                    usernames,
+                    options["prefix"],
+                    options["mix"],
+                    options["duration"],
+                    options["think_time"],
+                    options["timeout"],
+                    options["seed"],
+                )
+            except load_testing.LoadTestError as e:
+                raise CommandError(e)
+
+        summary = recorder.summarize(elapsed)
+        self.stdout.write(
+            f"{options['users']} users for {elapsed:.0f} s against "
+            f"{options['server'] or options['url']}"
+        )
+        self.stdout.write(
+            f"{'operation':<12} {'requests':>9} {'req/s':>8} {'errors':>7} "
+            f"{'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"
+        )
+        for operation, measured in summary.items():
+            self.stdout.write(
+                f"{operation:<12} {measured['requests']:>9} "
+                f"{measured['throughput']:>8.1f} {measured['error_rate']:>7.1%} "
+                f"{measured['p50']:>9.1f} {measured['p95']:>9.1f} "
+                f"{measured['p99']:>9.1f}"
+            )
+        for message, count in recorder.messages.most_common(10):
+            self.stdout.write(f"{count:>6} x {message}")
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump(summary, f, indent=2)
+
+    @contextlib.contextmanager
+    def start_server(self, options):
+        if options["server"] is None:
+            yield
+            return
+        parts = urllib.parse.urlsplit(options["url"])
+        command = [
+            "gunicorn",
+            f"homekeeper.{options['server']}",
+            "--bind",
+            f"{parts.hostname}:{parts.port or 80}",
+            "--workers",
+            str(options["workers"]),
+        ]
+        if options["server"] == "wsgi":
+            command += ["--threads", str(options["threads"])]
+        else:
+            command += ["--worker-class", "uvicorn.workers.UvicornWorker"]
+        try:
+            process = subprocess.Popen(command, cwd=settings.BASE_DIR)
+        except FileNotFoundError:
+            raise CommandError("gunicorn is not installed")
+        try:
+            self.wait_for_server(parts, process)
+            yield
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+
+    @staticmethod
+    def wait_for_server(parts, process, timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise CommandError(f"The server exited with {process.returncode}")
+            connection = http.client.HTTPConnection(
+                parts.hostname, parts.port, timeout=1
+            )
+            try:
+                connection.request("GET", "/")
+                connection.getresponse()
+                return
+            except OSError:
+                time.sleep(0.2)
+            finally:
+                connection.close()
+        raise CommandError(f"The server is not listening after {timeout} s")
@@ -0,0 +1,69 @@
+import glob
+import os
+import pickle
+import tracemalloc
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from common import memory_profiling
+
+
+class Command(BaseCommand):
+    help = (
+        "Print top allocation sites of memory snapshots of GraphQL operations, "
+        "or compare two snapshots"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "paths",
+            nargs="*",
+            help="Snapshots or directories, the snapshot directory by default",
+        )
+        parser.add_argument("--top", type=int, default=10)
+        parser.add_argument(
+            "--compare",
+            nargs=2,
+            metavar=("OLD", "NEW"),
+            help="Print the sites that grew the most between the snapshots",
+        )
+
+    def handle(self, *args, **options):
+        if options["compare"]:
+            old, new = (
+                memory_profiling.filter_snapshot(self.load(path))
+                for path in options["compare"]
+            )
+            self.stdout.write(f"Top differences of {options['compare'][1]}:")
+            for statistic in new.compare_to(old, "lineno")[: options["top"]]:
+                self.stdout.write(f"  {statistic}")
+            return
+
+        paths = []
+        for path in options["paths"] or [
+            str(settings.GRAPHQL_MEMORY_PROFILING["DIRECTORY"])
+        ]:
+            if os.path.isdir(path):
+                paths.extend(sorted(glob.glob(os.path.join(path, "*.snapshot"))))
+            else:
+                paths.append(path)
+        if not paths:
+            raise CommandError("There are no memory snapshots")
+
+        for path in paths:
+            snapshot = self.load(path)
+            total = sum(trace.size for trace in snapshot.traces)
+            self.stdout.write(f"{path}: {total / 1024 / 1024:.1f} MiB traced")
+            for site in memory_profiling.get_top_sites(snapshot, options["top"]):
+                self.stdout.write(
+                    f"  {site.size / 1024:10.1f} KiB {site.count:>8} blocks "
+                    f"{site.location}"
+                )
+
+    @staticmethod
+    def load(path):
+        try:
+            return tracemalloc.Snapshot.load(path)
+        except (OSError, EOFError, pickle.UnpicklingError) as e:
+            raise CommandError(f"Failed to load {path}: {e}")
@@ -0,0 +1,104 @@
+import collections
+import glob
+import os
+import pstats
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        "Merge profiles of GraphQL requests (.prof of cProfile and .collapsed "
+        "stacks of the sampling profiler) and print the top functions"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "paths",
+            nargs="*",
+            help="Profiles or directories, the profiling directory by default",
+        )
+        parser.add_argument(
+            "--operation", help="Only profiles of operations with the name"
+        )
+        parser.add_argument("--top", type=int, default=20)
+        parser.add_argument(
+            "--sort", default="cumulative", help="Order of cProfile functions"
+        )
+        parser.add_argument(
+            "--output", help="File for merged stacks (.collapsed) or stats (.prof)"
+        )
+
+    def handle(self, *args, **options):
+        paths = self.find_profiles(
+            options["paths"] or [str(settings.GRAPHQL_PROFILING["DIRECTORY"])],
+            options["operation"],
+        )
+        prof_paths = [path for path in paths if path.endswith(".prof")]
+        collapsed_paths = [path for path in paths if path.endswith(".collapsed")]
+        if not prof_paths and not collapsed_paths:
+            raise CommandError("There are no profiles")
+        output = options["output"]
+
+        if prof_paths:
+            self.stdout.write(f"cProfile, {len(prof_paths)} profiles:")
+            stats = pstats.Stats(*prof_paths, stream=self.stdout)
+            stats.sort_stats(options["sort"]).print_stats(options["top"])
+            if output and output.endswith(".prof"):
+                stats.dump_stats(output)
+
+        if collapsed_paths:
+            samples = self.merge_collapsed(collapsed_paths)
+            self.stdout.write(
+                f"Sampling, {len(collapsed_paths)} profiles, "
+                f"{sum(samples.values())} samples:"
+            )
+            self.write_top_functions(samples, options["top"])
+            if output and output.endswith(".collapsed"):
+                with open(output, "w") as f:
+                    for stack, count in samples.most_common():
+                        f.write(f"{stack} {count}\n")
+
+    @staticmethod
+    def find_profiles(paths, operation):
+        found = []
+        for path in paths:
+            if os.path.isdir(path):
+                found.extend(sorted(glob.glob(os.path.join(path, "*.*"))))
+            else:
+                found.append(path)
+        if operation:
+            found = [
+                path
+                for path in found
+                if os.path.basename(path).split(".", 1)[0] == operation
+            ]
+        return found
+
+    @staticmethod
+    def merge_collapsed(paths):
+        samples = collections.Counter()
+        for path in paths:
+            with open(path) as f:
+                for line in f:
+                    stack, _, count = line.rstrip("\n").rpartition(" ")
+                    if stack and count.isdigit():
+                        samples[stack] += int(count)
+        return samples
+
+    def write_top_functions(self, samples, top):
+        own = collections.Counter()
+        total = collections.Counter()
+        for stack, count in samples.items():
+            functions = stack.split(";")
+            own[functions[-1]] += count
+            # Recursive functions count once per sample
+            for function in set(functions):
+                total[function] += count
+
+        all_samples = sum(samples.values())
+        for title, counter in [("Own samples", own), ("Total samples", total)]:
+            self.stdout.write(f"{title}:")
+            for function, count in counter.most_common(top):
+                self.stdout.write(f"  {count / all_samples:6.1%} {count:>7} {function}")
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from common import idempotency
+
+
+class Command(BaseCommand):
+    help = "Delete expired idempotency keys in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of keys deleted in one query",
+        )
+
+    def handle(self, *args, **options):
+        deleted = idempotency.purge_expired(options["batch_size"])
+        self.stdout.write(f"Deleted {deleted} expired idempotency keys")
@@ -0,0 +1,93 @@
+import json
+import os
+import re
+import statistics
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        "Summarize the slowest operations and SQL statements of the slow operation log"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--top", type=int, default=10)
+        parser.add_argument(
+            "--path",
+            default=str(settings.GRAPHQL_SLOW_LOG["PATH"]),
+            help="Log file, rotated files next to it are read too",
+        )
+
+    def handle(self, *args, **options):
+        records = list(self.read_records(options["path"]))
+        if not records:
+            raise CommandError(f"There are no slow operations in {options['path']}")
+
+        self.stdout.write(f"Slowest operations of {len(records)} logged:")
+        self.write_operations(records, options["top"])
+        self.stdout.write("Statements with the longest total time:")
+        self.write_statements(records, options["top"])
+
+    def write_operations(self, records, top):
+        operations = {}
+        for record in records:
+            key = (record["type"], record["operation"])
+            operations.setdefault(key, []).append(record)
+
+        for (type, name), logged in sorted(
+            operations.items(),
+            key=lambda item: sum(record["duration"] for record in item[1]),
+            reverse=True,
+        )[:top]:
+            durations = [record["duration"] for record in logged]
+            queries = [record["sql_queries"] for record in logged]
+            self.stdout.write(
+                f"  {type} {name}: {len(logged)} times, "
+                f"mean {statistics.mean(durations):.3f} s, "
+                f"max {max(durations):.3f} s, "
+                f"mean {statistics.mean(queries):.0f} queries"
+            )
+
+    def write_statements(self, records, top):
+        statements = {}
+        for statement in (s for record in records for s in record["statements"]):
+            # Statements differing only in IN (...) lists are the same
+            sql = re.sub(r"IN \((%s, )*%s\)", "IN (...)", statement["sql"])
+            summary = statements.setdefault(
+                sql, {"durations": [], "fields": set(), "plan": None}
+            )
+            summary["durations"].append(statement["duration"])
+            summary["fields"].add(statement["field"] or "-")
+            summary["plan"] = statement.get("plan") or summary["plan"]
+
+        for sql, summary in sorted(
+            statements.items(),
+            key=lambda item: sum(item[1]["durations"]),
+            reverse=True,
+        )[:top]:
+            durations = summary["durations"]
+            self.stdout.write(
+                f"  {sum(durations):.3f} s in {len(durations)} runs "
+                f"(max {max(durations) * 1000:.1f} ms) "
+                f"by {', '.join(sorted(summary['fields']))}\n    {sql}"
+            )
+            for line in (summary["plan"] or "").splitlines():
+                self.stdout.write(f"      {line}")
+
+    @staticmethod
+    def read_records(path):
+        paths = [path] + [
+            f"{path}.{i}"
+            for i in range(1, settings.GRAPHQL_SLOW_LOG["BACKUP_COUNT"] + 1)
+        ]
+        for log_path in paths:
+            if not os.path.exists(log_path):
+                continue
+            with open(log_path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        continue
@@ -0,0 +1,216 @@
+import collections
+import datetime
+import json
+import random
+import threading
+import time
+import typing
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count, Q
+from django.test import Client, override_settings
+from graphql_jwt.shortcuts import get_token
+
+from tasks import signals  # noqa: F401, completions update task instances
+from tasks.models import Task, TaskInstance, TaskInstanceCompletion
+from teams.models import Team
+
+SUBMIT_COMPLETION = """
+mutation ($taskInstance: ID!) {
+  submitTaskInstanceCompletion(input: {taskInstance: $taskInstance}) {
+    taskInstanceCompletion { id }
+  }
+}
+"""
+
+REVERT_COMPLETION = """
+mutation ($id: ID!) {
+  revertTaskInstanceCompletion(id: $id) { taskInstanceCompletion { id } }
+}
+"""
+
+
+def create_tasks(count: int) -> typing.Tuple[str, typing.List[int]]:
+    """Creates a user, a team and its recurring tasks, returns the token and ids."""
+    user = get_user_model().objects.create_user(username=f"stress-{time.time_ns()}")
+    team = Team.objects.create(name="Stress test", created_by=user)
+    team.members.add(user)
+    tasks = [
+        Task.objects.create(
+            name=f"Task {i}",
+            team=team,
+            base_points_prize=1,
+            refresh_interval=datetime.timedelta(days=1),
+            is_recurring=True,
+            created_by=user,
+        )
+        for i in range(count)
+    ]
+    return get_token(user), [task.id for task in tasks]
+
+
+def hammer(
+    token: str,
+    task_ids: typing.List[int],
+    operations: int,
+    revert_ratio: float,
+    seed: int,
+) -> typing.Counter[str]:
+    """
+    Runs in a thread, completes the current instance of a random task or
+    reverts its latest completion, as several devices of a household do.
+    Returns counts of applied and rejected operations.
+    """
+    rng = random.Random(seed)
+    client = Client(HTTP_AUTHORIZATION=f"JWT {token}")
+    counts = collections.Counter()
+    try:
+        for _ in range(operations):
+            task_id = rng.choice(task_ids)
+            if rng.random() < revert_ratio:
+                operation, query = "reverts", REVERT_COMPLETION
+                target = (
+                    TaskInstanceCompletion.objects.filter(
+                        task_instance__task=task_id, deleted_at=None
+                    )
+                    .order_by("-id")
+                    .values_list("id", flat=True)
+                    .first()
+                )
+                variables = {"id": target}
+            else:
+                operation, query = "completions", SUBMIT_COMPLETION
+                target = (
+                    TaskInstance.objects.filter(
+                        task=task_id, completed=False, deleted_at=None
+                    )
+                    .order_by("-id")
+                    .values_list("id", flat=True)
+                    .first()
+                )
+                variables = {"taskInstance": target}
+            if target is None:
+                continue
+            response = client.post(
+                "/graphql/",
+                {"query": query, "variables": variables},
+                content_type="application/json",
+            )
+            result = json.loads(response.content)
+            counts[f"rejected {operation}" if result.get("errors") else operation] += 1
+    finally:
+        connection.close()
+    return counts
+
+
+def find_violations(task_ids: typing.List[int]) -> typing.List[str]:
+    """Returns descriptions of broken invariants of instances of the tasks."""
+    violations = []
+    for task in (
+        Task.objects.filter(id__in=task_ids)
+        .annotate(
+            uncompleted=Count(
+                "taskinstance",
+                filter=Q(taskinstance__completed=False, taskinstance__deleted_at=None),
+            )
+        )
+        .exclude(uncompleted=1)
+    ):
+        violations.append(
+            f"Task {task.id} has {task.uncompleted} uncompleted instances"
+        )
+
+    instances = TaskInstance.objects.filter(task__in=task_ids).annotate(
+        completions=Count(
+            "taskinstancecompletion",
+            filter=Q(taskinstancecompletion__deleted_at=None),
+        )
+    )
+    for instance in instances.filter(completions__gt=1):
+        violations.append(
+            f"TaskInstance {instance.id} has {instance.completions} completions"
+        )
+    for instance in instances.filter(deleted_at=None).filter(
+        Q(completed=True, completions=0) | Q(completed=False, completions__gt=0)
+    ):
+        violations.append(
+            f"TaskInstance {instance.id} is completed={instance.completed} "
+            f"with {instance.completions} completions"
+        )
+    for instance in instances.exclude(deleted_at=None).filter(completions__gt=0):
+        violations.append(
+            f"Deleted TaskInstance {instance.id} has {instance.completions} completions"
+        )
+    return violations
+
+
+def run(
+    token: str,
+    task_ids: typing.List[int],
+    threads: int,
+    operations: int,
+    revert_ratio: float,
+) -> typing.Tuple[typing.Counter[str], float]:
+    """Hammers the tasks from threads, returns counts and the elapsed time."""
+    results = []
+
+    def worker(seed):
+        results.append(hammer(token, task_ids, operations, revert_ratio, seed))
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    start = time.perf_counter()
+    with override_settings(ALLOWED_HOSTS=["testserver"]):
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+    return sum(results, collections.Counter()), time.perf_counter() - start
+
+
+class Command(BaseCommand):
+    help = (
+        "Complete and revert the same task instances from several threads, "
+        "report throughput and check invariants of task instances and "
+        "completions. Creates a user and a team for the test, run it on "
+        "a copy of the database"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=8)
+        parser.add_argument(
+            "--tasks",
+            type=int,
+            default=2,
+            help="Recurring tasks shared by the threads, fewer make more races",
+        )
+        parser.add_argument("--operations", type=int, default=100, help="per thread")
+        parser.add_argument("--revert-ratio", type=float, default=0.3)
+
+    def handle(self, *args, **options):
+        if connection.vendor == "sqlite" and connection.is_in_memory_db():
+            raise CommandError("The in-memory SQLite database is not shared")
+        if connection.vendor != "postgresql":
+            self.stderr.write(f"Locking of {connection.vendor} differs from PostgreSQL")
+
+        token, task_ids = create_tasks(options["tasks"])
+        counts, elapsed = run(
+            token,
+            task_ids,
+            options["threads"],
+            options["operations"],
+            options["revert_ratio"],
+        )
+        applied = counts["completions"] + counts["reverts"]
+        self.stdout.write(
+            f"{counts['completions']} completions and {counts['reverts']} reverts "
+            f"by {options['threads']} threads in {elapsed:.2f} s "
+            f"({applied / elapsed:.0f} operations/s), "
+            f"{counts['rejected completions']} completions and "
+            f"{counts['rejected reverts']} reverts rejected"
+        )
+        violations = find_violations(task_ids)
+        if violations:
+            raise CommandError("Broken invariants:\n" + "\n".join(violations))
+        self.stdout.write("Invariants hold")
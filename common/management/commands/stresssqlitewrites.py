@@ -0,0 +1,106 @@
+import datetime
+import json
+import multiprocessing
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import Client, override_settings
+from graphql_jwt.shortcuts import get_token
+
+from common import sqlite_writer
+from tasks import signals  # noqa: F401, creates task instances
+from tasks.models import Task, TaskInstance
+from teams.models import Team
+
+COMPLETION_MUTATION = """
+mutation ($taskInstance: ID!) {
+  submitTaskInstanceCompletion(input: {taskInstance: $taskInstance}) {
+    taskInstanceCompletion { id }
+  }
+}
+"""
+
+
+def submit_completions(token: str, task_id: int, writes: int):
+    """
+    Runs in a worker process, completes the current instance of the
+    recurring task. Returns counts of completions and errors.
+    """
+    completed, errors, lock_errors = 0, 0, 0
+    client = Client(HTTP_AUTHORIZATION=f"JWT {token}")
+    with override_settings(ALLOWED_HOSTS=["testserver"]):
+        for _ in range(writes):
+            task_instance = TaskInstance.objects.filter(
+                task_id=task_id, completed=False
+            ).latest("id")
+            response = client.post(
+                "/graphql/",
+                {
+                    "query": COMPLETION_MUTATION,
+                    "variables": {"taskInstance": task_instance.id},
+                },
+                content_type="application/json",
+            )
+            result = json.loads(response.content)
+            if result.get("errors"):
+                errors += 1
+                lock_errors += "database is locked" in json.dumps(result["errors"])
+            else:
+                completed += 1
+    connection.close()
+    return completed, errors, lock_errors
+
+
+class Command(BaseCommand):
+    help = (
+        "Submit task completions from several processes to the SQLite "
+        "database and report lock errors and write throughput. Creates "
+        "a user and a team for the test, run it on a copy of the database"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--processes", type=int, default=4)
+        parser.add_argument("--writes", type=int, default=100, help="per process")
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite" or connection.is_in_memory_db():
+            raise CommandError("The default database is not an SQLite file")
+        if not sqlite_writer.is_active():
+            self.stderr.write("SQLITE_PRODUCTION is not enabled")
+
+        user = get_user_model().objects.create_user(username=f"stress-{time.time_ns()}")
+        team = Team.objects.create(name="Stress test", created_by=user)
+        team.members.add(user)
+        # Every process completes its own recurring task
+        tasks = [
+            Task.objects.create(
+                name=f"Task {i}",
+                team=team,
+                base_points_prize=1,
+                refresh_interval=datetime.timedelta(days=1),
+                is_recurring=True,
+                created_by=user,
+            )
+            for i in range(options["processes"])
+        ]
+        token = get_token(user)
+        # Forked processes must not share connections of the parent
+        connections.close_all()
+
+        context = multiprocessing.get_context("fork")
+        start = time.perf_counter()
+        with context.Pool(options["processes"]) as pool:
+            results = pool.starmap(
+                submit_completions,
+                [(token, task.id, options["writes"]) for task in tasks],
+            )
+        elapsed = time.perf_counter() - start
+
+        completed, errors, lock_errors = map(sum, zip(*results))
+        self.stdout.write(
+            f"{completed} completions by {options['processes']} processes "
+            f"in {elapsed:.2f} s ({completed / elapsed:.0f} writes/s), "
+            f"{errors} errors, {lock_errors} lock errors"
+        )
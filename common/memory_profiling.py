@@ -0,0 +1,131 @@
+"""
+Memory profiling of GraphQL operations with tracemalloc.
+
+When ``GRAPHQL_MEMORY_PROFILING["ACTIVE"]`` is set, allocations are traced
+(which slows the worker down noticeably) and for every operation:
+
+- the peak of traced memory above the memory in use at its start is
+  observed by a histogram of the metrics endpoint,
+- memory allocated by resolvers and still in use when they return is
+  counted by field (see common/instrumentation.py),
+- when the peak is the largest seen for the operation, a snapshot is taken
+  at its end, its top allocation sites are exposed as metrics and it is
+  dumped to ``DIRECTORY``. Print or compare the dumps with
+  ``python3 manage.py memorysnapshots``.
+
+The peak of traced memory is global to the process, so operations running
+concurrently in other threads of the worker add to it.
+"""
+
+import contextlib
+import os
+import re
+import threading
+import tracemalloc
+import typing
+
+from django.conf import settings
+
+from common import metrics
+
+PEAK_BUCKETS = tuple(2**power for power in range(16, 31, 2))  # 64 KiB - 1 GiB
+# Operations with snapshots, names of operations are sent by clients
+MAX_OPERATIONS = 100
+
+# Frames of the profiling itself and of imports are not allocation sites
+IGNORED_FILES = (tracemalloc.__file__, "<frozen importlib._bootstrap>", "<unknown>")
+
+peak_memory = metrics.Histogram(
+    "homekeeper_graphql_operation_memory_peak_bytes",
+    "Peak of memory allocated by GraphQL operations.",
+    ["operation", "type"],
+    buckets=PEAK_BUCKETS,
+)
+
+
+class Site(typing.NamedTuple):
+    location: str
+    size: int
+    count: int
+
+
+_largest_peaks: typing.Dict[typing.Tuple[str, str], int] = {}
+_top_sites: typing.Dict[typing.Tuple[str, str], typing.List[Site]] = {}
+_lock = threading.Lock()
+
+
+def is_active() -> bool:
+    return settings.GRAPHQL_MEMORY_PROFILING["ACTIVE"]
+
+
+def filter_snapshot(snapshot: tracemalloc.Snapshot) -> tracemalloc.Snapshot:
+    return snapshot.filter_traces(
+        [tracemalloc.Filter(False, filename) for filename in IGNORED_FILES]
+    )
+
+
+def get_top_sites(snapshot: tracemalloc.Snapshot, limit: int) -> typing.List[Site]:
+    snapshot = filter_snapshot(snapshot)
+    return [
+        Site(
+            f"{statistic.traceback[0].filename}:{statistic.traceback[0].lineno}",
+            statistic.size,
+            statistic.count,
+        )
+        for statistic in snapshot.statistics("lineno")[:limit]
+    ]
+
+
+def get_snapshot_path(operation: str) -> str:
+    directory = settings.GRAPHQL_MEMORY_PROFILING["DIRECTORY"]
+    os.makedirs(directory, exist_ok=True)
+    name = re.sub(r"[^\w-]", "_", operation)[:100]
+    return os.path.join(directory, f"{name}.{os.getpid()}.snapshot")
+
+
+def record_peak(labels: metrics.Labels, peak: int) -> None:
+    peak_memory.observe(peak, **labels)
+    key = (labels["operation"], labels["type"])
+    with _lock:
+        if peak <= _largest_peaks.get(key, 0) or (
+            key not in _largest_peaks and len(_largest_peaks) >= MAX_OPERATIONS
+        ):
+            return
+        _largest_peaks[key] = peak
+
+    snapshot = tracemalloc.take_snapshot()
+    _top_sites[key] = get_top_sites(
+        snapshot, settings.GRAPHQL_MEMORY_PROFILING["TOP_SITES"]
+    )
+    snapshot.dump(get_snapshot_path(labels["operation"]))
+
+
+@contextlib.contextmanager
+def measure(labels: metrics.Labels):
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(settings.GRAPHQL_MEMORY_PROFILING["FRAMES"])
+    start, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    try:
+        yield
+    finally:
+        _, peak = tracemalloc.get_traced_memory()
+        record_peak(labels, max(peak - start, 0))
+
+
+@metrics.register
+def collect_top_sites() -> typing.Iterable[metrics.Metric]:
+    samples = [
+        ("", {"operation": operation, "type": type, "site": site.location}, site.size)
+        for (operation, type), sites in sorted(_top_sites.items())
+        for site in sites
+    ]
+    return [
+        metrics.Metric(
+            "homekeeper_graphql_memory_site_bytes",
+            "gauge",
+            "Memory allocated by the top sites at the end of the operation "
+            "with the largest peak.",
+            samples,
+        )
+    ]
@@ -0,0 +1,222 @@
+"""
+Internal metrics in the Prometheus text format.
+
+Collectors registered with ``register`` are called on every scrape of the
+metrics endpoint (see common.views.metrics_view) and return current values.
+Values that cannot be read at scrape time are accumulated in process-local
+``Counter`` and ``Histogram`` metrics, so no external service is needed;
+every worker process exposes its own values.
+"""
+
+import bisect
+import threading
+import typing
+
+from django.db import connections
+
+Labels = typing.Dict[str, str]
+
+
+class Metric(typing.NamedTuple):
+    name: str
+    type: str  # gauge, counter, histogram
+    help: str
+    samples: typing.List[typing.Tuple[str, Labels, float]]
+
+
+Collector = typing.Callable[[], typing.Iterable[Metric]]
+
+_collectors: typing.List[Collector] = []
+
+
+def register(collector: Collector) -> Collector:
+    if collector not in _collectors:
+        _collectors.append(collector)
+    return collector
+
+
+def format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        (key, value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for key, value in sorted(labels.items())
+    )
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+
+class Counter:
+    """Process-local counter with labels, its name should end with _total."""
+
+    type = "counter"
+    # Series above the limit are merged into one with "_other" label values,
+    # so values sent by clients (e.g. operation names) cannot exhaust memory
+    MAX_SERIES = 1000
+
+    def __init__(self, name: str, help: str, label_names: typing.Sequence[str]):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(label_names)
+        self._series: typing.Dict[tuple, typing.Any] = {}
+        self._lock = threading.Lock()
+        register(self.collect)
+
+    def get_series(self, labels: typing.Dict[str, str]):
+        """Returns the values of the series, call with the lock held."""
+        key = tuple(labels[name] for name in self.label_names)
+        series = self._series.get(key)
+        if series is None:
+            if len(self._series) >= self.MAX_SERIES:
+                key = ("_other",) * len(self.label_names)
+                series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = self.new_series()
+        return series
+
+    def new_series(self):
+        return [0.0]
+
+    def inc(self, value: float = 1, **labels: str) -> None:
+        with self._lock:
+            self.get_series(labels)[0] += value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+    def get_samples(self, labels: Labels, series) -> typing.List[tuple]:
+        return [("", labels, series[0])]
+
+    def collect(self) -> typing.List[Metric]:
+        with self._lock:
+            items = [(key, list(series)) for key, series in self._series.items()]
+        samples = []
+        for key, series in sorted(items):
+            samples.extend(self.get_samples(dict(zip(self.label_names, key)), series))
+        return [Metric(self.name, self.type, self.help, samples)]
+
+
+class Histogram(Counter):
+    """Process-local histogram with labels and cumulative buckets."""
+
+    type = "histogram"
+    # Seconds
+    DEFAULT_BUCKETS = (
+        0.001,
+        0.0025,
+        0.005,
+        0.01,
+        0.025,
+        0.05,
+        0.1,
+        0.25,
+        0.5,
+        1,
+        2.5,
+        5,
+        10,
+    )
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        label_names: typing.Sequence[str],
+        buckets: typing.Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, help, label_names)
+
+    def new_series(self):
+        # Counts of every bucket and of +Inf, then the sum
+        return [0] * (len(self.buckets) + 1) + [0.0]
+
+    def observe(self, value: float, **labels: str) -> None:
+        with self._lock:
+            series = self.get_series(labels)
+            series[bisect.bisect_left(self.buckets, value)] += 1
+            series[-1] += value
+
+    def get_samples(self, labels: Labels, series) -> typing.List[tuple]:
+        bounds = [f"{bound:g}" for bound in self.buckets] + ["+Inf"]
+        samples = []
+        count = 0
+        for bound, bucket_count in zip(bounds, series):
+            count += bucket_count
+            samples.append(("_bucket", {**labels, "le": bound}, count))
+        samples.append(("_sum", labels, series[-1]))
+        samples.append(("_count", labels, count))
+        return samples
+
+
+def render() -> str:
+    lines = []
+    for collector in _collectors:
+        for metric in collector():
+            if not metric.samples:
+                continue
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for suffix, labels, value in metric.samples:
+                lines.append(f"{metric.name}{suffix}{format_labels(labels)} {value:g}")
+    return "\n".join(lines) + "\n"
+
+
+@register
+def collect_pool_metrics() -> typing.Iterable[Metric]:
+    """Statistics of psycopg connection pools (DATABASE_POOL=True)."""
+    connections_by_state = Metric(
+        "homekeeper_db_pool_connections",
+        "gauge",
+        "Connections of the pool by state.",
+        [],
+    )
+    max_size = Metric(
+        "homekeeper_db_pool_max_connections", "gauge", "Maximum size of the pool.", []
+    )
+    waiting = Metric(
+        "homekeeper_db_pool_requests_waiting",
+        "gauge",
+        "Requests waiting for a connection.",
+        [],
+    )
+    requests = Metric(
+        "homekeeper_db_pool_requests_total",
+        "counter",
+        "Connections requested from the pool.",
+        [],
+    )
+    wait_time = Metric(
+        "homekeeper_db_pool_wait_seconds_total",
+        "counter",
+        "Time spent waiting for a connection.",
+        [],
+    )
+    errors = Metric(
+        "homekeeper_db_pool_errors_total",
+        "counter",
+        "Connection requests that failed or timed out.",
+        [],
+    )
+
+    for alias in connections:
+        pool = getattr(connections[alias], "pool", None)
+        if pool is None:
+            continue
+        stats = pool.get_stats()
+        labels = {"database": alias}
+        size = stats.get("pool_size", 0)
+        available = stats.get("pool_available", 0)
+        connections_by_state.samples.extend(
+            [
+                ("", {**labels, "state": "in_use"}, size - available),
+                ("", {**labels, "state": "idle"}, available),
+            ]
+        )
+        max_size.samples.append(("", labels, stats.get("pool_max", 0)))
+        waiting.samples.append(("", labels, stats.get("requests_waiting", 0)))
+        requests.samples.append(("", labels, stats.get("requests_num", 0)))
+        wait_time.samples.append(("", labels, stats.get("requests_wait_ms", 0) / 1000))
+        errors.samples.append(("", labels, stats.get("requests_errors", 0)))
+
+    return [connections_by_state, max_size, waiting, requests, wait_time, errors]
@@ -47,3 +47,39 @@ class ViewConfigurationFieldsMixin(models.Model):
 
     class Meta:
         abstract = True
+
+
+class IdempotencyKey(models.Model):
+    """
+    Stored response of a mutation sent with an Idempotency-Key, so that
+    a retried request gets the same response without being executed again.
+    """
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    key = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64)
+    # Empty until the mutation finishes
+    response = models.TextField(null=True, blank=True)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    # When the key was claimed, starts the lease of an unfinished request
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "key"], name="unique_user_idempotency_key"
+            )
+        ]
+
+
+class CacheInvalidation(models.Model):
+    """
+    Invalidation broadcast to other workers by common.invalidation.PollingBus,
+    used when the database has no LISTEN/NOTIFY (SQLite).
+    """
+
+    kind = models.CharField(max_length=64)
+    keys = models.JSONField()
+    origin = models.CharField(max_length=32)
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
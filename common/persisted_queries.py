@@ -0,0 +1,167 @@
+"""
+Automatic persisted queries (APQ) and parsed document caching.
+
+Clients may send only ``extensions.persistedQuery.sha256Hash`` instead of the
+full query text. On a miss the server answers with ``PersistedQueryNotFound``
+and the client resends the query together with its hash, which is then stored.
+In strict mode only queries from the pre-registered allowlist are executed, see
+``python manage.py dumppersistedqueries``.
+"""
+import functools
+import hashlib
+import json
+import typing
+
+from django.conf import settings
+from django.core.cache import cache
+from graphql import GraphQLError, GraphQLSchema, parse, validate
+from graphql.language import DocumentNode
+
+from graphene_django.settings import graphene_settings
+
+PERSISTED_QUERY_CACHE_PREFIX = "apq:"
+
+NOT_FOUND_MESSAGE = "PersistedQueryNotFound"
+NOT_ALLOWED_MESSAGE = "PersistedQueryNotAllowed"
+
+
+class PersistedQueryError(Exception):
+    """
+    Error that is reported to the client in the GraphQL ``errors`` list
+    (with HTTP 200), so that APQ aware clients can react to it.
+    """
+
+    def __init__(self, message: str, code: str):
+        super().__init__(message)
+        self.code = code
+
+    def to_graphql_error(self) -> GraphQLError:
+        return GraphQLError(str(self), extensions={"code": self.code})
+
+    @property
+    def formatted(self) -> dict:
+        return self.to_graphql_error().formatted
+
+
+class PersistedQueryNotFound(PersistedQueryError):
+    def __init__(self):
+        super().__init__(NOT_FOUND_MESSAGE, "PERSISTED_QUERY_NOT_FOUND")
+
+
+class PersistedQueryNotAllowed(PersistedQueryError):
+    def __init__(self):
+        super().__init__(NOT_ALLOWED_MESSAGE, "PERSISTED_QUERY_NOT_ALLOWED")
+
+
+def query_hash(query: str) -> str:
+    return hashlib.sha256(query.encode("utf-8")).hexdigest()
+
+
+def get_settings() -> dict:
+    return getattr(settings, "GRAPHQL_PERSISTED_QUERIES", {})
+
+
+def is_strict() -> bool:
+    return bool(get_settings().get("STRICT", False))
+
+
+def get_allowlist() -> typing.Dict[str, str]:
+    path = get_settings().get("ALLOWLIST_PATH")
+    return _load_allowlist(str(path)) if path else {}
+
+
+@functools.lru_cache(maxsize=None)
+def _load_allowlist(path: str) -> typing.Dict[str, str]:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def get_persisted_query(sha256_hash: str) -> typing.Optional[str]:
+    allowlist = get_allowlist()
+    if sha256_hash in allowlist:
+        return allowlist[sha256_hash]
+    if is_strict():
+        return None
+    return cache.get(PERSISTED_QUERY_CACHE_PREFIX + sha256_hash)
+
+
+def get_extensions(request, data) -> dict:
+    extensions = request.GET.get("extensions") or data.get("extensions") or {}
+    if isinstance(extensions, str):
+        try:
+            extensions = json.loads(extensions)
+        except ValueError:
+            raise ValueError("Extensions are invalid JSON.")
+    return extensions
+
+
+def resolve_query(query: typing.Optional[str], extensions: dict) -> typing.Optional[str]:
+    """
+    Returns the query text that should be executed for the given request.
+
+    Raises:
+        PersistedQueryError: when the client should (re)send the query text
+            or the query is not allowlisted in strict mode.
+        ValueError: when the persisted query extension is malformed.
+    """
+    persisted_query = extensions.get("persistedQuery")
+    if not persisted_query:
+        if query and is_strict() and query_hash(query) not in get_allowlist():
+            raise PersistedQueryNotAllowed()
+        return query
+
+    if persisted_query.get("version") != 1:
+        raise ValueError("Unsupported persisted query version.")
+    sha256_hash = persisted_query.get("sha256Hash")
+    if not sha256_hash:
+        raise ValueError("Persisted query is missing sha256Hash.")
+
+    if not query:
+        query = get_persisted_query(sha256_hash)
+        if query is None:
+            raise PersistedQueryNotAllowed() if is_strict() else PersistedQueryNotFound()
+        return query
+
+    if query_hash(query) != sha256_hash:
+        raise ValueError("Provided sha256Hash does not match query.")
+    if is_strict():
+        if sha256_hash not in get_allowlist():
+            raise PersistedQueryNotAllowed()
+    else:
+        cache.set(PERSISTED_QUERY_CACHE_PREFIX + sha256_hash, query, timeout=None)
+    return query
+
+
+@functools.lru_cache(maxsize=512)
+def parse_and_validate(
+    schema: GraphQLSchema, query: str, validation_rules: typing.Optional[tuple] = None
+) -> typing.Tuple[typing.Optional[DocumentNode], typing.List[GraphQLError]]:
+    """
+    Parses and validates the query once per schema, subsequent calls with
+    the same query text reuse the cached document.
+    """
+    try:
+        document = parse(query)
+    except GraphQLError as e:
+        return None, [e]
+
+    validation_errors = validate(
+        schema,
+        document,
+        validation_rules,
+        graphene_settings.MAX_VALIDATION_ERRORS,
+    )
+    if validation_errors:
+        return None, validation_errors
+    return document, []
+
+
+def warm_document_cache(schema: GraphQLSchema) -> int:
+    """Parses all allowlisted queries up front, returns the number of documents."""
+    allowlist = get_allowlist()
+    for query in allowlist.values():
+        parse_and_validate(schema, query)
+    return len(allowlist)
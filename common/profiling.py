@@ -0,0 +1,147 @@
+"""
+Profiling of GraphQL requests on demand.
+
+A request is profiled when a staff user sends the ``X-Profile`` header
+(``cprofile`` or ``sampling``, any other value selects the default
+profiler) or when it is picked with ``GRAPHQL_PROFILING["SAMPLE_RATE"]``.
+Profiles are written to ``GRAPHQL_PROFILING["DIRECTORY"]`` named by the
+operation:
+
+- ``cprofile`` writes ``.prof`` files of cProfile (only one profile can be
+  collected at a time in a process, concurrent requests are not profiled),
+- ``sampling`` samples the stack of the request thread every
+  ``SAMPLING_INTERVAL`` seconds and writes ``.collapsed`` stacks, which can
+  be read by flame graph tools.
+
+Merge them and print the top functions with ``python3 manage.py mergeprofiles``.
+"""
+
+import cProfile
+import collections
+import contextlib
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+import typing
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+PROFILERS = ("cprofile", "sampling")
+
+
+class SamplingProfiler:
+    """Samples the stack of the thread that started it from another thread."""
+
+    extension = "collapsed"
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.samples: typing.Counter[str] = collections.Counter()
+        self._stopped = threading.Event()
+        self._thread_id: typing.Optional[int] = None
+        self._thread: typing.Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._thread_id = threading.get_ident()
+        self._thread = threading.Thread(
+            target=self.run, name="sampling-profiler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._thread.join()
+
+    def run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is not None:
+                self.samples[collapse(frame)] += 1
+
+    def dump(self, path: str) -> None:
+        with open(path, "w") as f:
+            for stack, count in self.samples.items():
+                f.write(f"{stack} {count}\n")
+
+
+class CProfileProfiler:
+    extension = "prof"
+
+    def __init__(self):
+        self.profile = cProfile.Profile()
+
+    def start(self) -> None:
+        self.profile.enable()
+
+    def stop(self) -> None:
+        self.profile.disable()
+
+    def dump(self, path: str) -> None:
+        self.profile.dump_stats(path)
+
+
+def collapse(frame) -> str:
+    """Returns the stack of the frame as semicolon separated functions, root first."""
+    functions = []
+    while frame is not None:
+        code = frame.f_code
+        functions.append(f"{frame.f_globals.get('__name__', '?')}:{code.co_qualname}")
+        frame = frame.f_back
+    return ";".join(reversed(functions))
+
+
+def get_profiler_name(request, get_user: typing.Callable) -> typing.Optional[str]:
+    """
+    Returns the profiler requested by a staff user or picked by sampling,
+    ``get_user`` authenticates the request when the header is sent.
+    """
+    default = settings.GRAPHQL_PROFILING["PROFILER"]
+    requested = request.META.get("HTTP_X_PROFILE")
+    if requested:
+        user = get_user()
+        if user is not None and user.is_staff:
+            return requested if requested in PROFILERS else default
+    sample_rate = settings.GRAPHQL_PROFILING["SAMPLE_RATE"]
+    if sample_rate and random.random() < sample_rate:
+        return default
+    return None
+
+
+def get_path(operation_name: str, extension: str) -> str:
+    directory = settings.GRAPHQL_PROFILING["DIRECTORY"]
+    os.makedirs(directory, exist_ok=True)
+    name = re.sub(r"[^\w-]", "_", operation_name)[:100]
+    return os.path.join(directory, f"{name}.{time.time_ns()}.{os.getpid()}.{extension}")
+
+
+@contextlib.contextmanager
+def profile(profiler_name: typing.Optional[str], operation_name: str):
+    if profiler_name is None:
+        yield
+        return
+
+    if profiler_name == "sampling":
+        profiler = SamplingProfiler(settings.GRAPHQL_PROFILING["SAMPLING_INTERVAL"])
+    else:
+        profiler = CProfileProfiler()
+    try:
+        profiler.start()
+    except ValueError:
+        # Another request of the process is being profiled with cProfile
+        logger.info("Skipped profiling of %s", operation_name)
+        yield
+        return
+
+    try:
+        yield
+    finally:
+        profiler.stop()
+        path = get_path(operation_name, profiler.extension)
+        profiler.dump(path)
+        logger.info("Profile of %s written to %s", operation_name, path)
@@ -0,0 +1,122 @@
+"""
+Publish/subscribe backends for GraphQL subscriptions.
+
+Messages are published from synchronous code (usually in
+``transaction.on_commit`` callbacks) and consumed by subscriptions running
+in the event loop of the ASGI server. ``InProcessBackend`` delivers messages
+to subscribers of the same process only, ``PostgresBackend`` shares them
+between workers and nodes with LISTEN/NOTIFY. The backend is selected with
+``GRAPHQL_SUBSCRIPTIONS["BACKEND"]``.
+"""
+
+import asyncio
+import collections
+import functools
+import json
+import logging
+import threading
+import typing
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from common import listen_notify
+
+logger = logging.getLogger(__name__)
+
+# Messages queued for a subscriber that does not keep up are dropped
+QUEUE_SIZE = 100
+
+
+class InProcessBackend:
+    def __init__(self):
+        self._subscribers: typing.DefaultDict[
+            str, typing.Set[typing.Tuple[asyncio.AbstractEventLoop, asyncio.Queue]]
+        ] = collections.defaultdict(set)
+        self._lock = threading.Lock()
+
+    def publish(self, channel: str, message: dict) -> None:
+        self.deliver(channel, message)
+
+    def deliver(self, channel: str, message: dict) -> None:
+        """Passes the message to subscribers of this process, thread-safe."""
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(self._put, queue, message)
+            except RuntimeError:
+                # Event loop of the subscriber is closed
+                pass
+
+    @staticmethod
+    def _put(queue: asyncio.Queue, message: dict) -> None:
+        try:
+            queue.put_nowait(message)
+        except asyncio.QueueFull:
+            logger.warning("Subscriber does not keep up, dropping a message")
+
+    def subscribers_count(self, channel: str) -> int:
+        with self._lock:
+            return len(self._subscribers.get(channel, ()))
+
+    async def subscribe(self, channel: str) -> typing.AsyncIterator[dict]:
+        subscriber = (asyncio.get_running_loop(), asyncio.Queue(QUEUE_SIZE))
+        with self._lock:
+            self._subscribers[channel].add(subscriber)
+        self.on_subscribe(channel)
+        try:
+            while True:
+                yield await subscriber[1].get()
+        finally:
+            with self._lock:
+                self._subscribers[channel].discard(subscriber)
+                if not self._subscribers[channel]:
+                    del self._subscribers[channel]
+
+    def on_subscribe(self, channel: str) -> None:
+        pass
+
+
+class PostgresBackend(InProcessBackend):
+    """
+    Publishes messages with NOTIFY, so they are delivered to subscribers
+    of all processes connected to the database. Each process LISTENs in
+    a daemon thread started on the first subscription.
+    """
+
+    NOTIFY_CHANNEL = "homekeeper_pubsub"
+
+    def __init__(self):
+        super().__init__()
+        self.listener = listen_notify.PostgresListener(
+            self.NOTIFY_CHANNEL, self.on_notify
+        )
+
+    def publish(self, channel: str, message: dict) -> None:
+        listen_notify.notify(
+            self.NOTIFY_CHANNEL, json.dumps({"channel": channel, "message": message})
+        )
+
+    def on_subscribe(self, channel: str) -> None:
+        self.listener.start()
+
+    def on_notify(self, payload: str) -> None:
+        try:
+            data = json.loads(payload)
+            self.deliver(data["channel"], data["message"])
+        except (ValueError, KeyError):
+            logger.warning("Invalid pub/sub payload %s", payload)
+
+
+@functools.lru_cache(maxsize=None)
+def get_backend() -> InProcessBackend:
+    return import_string(settings.GRAPHQL_SUBSCRIPTIONS["BACKEND"])()
+
+
+def publish(channel: str, message: dict) -> None:
+    get_backend().publish(channel, message)
+
+
+def subscribe(channel: str) -> typing.AsyncIterator[dict]:
+    return get_backend().subscribe(channel)
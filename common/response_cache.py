@@ -0,0 +1,149 @@
+"""
+Response cache for read-only queries polled by clients.
+
+Responses are cached per user and keyed by the operation, its variables,
+the user's membership version and data versions of all user's teams (see
+``teams.versions``). Any write to team data bumps the team version, so stale
+entries are never read again and simply expire. Entries expire no later than
+the next prize step or task instance activation, which change responses
+without any write.
+"""
+import hashlib
+import json
+import math
+import typing
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.http import quote_etag
+from django.utils.timezone import now
+from graphql import ExecutionResult, OperationType
+from graphql.language import FieldNode, OperationDefinitionNode
+
+from common.persisted_queries import query_hash
+from tasks.models import TaskInstance
+from teams import versions
+
+RESPONSE_CACHE_PREFIX = "response:"
+NEXT_CHANGE_KEY = "team-next-change:{}:{}"
+
+MISSING = object()
+
+
+def get_settings() -> dict:
+    return getattr(settings, "GRAPHQL_RESPONSE_CACHE", {})
+
+
+def is_cacheable(operation_ast: typing.Optional[OperationDefinitionNode]) -> bool:
+    """Tells whether the operation is a query selecting cacheable root fields only."""
+    response_cache_settings = get_settings()
+    if not response_cache_settings.get("ACTIVE", False):
+        return False
+    if operation_ast is None or operation_ast.operation != OperationType.QUERY:
+        return False
+
+    fields = set(response_cache_settings.get("FIELDS", ()))
+    selections = operation_ast.selection_set.selections
+    return bool(selections) and all(
+        isinstance(selection, FieldNode) and selection.name.value in fields
+        for selection in selections
+    )
+
+
+def get_cache_key(
+    user_id: int,
+    query: str,
+    operation_name: typing.Optional[str],
+    variables: typing.Optional[dict],
+    team_versions: typing.Dict[int, int],
+) -> str:
+    key = json.dumps(
+        [
+            query_hash(query),
+            operation_name,
+            variables or {},
+            user_id,
+            versions.get_membership_version(user_id),
+            sorted(team_versions.items()),
+        ],
+        sort_keys=True,
+        default=str,
+    )
+    return RESPONSE_CACHE_PREFIX + hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+def get_next_change_at(team_id: int, team_version: int) -> typing.Optional[float]:
+    """
+    Returns a timestamp of the next moment at which cached data of the team
+    becomes stale without any write (see TaskInstance.next_change_at).
+    The result is cached until the team version changes or the moment passes.
+    """
+    key = NEXT_CHANGE_KEY.format(team_id, team_version)
+    next_change_at = cache.get(key, MISSING)
+    if next_change_at is MISSING or (
+        next_change_at is not None and next_change_at <= now().timestamp()
+    ):
+        next_change = TaskInstance.next_change_at(team_id)
+        next_change_at = next_change.timestamp() if next_change else None
+        cache.set(key, next_change_at, timeout=get_settings().get("TIMEOUT", 300))
+    return next_change_at
+
+
+def get_timeout(team_versions: typing.Dict[int, int]) -> int:
+    """
+    Returns for how many seconds responses concerning the given teams stay
+    valid: the configured timeout capped by the next prize step or activation.
+    """
+    timeout = get_settings().get("TIMEOUT", 300)
+    for team_id, team_version in team_versions.items():
+        next_change_at = get_next_change_at(team_id, team_version)
+        if next_change_at is not None:
+            timeout = min(timeout, math.floor(next_change_at - now().timestamp()))
+    return max(timeout, 0)
+
+
+def get_team_versions(user_id: int) -> typing.Dict[int, int]:
+    return versions.get_team_versions(versions.get_user_team_ids(user_id))
+
+
+def get_etag(cache_key: str, team_versions: typing.Dict[int, int]) -> str:
+    """
+    Returns a strong ETag of the response, computed from versions only so it
+    can be compared without executing the operation. Moments of the next
+    prize step or activation are included, since they change the response too.
+    """
+    next_changes = [
+        get_next_change_at(team_id, team_version)
+        for team_id, team_version in sorted(team_versions.items())
+    ]
+    etag = json.dumps([cache_key, next_changes])
+    return quote_etag(hashlib.sha256(etag.encode("utf-8")).hexdigest())
+
+
+def get_or_execute(
+    cache_key: str,
+    team_versions: typing.Dict[int, int],
+    execute: typing.Callable[[], ExecutionResult],
+) -> typing.Tuple[ExecutionResult, int]:
+    """
+    Returns the cached response data, calls ``execute`` on a miss.
+    Results with errors are not cached.
+
+    Returns:
+        The result and number of seconds for which it stays valid.
+    """
+    cached = cache.get(cache_key)
+    if cached is not None:
+        data, expires_at = cached
+        return ExecutionResult(data=data), max(
+            math.floor(expires_at - now().timestamp()), 0
+        )
+
+    result = execute()
+    if result.errors:
+        return result, 0
+
+    timeout = get_timeout(team_versions)
+    if timeout > 0:
+        cache.set(cache_key, (result.data, now().timestamp() + timeout), timeout=timeout)
+    return result, timeout
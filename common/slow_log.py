@@ -0,0 +1,135 @@
+"""
+Log of slow GraphQL operations.
+
+Operations running longer than ``GRAPHQL_SLOW_LOG["THRESHOLD"]`` seconds are
+logged as JSON lines to a rotating file with the operation name, the shape
+of its variables (types rather than values, which may be personal data)
+and every SQL statement it ran with its timing and the resolver that ran it.
+The slowest SELECT statements are explained (``EXPLAIN ANALYZE`` on
+PostgreSQL when ``EXPLAIN_ANALYZE`` is enabled, which runs them again,
+except for SELECT ... FOR UPDATE/SHARE, which would take the row locks again).
+Statements are captured by common.instrumentation; summarize the log with
+``python3 manage.py slowoperations``.
+
+Every worker appends to the same file, records may be lost when several
+of them rotate it at once.
+"""
+
+import datetime
+import functools
+import json
+import logging
+import re
+import typing
+from logging.handlers import RotatingFileHandler
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+
+LOCKING_CLAUSE = re.compile(
+    r"\bFOR\s+(?:NO\s+KEY\s+UPDATE|UPDATE|KEY\s+SHARE|SHARE)\b", re.IGNORECASE
+)
+
+
+class Statement(typing.NamedTuple):
+    sql: str
+    params: typing.Any
+    duration: float
+    database: str
+    field: typing.Optional[str]
+
+
+def get_threshold() -> typing.Optional[float]:
+    """Returns the threshold in seconds, None when the log is disabled."""
+    return settings.GRAPHQL_SLOW_LOG["THRESHOLD"]
+
+
+@functools.lru_cache(maxsize=None)
+def get_logger(path: str) -> logging.Logger:
+    # Not registered with the logging module, records do not reach other handlers
+    slow_logger = logging.Logger(f"{__name__}:{path}")
+    handler = RotatingFileHandler(
+        path,
+        maxBytes=settings.GRAPHQL_SLOW_LOG["MAX_BYTES"],
+        backupCount=settings.GRAPHQL_SLOW_LOG["BACKUP_COUNT"],
+        encoding="utf-8",
+        delay=True,
+    )
+    slow_logger.addHandler(handler)
+    return slow_logger
+
+
+def get_shape(value) -> typing.Any:
+    """Returns the value with types in place of scalars."""
+    if isinstance(value, dict):
+        return {key: get_shape(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [get_shape(item) for item in value[:1]] + (
+            [f"... {len(value)} items"] if len(value) > 1 else []
+        )
+    return type(value).__name__
+
+
+def get_explain_prefix(vendor: str, sql: str) -> typing.Optional[str]:
+    if vendor == "postgresql":
+        # ANALYZE runs the statement, locking reads would take the row locks again
+        analyze = settings.GRAPHQL_SLOW_LOG["EXPLAIN_ANALYZE"] and (
+            not LOCKING_CLAUSE.search(sql)
+        )
+        return "EXPLAIN ANALYZE " if analyze else "EXPLAIN "
+    if vendor == "sqlite":
+        return "EXPLAIN QUERY PLAN "
+    return None
+
+
+def explain(statement: Statement) -> typing.Optional[str]:
+    """Returns the plan of a SELECT statement."""
+    if not statement.sql.lstrip().upper().startswith("SELECT"):
+        return None
+    connection = connections[statement.database]
+    prefix = get_explain_prefix(connection.vendor, statement.sql)
+    if prefix is None:
+        return None
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(prefix + statement.sql, statement.params)
+            return "\n".join(
+                " ".join(str(column) for column in row) for row in cursor.fetchall()
+            )
+    except DatabaseError as e:
+        return f"EXPLAIN failed: {e}"
+
+
+def log_operation(
+    labels: typing.Dict[str, str],
+    variables: typing.Optional[dict],
+    duration: float,
+    statements: typing.List[Statement],
+) -> None:
+    slowest = sorted(
+        range(len(statements)), key=lambda i: statements[i].duration, reverse=True
+    )[: settings.GRAPHQL_SLOW_LOG["EXPLAINED_STATEMENTS"]]
+    plans = {i: explain(statements[i]) for i in slowest}
+    record = {
+        "time": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        **labels,
+        "duration": duration,
+        "variables": get_shape(variables or {}),
+        "sql_queries": len(statements),
+        "sql_duration": sum(statement.duration for statement in statements),
+        "statements": [
+            {
+                "sql": statement.sql,
+                "duration": statement.duration,
+                "database": statement.database,
+                "field": statement.field,
+                **({"plan": plans[i]} if plans.get(i) else {}),
+            }
+            for i, statement in enumerate(
+                statements[: settings.GRAPHQL_SLOW_LOG["MAX_STATEMENTS"]]
+            )
+        ],
+    }
+    get_logger(str(settings.GRAPHQL_SLOW_LOG["PATH"])).warning(
+        json.dumps(record, default=str)
+    )
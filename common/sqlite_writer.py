@@ -0,0 +1,68 @@
+"""
+Serialized writes for SQLite in production (``SQLITE_PRODUCTION=True``).
+
+SQLite allows a single writer at a time. In production mode connections use
+WAL, so readers do not block the writer, and transactions begin IMMEDIATE
+(see homekeeper/settings.py), so the database lock is taken at BEGIN rather
+than upgraded in the middle of a transaction, which SQLite cannot wait for.
+Mutations of a worker wait for a process-local lock instead of contending
+for the database lock, and when another process holds it for longer than
+``busy_timeout``, the rolled back mutation is retried with exponential backoff.
+"""
+
+import random
+import threading
+import time
+import typing
+
+from django.conf import settings
+from django.db import OperationalError, connection
+
+T = typing.TypeVar("T")
+
+_lock = threading.Lock()
+
+
+def is_active() -> bool:
+    return settings.SQLITE_WRITER["ACTIVE"] and connection.vendor == "sqlite"
+
+
+def is_lock_error(error: BaseException) -> bool:
+    return isinstance(error, OperationalError) and "database is locked" in str(error)
+
+
+def find_lock_error(
+    errors: typing.Optional[typing.Iterable[Exception]],
+) -> typing.Optional[OperationalError]:
+    """Returns the lock error among GraphQL errors of an execution result."""
+    for error in errors or ():
+        original_error = getattr(error, "original_error", error)
+        if is_lock_error(original_error):
+            return original_error
+    return None
+
+
+def get_backoff(attempt: int) -> float:
+    """Seconds to wait before the next attempt, with jitter."""
+    return settings.SQLITE_WRITER["BACKOFF"] * 2**attempt * random.uniform(0.5, 1)
+
+
+def run(write: typing.Callable[[], T]) -> T:
+    """
+    Runs the transaction ``write`` serialized with other writes of this
+    process, retrying it when the database is locked. ``write`` must roll
+    back before raising the lock error, e.g. by raising it out of an atomic
+    block. Calls it directly when the production mode is not active.
+    """
+    if not is_active():
+        return write()
+
+    with _lock:
+        for attempt in range(settings.SQLITE_WRITER["RETRIES"]):
+            try:
+                return write()
+            except OperationalError as e:
+                if not is_lock_error(e):
+                    raise
+            time.sleep(get_backoff(attempt))
+        return write()
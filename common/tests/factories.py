@@ -125,3 +125,5 @@ class TaskInstanceCompletionFactory(TrackingFieldsMixinFactory):
 
     task_instance = factory.SubFactory(TaskInstanceFactory)
     user_who_completed_task = factory.SubFactory(UserFactoryNoSignals)
+    # Points and the next instance are computed from the time of the completion
+    created_at = factory.LazyFunction(lambda: timezone.now())
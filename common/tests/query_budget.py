@@ -0,0 +1,101 @@
+"""
+Query budgets of GraphQL fields, catching N+1 queries that tests of
+results can't see.
+
+A budget test creates the given number of rows and returns the operation
+to run; ``query_budget`` runs it at two sizes of the data and fails when
+the operation runs more queries than the budget or when the number of
+queries grows with the number of rows more than allowed::
+
+    class TaskBudgetTestCase(QueryBudgetTestCase):
+        @query_budget("Query.tasks", queries=5)
+        def test_tasks(self, rows):
+            factories.TaskFactory.create_batch(rows, team=self.team)
+            return TASKS, {"teamId": self.team.id}
+"""
+
+import functools
+import typing
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from graphene_django.utils.testing import GraphQLTestCase
+from graphql_jwt.shortcuts import get_token
+
+from common.tests import factories
+
+SIZES = (2, 6)
+
+# Fields with budgets, e.g. "Query.tasks", see test_query_budget.py
+budgeted_fields: typing.Set[str] = set()
+
+Operation = typing.Tuple[str, typing.Optional[dict]]
+
+
+def query_budget(field: str, queries: int, per_row: int = 0):
+    """
+    Decorates a test method taking the number of rows to create and
+    returning the query document and its variables. The operation may run
+    ``queries`` queries at the smaller size and ``per_row`` queries more
+    for every additional row.
+    """
+
+    def decorator(create: typing.Callable[[typing.Any, int], Operation]):
+        @functools.wraps(create)
+        def test(self):
+            captured = [self.capture_queries(create, rows) for rows in SIZES]
+            small, large = captured
+            details = "\n".join(
+                f"{rows} rows:\n" + "\n".join(query["sql"] for query in queries)
+                for rows, queries in zip(SIZES, captured)
+            )
+            self.assertLessEqual(
+                len(small),
+                queries,
+                f"{field} runs {len(small)} queries with {SIZES[0]} rows, "
+                f"the budget is {queries}\n{details}",
+            )
+            self.assertLessEqual(
+                len(large) - len(small),
+                per_row * (SIZES[1] - SIZES[0]),
+                f"{field} runs {len(small)} queries with {SIZES[0]} rows and "
+                f"{len(large)} with {SIZES[1]}, the budget is {per_row} per row"
+                f"\n{details}",
+            )
+
+        budgeted_fields.add(field)
+        return test
+
+    return decorator
+
+
+@override_settings(
+    GRAPHQL_RESPONSE_CACHE={**settings.GRAPHQL_RESPONSE_CACHE, "ACTIVE": False}
+)
+class QueryBudgetTestCase(GraphQLTestCase):
+    """Runs operations through the GraphQL view as a member of a team."""
+
+    GRAPHQL_URL = "/graphql/"
+
+    def setUp(self):
+        self.user = factories.UserFactory()
+        self.team = factories.TeamFactory(members=[self.user])
+
+    def capture_queries(self, create, rows: int) -> CaptureQueriesContext:
+        # Rolled back, so both sizes start from the data of setUp
+        with transaction.atomic():
+            query, variables = create(self, rows)
+            with CaptureQueriesContext(connection) as queries:
+                response = self.query(
+                    query,
+                    variables=variables,
+                    headers={"Authorization": f"JWT {get_token(self.user)}"},
+                )
+            self.assertResponseNoErrors(response)
+            for payload in response.json()["data"].values():
+                if isinstance(payload, dict):
+                    self.assertFalse(payload.get("errors"), payload)
+            transaction.set_rollback(True)
+        return queries
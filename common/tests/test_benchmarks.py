@@ -0,0 +1,127 @@
+import contextlib
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+
+from common import benchmarks
+from common.management.commands import benchmarkfastlists, benchmarkgraphql
+
+TINY_DATASET = {"teams": 2, "members": 2, "tasks": 5, "months": 1}
+
+
+@mock.patch.dict(benchmarks.DATASETS, {"small": TINY_DATASET})
+@mock.patch.object(
+    benchmarkgraphql.Command, "test_database", lambda self: contextlib.nullcontext()
+)
+class BenchmarkCommandTestCase(TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.baseline = os.path.join(directory, "baseline.json")
+
+    def benchmark(self, **options):
+        out = StringIO()
+        call_command(
+            "benchmarkgraphql",
+            datasets=["small"],
+            iterations=2,
+            warmup=1,
+            baseline=self.baseline,
+            stdout=out,
+            stderr=StringIO(),
+            **options,
+        )
+        return out.getvalue()
+
+    def test_save_and_compare(self):
+        output = self.benchmark(save=True)
+
+        with open(self.baseline) as f:
+            baseline = json.load(f)
+        results = baseline["datasets"]["small"]
+        self.assertCountEqual(
+            results, [operation.name for operation in benchmarks.OPERATIONS]
+        )
+        for name, measured in results.items():
+            self.assertGreater(measured["queries"], 0, name)
+            self.assertGreater(measured["memory"], 0, name)
+            self.assertLessEqual(measured["p50"], measured["p99"], name)
+        self.assertIn("submitTaskInstanceCompletion", output)
+
+    def benchmark_against_baseline(self, **measured):
+        results = {
+            "tasks": {"p50": 10.0, "p95": 12.0, "p99": 13.0, "queries": 5, "memory": 1}
+        }
+        with open(self.baseline, "w") as f:
+            json.dump(
+                {"database": connection.vendor, "datasets": {"small": results}}, f
+            )
+        results = {"tasks": {**results["tasks"], **measured}}
+        with mock.patch.object(benchmarks, "run", return_value=results):
+            return self.benchmark()
+
+    def test_no_regressions(self):
+        output = self.benchmark_against_baseline(p50=11.0)
+        self.assertRegex(output, r"tasks +11.0 +12.0 +13.0 +5 +0 +10.0")
+
+    def test_regressions_fail(self):
+        with self.assertRaisesRegex(CommandError, "small tasks: queries 5 -> 6"):
+            self.benchmark_against_baseline(queries=6)
+
+    def test_baseline_of_other_database(self):
+        with open(self.baseline, "w") as f:
+            json.dump({"database": "oracle", "datasets": {}}, f)
+        with self.assertRaisesRegex(CommandError, "recorded on oracle"):
+            self.benchmark()
+
+
+class CompareTestCase(SimpleTestCase):
+    baseline = {
+        "small": {"tasks": {"p50": 10.0, "p95": 12.0, "queries": 5, "memory": 10**6}}
+    }
+
+    def compare(self, **measured):
+        results = {"small": {"tasks": {**self.baseline["small"]["tasks"], **measured}}}
+        return benchmarks.compare(self.baseline, results, tolerance=0.2)
+
+    def test_within_tolerance(self):
+        self.assertEqual(self.compare(p50=11.9, p95=100.0, memory=1.1 * 10**6), [])
+        self.assertEqual(self.compare(queries=4), [])
+
+    def test_regressions(self):
+        self.assertEqual(self.compare(p50=12.5), ["small tasks: p50 10.0 -> 12.5"])
+        self.assertEqual(self.compare(queries=6), ["small tasks: queries 5 -> 6"])
+        self.assertEqual(
+            self.compare(memory=2 * 10**6), ["small tasks: memory 1000000 -> 2000000"]
+        )
+
+    def test_small_increases_are_noise(self):
+        baseline = {"small": {"tasks": {"p50": 1.0, "queries": 5, "memory": 1000}}}
+        results = {"small": {"tasks": {"p50": 1.9, "queries": 5, "memory": 50000}}}
+        self.assertEqual(benchmarks.compare(baseline, results, 0.2), [])
+
+    def test_missing_in_baseline(self):
+        results = {"large": {"tasks": {"p50": 100.0, "queries": 50, "memory": 1}}}
+        self.assertEqual(benchmarks.compare(self.baseline, results, 0.2), [])
+
+
+@mock.patch.object(
+    benchmarkfastlists.Command, "test_database", lambda self: contextlib.nullcontext()
+)
+class BenchmarkFastListsCommandTestCase(TestCase):
+    def test_benchmark(self):
+        out = StringIO()
+        call_command("benchmarkfastlists", rows=20, iterations=1, stdout=out)
+
+        lines = out.getvalue().splitlines()
+        self.assertEqual(
+            [line.split()[:2] for line in lines[1:]],
+            [["tasks", "20"], ["taskInstances", "20"], ["completions", "10"]],
+        )
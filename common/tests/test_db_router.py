@@ -0,0 +1,101 @@
+import json
+import unittest
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from graphql_jwt.shortcuts import get_token
+
+from common import db_router
+from common.tests import factories
+from teams.models import Team
+
+REPLICAS = ["replica1", "replica2"]
+
+
+@override_settings(DATABASE_REPLICAS=REPLICAS)
+class ReplicaRouterTestCase(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_reads_use_primary_by_default(self):
+        self.assertEqual(Team.objects.all().db, "default")
+
+    def test_reads_use_replicas_when_allowed(self):
+        with db_router.use_replicas():
+            self.assertIn(Team.objects.all().db, REPLICAS)
+        self.assertEqual(Team.objects.all().db, "default")
+
+    def test_writes_use_primary(self):
+        with db_router.use_replicas():
+            self.assertEqual(db_router.ReplicaRouter().db_for_write(Team), None)
+
+    def test_transactions_use_primary(self):
+        with db_router.use_replicas(), mock.patch.object(
+            connections["default"], "in_atomic_block", True
+        ):
+            self.assertEqual(Team.objects.all().db, "default")
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_without_replicas(self):
+        with db_router.use_replicas():
+            self.assertEqual(Team.objects.all().db, "default")
+
+    def test_stickiness(self):
+        self.assertFalse(db_router.is_sticky(1))
+        db_router.stick_to_primary(1)
+        self.assertTrue(db_router.is_sticky(1))
+        self.assertFalse(db_router.is_sticky(2))
+
+
+@unittest.skipUnless(settings.DATABASE_REPLICAS, "Requires DATABASE_REPLICA_URLS")
+class ReadYourWritesTestCase(TransactionTestCase):
+    """
+    Replicas are separate empty databases in tests, so rows written to
+    the primary are visible only in responses read from the primary.
+    """
+
+    databases = {"default", *settings.DATABASE_REPLICAS}
+
+    def setUp(self):
+        cache.clear()
+        self.user = factories.UserFactory()
+        self.team = factories.TeamFactory(members=[self.user])
+
+    def post(self, query):
+        response = self.client.post(
+            "/graphql/",
+            json.dumps({"query": query}),
+            content_type="application/json",
+            HTTP_AUTHORIZATION=f"JWT {get_token(self.user)}",
+        )
+        return json.loads(response.content.decode("utf-8"))
+
+    def test_queries_read_from_replicas(self):
+        content = self.post("query { teams { id } }")
+        self.assertEqual(content["data"]["teams"], [])
+
+    def test_users_read_own_writes_from_primary(self):
+        content = self.post(
+            'mutation { createTeam(input: {name: "Home", password: "pass"}) '
+            "{ team { id } } }"
+        )
+        team_id = content["data"]["createTeam"]["team"]["id"]
+
+        content = self.post("query { teams { id } }")
+        self.assertIn(team_id, [team["id"] for team in content["data"]["teams"]])
+
+        cache.delete(db_router.STICKY_KEY.format(self.user.id))
+        content = self.post("query { teams { id } }")
+        self.assertEqual(content["data"]["teams"], [])
+
+    @override_settings(
+        GRAPHQL_RESPONSE_CACHE={**settings.GRAPHQL_RESPONSE_CACHE, "ACTIVE": True}
+    )
+    def test_cached_responses_read_from_primary(self):
+        task = factories.TaskFactory(team=self.team)
+
+        content = self.post(f"query {{ tasks(teamId: {self.team.id}) {{ id }} }}")
+        self.assertEqual(content["data"]["tasks"], [{"id": str(task.id)}])
@@ -0,0 +1,105 @@
+import json
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from graphql_jwt.shortcuts import get_token
+
+from common import persisted_queries
+from common.tests import factories
+
+TASKS_QUERY = """query Tasks($teamId: Int!) {
+    tasks(teamId: $teamId) { id name }
+}"""
+
+
+@override_settings(
+    GRAPHQL_RESPONSE_CACHE={**settings.GRAPHQL_RESPONSE_CACHE, "ACTIVE": True}
+)
+class ETagTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = factories.UserFactory()
+        self.team = factories.TeamFactory(members=[self.user])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.task = factories.TaskFactory(team=self.team)
+        self.headers = {"HTTP_AUTHORIZATION": f"JWT {get_token(self.user)}"}
+
+    def post(self, query=TASKS_QUERY, **headers):
+        return self.client.post(
+            "/graphql/",
+            json.dumps({"query": query, "variables": {"teamId": self.team.id}}),
+            content_type="application/json",
+            **self.headers,
+            **headers,
+        )
+
+    def test_not_modified_without_executing(self):
+        response = self.post()
+        etag = response["ETag"]
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("Authorization", response["Vary"])
+
+        with mock.patch("common.views.execute") as execute:
+            response = self.post(HTTP_IF_NONE_MATCH=etag)
+            execute.assert_not_called()
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+        self.assertFalse(response.content)
+
+    def test_etag_changes_after_write(self):
+        etag = self.post()["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.task.name = "Renamed"
+            self.task.save()
+
+        response = self.post(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_etag_changes_at_prize_step(self):
+        etag = self.post()["ETag"]
+        with mock.patch(
+            "common.response_cache.get_next_change_at", mock.Mock(return_value=1.0)
+        ):
+            response = self.post(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_get_persisted_query(self):
+        extensions = {
+            "persistedQuery": {
+                "version": 1,
+                "sha256Hash": persisted_queries.query_hash(TASKS_QUERY),
+            }
+        }
+        etag = self.post()["ETag"]
+        self.client.post(
+            "/graphql/",
+            json.dumps({"query": TASKS_QUERY, "extensions": extensions}),
+            content_type="application/json",
+        )
+        response = self.client.get(
+            "/graphql/",
+            {
+                "extensions": json.dumps(extensions),
+                "variables": json.dumps({"teamId": self.team.id}),
+            },
+            HTTP_ACCEPT="application/json",
+            HTTP_IF_NONE_MATCH=etag,
+            **self.headers,
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_response_hash_etag(self):
+        query = "query { teams { id } }"
+        response = self.post(query)
+        etag = response["ETag"]
+        self.assertEqual(response.status_code, 200)
+
+        response = self.post(query, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_no_etag_for_mutations(self):
+        response = self.post("mutation { verifyToken { payload } }")
+        self.assertFalse(response.has_header("ETag"))
@@ -0,0 +1,105 @@
+import datetime
+import random
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.db.models import Count, Q
+from django.test import SimpleTestCase, TestCase
+
+from common.management.commands.generate_dataset import build_timeline
+from tasks.models import Task, TaskInstance, TaskInstanceCompletion
+from teams.models import Team
+from users.models import Profile
+
+
+class GenerateDatasetTestCase(TestCase):
+    def generate(self, **options):
+        out = StringIO()
+        call_command(
+            "generate_dataset",
+            teams=3,
+            members=2,
+            tasks=4,
+            months=2,
+            end=datetime.date(2026, 1, 1),
+            stdout=out,
+            **options,
+        )
+        return out.getvalue()
+
+    def test_dataset(self):
+        output = self.generate()
+
+        self.assertIn("6 users, 12 tasks", output)
+        self.assertEqual(Profile.objects.count(), 6)
+        for team in Team.objects.all():
+            self.assertEqual(team.members.count(), 2)
+            self.assertEqual(Task.objects.filter(team=team).count(), 4)
+        user = get_user_model().objects.get(username="dataset-0-0")
+        self.assertTrue(user.check_password("dataset"))
+
+        # Every task has one instance left to complete, like created by signals
+        self.assertFalse(
+            Task.objects.annotate(
+                open=Count("taskinstance", filter=Q(taskinstance__completed=False))
+            )
+            .exclude(open=1)
+            .filter(is_recurring=True)
+            .exists()
+        )
+        for instance in TaskInstance.objects.filter(completed=True):
+            completion = instance.taskinstancecompletion_set.get()
+            self.assertGreater(completion.created_at, instance.active_from)
+            self.assertGreater(completion.points_granted, 0)
+            self.assertIn(
+                completion.user_who_completed_task,
+                instance.task.team.members.all(),
+            )
+        self.assertEqual(
+            TaskInstanceCompletion.objects.count(),
+            TaskInstance.objects.filter(completed=True).count(),
+        )
+
+    def test_deterministic(self):
+        self.generate(prefix="first")
+        self.generate(prefix="second")
+
+        def history(prefix):
+            return list(
+                TaskInstanceCompletion.objects.filter(
+                    created_by__username__startswith=prefix
+                )
+                .order_by("id")
+                .values_list("created_at", "points_granted")
+            )
+
+        self.assertTrue(history("first"))
+        self.assertEqual(history("first"), history("second"))
+
+    def test_existing_prefix(self):
+        self.generate()
+        with self.assertRaises(CommandError):
+            self.generate()
+
+
+class TimelineTestCase(SimpleTestCase):
+    end = datetime.datetime(2026, 1, 1, tzinfo=datetime.timezone.utc)
+    created_at = end - datetime.timedelta(days=90)
+
+    def test_recurring_task(self):
+        interval = datetime.timedelta(days=7)
+        timeline = build_timeline(random.Random(1), self.created_at, interval, self.end)
+
+        self.assertEqual(timeline[0][0], self.created_at)
+        self.assertIsNone(timeline[-1][1])
+        for (_, completed_at), (next_active_from, _) in zip(timeline, timeline[1:]):
+            self.assertEqual(next_active_from, completed_at + interval)
+
+    def test_single_task(self):
+        for seed in range(10):
+            timeline = build_timeline(
+                random.Random(seed), self.created_at, None, self.end
+            )
+            self.assertEqual(len(timeline), 1)
+            self.assertEqual(timeline[0][0], self.created_at)
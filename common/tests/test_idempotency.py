@@ -0,0 +1,180 @@
+import datetime
+import io
+import json
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from graphql_jwt.shortcuts import get_token
+
+from common import idempotency
+from common.models import IdempotencyKey
+from common.tests import factories
+from tasks.models import TaskInstanceCompletion
+
+SUBMIT_COMPLETION = """mutation Submit($taskInstance: ID!) {
+    submitTaskInstanceCompletion(input: {taskInstance: $taskInstance}) {
+        errors { field messages }
+        taskInstanceCompletion { id }
+    }
+}"""
+
+
+class IdempotencyTestCase(TestCase):
+    def setUp(self):
+        self.user = factories.UserFactory()
+        self.team = factories.TeamFactory(members=[self.user])
+        self.task = factories.TaskFactory(team=self.team)
+        self.task_instance = self.task.taskinstance_set.get()
+
+    def post(self, variables=None, key="retry-1", **extra):
+        if key is not None:
+            extra["HTTP_IDEMPOTENCY_KEY"] = key
+        return self.client.post(
+            "/graphql/",
+            json.dumps(
+                {
+                    "query": SUBMIT_COMPLETION,
+                    "variables": variables or {"taskInstance": self.task_instance.id},
+                }
+            ),
+            content_type="application/json",
+            HTTP_AUTHORIZATION=f"JWT {get_token(self.user)}",
+            **extra,
+        )
+
+    def test_retry_returns_stored_response(self):
+        response = self.post()
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header("Idempotent-Replayed"))
+
+        with mock.patch("common.views.execute") as execute:
+            retry = self.post()
+            execute.assert_not_called()
+        self.assertEqual(retry.status_code, 200)
+        self.assertEqual(retry.content, response.content)
+        self.assertEqual(retry["Idempotent-Replayed"], "true")
+        self.assertEqual(TaskInstanceCompletion.objects.count(), 1)
+
+    def test_key_in_extensions(self):
+        body = {
+            "query": SUBMIT_COMPLETION,
+            "variables": {"taskInstance": self.task_instance.id},
+            "extensions": {"idempotencyKey": "retry-1"},
+        }
+        for _ in range(2):
+            self.client.post(
+                "/graphql/",
+                json.dumps(body),
+                content_type="application/json",
+                HTTP_AUTHORIZATION=f"JWT {get_token(self.user)}",
+            )
+        self.assertEqual(TaskInstanceCompletion.objects.count(), 1)
+        self.assertEqual(IdempotencyKey.objects.get().user, self.user)
+
+    def test_key_reused_with_different_request(self):
+        self.post()
+        other_task = factories.TaskFactory(team=self.team)
+        response = self.post(
+            {"taskInstance": other_task.taskinstance_set.get().id},
+        )
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(TaskInstanceCompletion.objects.count(), 1)
+
+    def test_request_in_progress(self):
+        IdempotencyKey.objects.create(
+            user=self.user,
+            key="retry-1",
+            request_hash=idempotency.get_request_hash(
+                SUBMIT_COMPLETION, {"taskInstance": self.task_instance.id}, None
+            ),
+            expires_at=timezone.now() + datetime.timedelta(minutes=1),
+        )
+        response = self.post()
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(TaskInstanceCompletion.objects.exists())
+
+    def test_stale_request_in_progress_is_claimed_again(self):
+        IdempotencyKey.objects.create(
+            user=self.user,
+            key="retry-1",
+            request_hash=idempotency.get_request_hash(
+                SUBMIT_COMPLETION, {"taskInstance": self.task_instance.id}, None
+            ),
+            created_at=timezone.now() - idempotency.get_lease(),
+            expires_at=timezone.now() + datetime.timedelta(minutes=1),
+        )
+        response = self.post()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(TaskInstanceCompletion.objects.count(), 1)
+        self.assertIsNotNone(IdempotencyKey.objects.get().response)
+
+    def test_failed_mutation_releases_key(self):
+        other_task = factories.TaskFactory()
+        failed = self.post({"taskInstance": other_task.taskinstance_set.get().id})
+        self.assertIn("errors", failed.json())
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+        # The key can be used again, e.g. after the user joined the team
+        other_task.team.members.add(self.user)
+        response = self.post({"taskInstance": other_task.taskinstance_set.get().id})
+        self.assertFalse(response.has_header("Idempotent-Replayed"))
+        self.assertNotIn("errors", response.json())
+        self.assertEqual(TaskInstanceCompletion.objects.count(), 1)
+
+    def test_keys_are_per_user(self):
+        self.post()
+        other_user = factories.UserFactory()
+        self.team.members.add(other_user)
+        other_task = factories.TaskFactory(team=self.team)
+        response = self.client.post(
+            "/graphql/",
+            json.dumps(
+                {
+                    "query": SUBMIT_COMPLETION,
+                    "variables": {"taskInstance": other_task.taskinstance_set.get().id},
+                }
+            ),
+            content_type="application/json",
+            HTTP_AUTHORIZATION=f"JWT {get_token(other_user)}",
+            HTTP_IDEMPOTENCY_KEY="retry-1",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(TaskInstanceCompletion.objects.count(), 2)
+
+    def test_expired_key_is_executed_again(self):
+        self.post()
+        IdempotencyKey.objects.update(expires_at=timezone.now())
+        TaskInstanceCompletion.objects.get().delete()
+
+        response = self.post()
+        self.assertFalse(response.has_header("Idempotent-Replayed"))
+        self.assertEqual(
+            TaskInstanceCompletion.objects.filter(deleted_at=None).count(), 1
+        )
+
+    def test_without_key(self):
+        self.post(key=None)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+    def test_invalid_key(self):
+        response = self.post(key="x" * 256)
+        self.assertEqual(response.status_code, 400)
+
+    def test_purge_expired_keys(self):
+        now = timezone.now()
+        for i in range(5):
+            IdempotencyKey.objects.create(
+                user=self.user,
+                key=str(i),
+                request_hash="",
+                expires_at=now + datetime.timedelta(hours=1 if i >= 3 else -1),
+            )
+
+        out = io.StringIO()
+        call_command("purgeidempotencykeys", "--batch-size", "2", stdout=out)
+        self.assertIn("Deleted 3", out.getvalue())
+        self.assertEqual(
+            sorted(IdempotencyKey.objects.values_list("key", flat=True)), ["3", "4"]
+        )
@@ -0,0 +1,80 @@
+import json
+from unittest import mock
+
+from django.test import TestCase
+from graphql import ExecutionResult, get_introspection_query, get_operation_ast, parse
+
+from common import introspection
+
+INTROSPECTION_QUERY = get_introspection_query()
+
+
+class IntrospectionCacheTestCase(TestCase):
+    def setUp(self):
+        introspection.clear()
+
+    def post(self, query):
+        response = self.client.post(
+            "/graphql/", json.dumps({"query": query}), content_type="application/json"
+        )
+        return json.loads(response.content.decode("utf-8"))
+
+    def test_is_introspection(self):
+        def operation(query):
+            return get_operation_ast(parse(query))
+
+        self.assertTrue(introspection.is_introspection(operation(INTROSPECTION_QUERY)))
+        self.assertTrue(
+            introspection.is_introspection(
+                operation('{ __type(name: "TeamType") { name } }')
+            )
+        )
+        self.assertFalse(introspection.is_introspection(operation("{ teams { id } }")))
+        self.assertFalse(
+            introspection.is_introspection(operation("{ __typename teams { id } }"))
+        )
+        self.assertFalse(introspection.is_introspection(None))
+
+    def test_result_is_served_from_memory(self):
+        content = self.post(INTROSPECTION_QUERY)
+        self.assertIn("__schema", content["data"])
+
+        with mock.patch("common.views.execute") as execute:
+            cached_content = self.post(INTROSPECTION_QUERY)
+            execute.assert_not_called()
+        self.assertEqual(content, cached_content)
+
+    def test_regular_queries_are_not_cached(self):
+        self.post("{ teams { id } }")
+        with mock.patch(
+            "common.views.execute", return_value=ExecutionResult(data={"teams": []})
+        ) as execute:
+            self.post("{ teams { id } }")
+            execute.assert_called_once()
+
+    def test_new_schema_invalidates_cache(self):
+        first_schema, second_schema = mock.Mock(), mock.Mock()
+        execute = mock.Mock(return_value=mock.Mock(errors=None))
+
+        introspection.get_or_execute(first_schema, "q", None, None, execute)
+        introspection.get_or_execute(first_schema, "q", None, None, execute)
+        self.assertEqual(execute.call_count, 1)
+
+        introspection.get_or_execute(second_schema, "q", None, None, execute)
+        self.assertEqual(execute.call_count, 2)
+
+    def test_least_recently_used_results_are_evicted(self):
+        schema = mock.Mock()
+        execute = mock.Mock(return_value=mock.Mock(errors=None))
+
+        with mock.patch.object(introspection, "MAX_RESULTS", 2):
+            introspection.get_or_execute(schema, "a", None, None, execute)
+            introspection.get_or_execute(schema, "b", None, None, execute)
+            introspection.get_or_execute(schema, "a", None, None, execute)
+            introspection.get_or_execute(schema, "c", None, None, execute)
+            self.assertEqual(execute.call_count, 3)
+
+            introspection.get_or_execute(schema, "a", None, None, execute)
+            self.assertEqual(execute.call_count, 3)
+            introspection.get_or_execute(schema, "b", None, None, execute)
+            self.assertEqual(execute.call_count, 4)
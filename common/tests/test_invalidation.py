@@ -0,0 +1,113 @@
+import datetime
+import unittest
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+
+from common import invalidation
+from common.models import CacheInvalidation
+from common.tests import factories
+from teams import versions
+
+
+class InvalidationTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.team = factories.TeamFactory()
+
+    def team_version(self):
+        return versions.get_team_versions([self.team.id])[self.team.id]
+
+    def test_bump_is_broadcast_after_commit(self):
+        with mock.patch("common.invalidation.broadcast") as broadcast:
+            with self.captureOnCommitCallbacks() as callbacks:
+                versions.bump_team_versions(self.team.id)
+            broadcast.assert_not_called()
+            for callback in callbacks:
+                callback()
+        broadcast.assert_called_once_with(
+            versions.INVALIDATION_KIND,
+            [versions.TEAM_VERSION_KEY.format(self.team.id)],
+        )
+
+    def test_broadcast_failure_is_logged(self):
+        with mock.patch.object(
+            invalidation.get_bus(), "publish", side_effect=RuntimeError
+        ), self.assertLogs("common.invalidation", "ERROR"):
+            invalidation.broadcast(versions.INVALIDATION_KIND, [])
+
+    def test_received_invalidation_bumps_local_version(self):
+        version = self.team_version()
+        invalidation.get_bus().receive(
+            "other-worker",
+            versions.INVALIDATION_KIND,
+            [versions.TEAM_VERSION_KEY.format(self.team.id)],
+        )
+        self.assertGreater(self.team_version(), version)
+
+    def test_own_invalidations_are_ignored(self):
+        version = self.team_version()
+        bus = invalidation.get_bus()
+        bus.receive(
+            bus.origin,
+            versions.INVALIDATION_KIND,
+            [versions.TEAM_VERSION_KEY.format(self.team.id)],
+        )
+        self.assertEqual(self.team_version(), version)
+
+
+class PollingBusTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.team = factories.TeamFactory()
+        self.worker = invalidation.PollingBus()
+        self.other_worker = invalidation.PollingBus()
+        self.worker.poll()
+        self.keys = [versions.TEAM_VERSION_KEY.format(self.team.id)]
+
+    def test_poll(self):
+        with mock.patch("common.invalidation.dispatch") as dispatch:
+            self.other_worker.publish(versions.INVALIDATION_KIND, self.keys)
+            self.worker.publish(versions.INVALIDATION_KIND, ["ignored"])
+            self.worker.poll()
+            dispatch.assert_called_once_with(versions.INVALIDATION_KIND, self.keys)
+
+            self.worker.poll()
+            dispatch.assert_called_once()
+
+    def test_older_invalidations_are_skipped_by_new_workers(self):
+        self.other_worker.publish(versions.INVALIDATION_KIND, self.keys)
+        new_worker = invalidation.PollingBus()
+        with mock.patch("common.invalidation.dispatch") as dispatch:
+            new_worker.poll()
+            new_worker.poll()
+            dispatch.assert_not_called()
+
+    def test_old_invalidations_are_purged(self):
+        self.other_worker.publish(versions.INVALIDATION_KIND, self.keys)
+        CacheInvalidation.objects.update(
+            created_at=timezone.now() - datetime.timedelta(hours=1)
+        )
+        self.worker.poll()
+        self.assertFalse(CacheInvalidation.objects.exists())
+
+
+@unittest.skipUnless(connection.vendor == "postgresql", "Requires PostgreSQL")
+class PostgresBusTestCase(TransactionTestCase):
+    def test_publish(self):
+        worker = invalidation.PostgresBus()
+        other_worker = invalidation.PostgresBus()
+        received = mock.Mock()
+        worker.listener.callback = received
+        worker.start()
+        self.assertTrue(worker.listener.listening.wait(timeout=5))
+
+        other_worker.publish(versions.INVALIDATION_KIND, ["key"])
+        for _ in range(50):
+            if received.called:
+                break
+            worker.listener.listening.wait(timeout=0.1)
+        received.assert_called_once()
@@ -0,0 +1,94 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.test import LiveServerTestCase, SimpleTestCase
+
+from common import load_testing
+
+
+class LoadTestCommandTestCase(LiveServerTestCase):
+    def setUp(self):
+        call_command(
+            "generate_dataset",
+            teams=3,
+            members=2,
+            tasks=10,
+            months=1,
+            prefix="load",
+            stdout=StringIO(),
+        )
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.output = os.path.join(directory, "summary.json")
+
+    def test_load_test(self):
+        out = StringIO()
+        # A single virtual user, SQLite of tests is shared by server threads
+        call_command(
+            "loadtest",
+            url=f"{self.live_server_url}/graphql/",
+            users=1,
+            members=2,
+            prefix="load",
+            mix=load_testing.parse_mix(
+                "dashboard=4,complete=3,revert=1,login=1,join=1"
+            ),
+            duration=2,
+            think_time=0,
+            output=self.output,
+            stdout=out,
+        )
+
+        with open(self.output) as f:
+            summary = json.load(f)
+        self.assertEqual(
+            set(summary), {"dashboard", "complete", "revert", "login", "join", "total"}
+        )
+        self.assertEqual(summary["total"]["error_rate"], 0, out.getvalue())
+        self.assertGreater(summary["total"]["throughput"], 0)
+        self.assertIn("dashboard", out.getvalue())
+
+    def test_unknown_user(self):
+        with self.assertRaisesRegex(CommandError, "load-3-0 can't log in"):
+            call_command(
+                "loadtest",
+                url=f"{self.live_server_url}/graphql/",
+                users=7,
+                members=2,
+                prefix="load",
+                duration=1,
+                stdout=StringIO(),
+            )
+
+
+class LoadTestingTestCase(SimpleTestCase):
+    def test_parse_mix(self):
+        self.assertEqual(
+            load_testing.parse_mix(load_testing.DEFAULT_MIX),
+            {"dashboard": 70, "complete": 12, "revert": 3, "login": 10, "join": 5},
+        )
+        with self.assertRaises(ValueError):
+            load_testing.parse_mix("dashboard=1,delete=1")
+
+    def test_summarize(self):
+        recorder = load_testing.Recorder()
+        for latency in range(1, 101):
+            recorder.record("dashboard", latency / 1000)
+        recorder.record("login", 0.5, "Please enter valid credentials")
+
+        summary = recorder.summarize(elapsed=10)
+        self.assertEqual(summary["dashboard"]["requests"], 100)
+        self.assertEqual(summary["dashboard"]["throughput"], 10)
+        self.assertEqual(summary["dashboard"]["error_rate"], 0)
+        self.assertAlmostEqual(summary["dashboard"]["p50"], 50.5)
+        self.assertAlmostEqual(summary["dashboard"]["p99"], 99.01)
+        self.assertEqual(summary["login"]["error_rate"], 1)
+        self.assertEqual(summary["login"]["p95"], 500)
+        self.assertEqual(summary["total"]["requests"], 101)
+        self.assertEqual(
+            recorder.messages, {"login: Please enter valid credentials": 1}
+        )
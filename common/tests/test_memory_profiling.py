@@ -0,0 +1,103 @@
+import json
+import os
+import shutil
+import tempfile
+import tracemalloc
+from io import StringIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from graphql_jwt.shortcuts import get_token
+
+from common import instrumentation, memory_profiling
+from common.tests import factories
+
+TOKEN = "metrics-token"
+
+TASK_INSTANCES = """query TeamTaskInstances($teamId: Int!) {
+    taskInstances(teamId: $teamId) { id currentPrize task { name } }
+}"""
+
+
+@override_settings(METRICS={"TOKEN": TOKEN})
+class MemoryProfilingTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        settings_override = override_settings(
+            GRAPHQL_MEMORY_PROFILING={
+                **settings.GRAPHQL_MEMORY_PROFILING,
+                "ACTIVE": True,
+                "DIRECTORY": self.directory,
+            }
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.user = factories.UserFactory()
+        self.team = factories.TeamFactory(members=[self.user])
+        factories.TaskFactory.create_batch(5, team=self.team)
+
+    def tearDown(self):
+        tracemalloc.stop()
+        memory_profiling._largest_peaks.clear()
+        memory_profiling._top_sites.clear()
+        memory_profiling.peak_memory.clear()
+        instrumentation.field_allocated.clear()
+
+    def execute(self):
+        response = self.client.post(
+            "/graphql/",
+            json.dumps(
+                {"query": TASK_INSTANCES, "variables": {"teamId": self.team.id}}
+            ),
+            content_type="application/json",
+            HTTP_AUTHORIZATION=f"JWT {get_token(self.user)}",
+        )
+        self.assertEqual(len(response.json()["data"]["taskInstances"]), 5)
+
+    def get_metrics(self):
+        return self.client.get(
+            "/internal/metrics", HTTP_AUTHORIZATION=f"Bearer {TOKEN}"
+        ).content.decode()
+
+    def test_metrics(self):
+        self.execute()
+
+        metrics = self.get_metrics()
+        self.assertIn(
+            "homekeeper_graphql_operation_memory_peak_bytes_count"
+            '{operation="TeamTaskInstances",type="query"} 1',
+            metrics,
+        )
+        self.assertIn(
+            'homekeeper_graphql_field_allocated_bytes_total{field="Query.taskInstances"}',
+            metrics,
+        )
+        self.assertIn(
+            'homekeeper_graphql_memory_site_bytes{operation="TeamTaskInstances",site="',
+            metrics,
+        )
+
+    def test_snapshot_of_largest_peak(self):
+        self.execute()
+        [snapshot] = os.listdir(self.directory)
+        self.assertTrue(snapshot.startswith("TeamTaskInstances."))
+        path = os.path.join(self.directory, snapshot)
+
+        out = StringIO()
+        call_command("memorysnapshots", top=3, stdout=out)
+        self.assertIn(f"{path}: ", out.getvalue())
+        self.assertIn(" KiB ", out.getvalue())
+
+        out = StringIO()
+        call_command("memorysnapshots", compare=[path, path], stdout=out)
+        self.assertIn(f"Top differences of {path}", out.getvalue())
+
+    @override_settings(GRAPHQL_MEMORY_PROFILING={"ACTIVE": False})
+    def test_inactive(self):
+        self.execute()
+        self.assertFalse(tracemalloc.is_tracing())
+        self.assertNotIn("homekeeper_graphql_memory", self.get_metrics())
@@ -0,0 +1,190 @@
+import json
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import connections
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from graphql_jwt.shortcuts import get_token
+
+from common import instrumentation, metrics
+from common.tests import factories
+
+URL = "/internal/metrics"
+TOKEN = "metrics-token"
+
+POOL_STATS = {
+    "pool_min": 2,
+    "pool_max": 10,
+    "pool_size": 4,
+    "pool_available": 1,
+    "requests_waiting": 3,
+    "requests_num": 120,
+    "requests_wait_ms": 2500,
+    "requests_errors": 1,
+}
+
+
+class MetricsViewTestCase(TestCase):
+    @override_settings(METRICS={"TOKEN": None})
+    def test_disabled_without_token(self):
+        response = self.client.get(URL, HTTP_AUTHORIZATION="Bearer ")
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(METRICS={"TOKEN": TOKEN})
+    def test_wrong_token(self):
+        response = self.client.get(URL, HTTP_AUTHORIZATION="Bearer wrong")
+        self.assertEqual(response.status_code, 403)
+        response = self.client.get(URL)
+        self.assertEqual(response.status_code, 403)
+
+    @override_settings(METRICS={"TOKEN": TOKEN})
+    def test_pool_metrics(self):
+        pool = mock.Mock(**{"get_stats.return_value": POOL_STATS})
+        with mock.patch.object(connections["default"], "pool", pool, create=True):
+            response = self.client.get(URL, HTTP_AUTHORIZATION=f"Bearer {TOKEN}")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+        lines = response.content.decode().splitlines()
+        self.assertIn("# TYPE homekeeper_db_pool_connections gauge", lines)
+        for line in [
+            'homekeeper_db_pool_connections{database="default",state="in_use"} 3',
+            'homekeeper_db_pool_connections{database="default",state="idle"} 1',
+            'homekeeper_db_pool_max_connections{database="default"} 10',
+            'homekeeper_db_pool_requests_waiting{database="default"} 3',
+            'homekeeper_db_pool_requests_total{database="default"} 120',
+            'homekeeper_db_pool_wait_seconds_total{database="default"} 2.5',
+            'homekeeper_db_pool_errors_total{database="default"} 1',
+        ]:
+            self.assertIn(line, lines)
+
+    def test_no_pool(self):
+        self.assertNotIn("homekeeper_db_pool", metrics.render())
+
+    def test_label_escaping(self):
+        self.assertEqual(
+            metrics.format_labels({"b": 'say "hi"\n', "a": "C:\\"}),
+            '{a="C:\\\\",b="say \\"hi\\"\\n"}',
+        )
+
+
+class HistogramTestCase(SimpleTestCase):
+    def setUp(self):
+        self.histogram = metrics.Histogram(
+            "test_duration_seconds", "Test.", ["path"], buckets=[0.1, 1]
+        )
+        self.addCleanup(metrics._collectors.remove, self.histogram.collect)
+
+    def test_cumulative_buckets(self):
+        for value in [0.05, 0.1, 0.5, 3]:
+            self.histogram.observe(value, path="a")
+
+        lines = metrics.render().splitlines()
+        self.assertIn("# TYPE test_duration_seconds histogram", lines)
+        for line in [
+            'test_duration_seconds_bucket{le="0.1",path="a"} 2',
+            'test_duration_seconds_bucket{le="1",path="a"} 3',
+            'test_duration_seconds_bucket{le="+Inf",path="a"} 4',
+            'test_duration_seconds_sum{path="a"} 3.65',
+            'test_duration_seconds_count{path="a"} 4',
+        ]:
+            self.assertIn(line, lines)
+
+    def test_series_limit(self):
+        with mock.patch.object(metrics.Histogram, "MAX_SERIES", 2):
+            for path in ["a", "b", "c", "d"]:
+                self.histogram.observe(1, path=path)
+
+        lines = metrics.render().splitlines()
+        self.assertIn('test_duration_seconds_count{path="b"} 1', lines)
+        self.assertIn('test_duration_seconds_count{path="_other"} 2', lines)
+        self.assertNotIn('test_duration_seconds_count{path="c"} 1', lines)
+
+
+@override_settings(METRICS={"TOKEN": TOKEN})
+class InstrumentationTestCase(TestCase):
+    def setUp(self):
+        for metric in [
+            instrumentation.operation_duration,
+            instrumentation.operation_queries,
+            instrumentation.field_calls,
+            instrumentation.field_queries,
+        ]:
+            metric.clear()
+        self.user = factories.UserFactory()
+        self.team = factories.TeamFactory(members=[self.user])
+        factories.TaskFactory.create_batch(3, team=self.team)
+
+    def get_metrics(self):
+        return self.client.get(
+            URL, HTTP_AUTHORIZATION=f"Bearer {TOKEN}"
+        ).content.decode()
+
+    def test_operation_and_field_metrics(self):
+        query = """query TeamTasks($teamId: Int!) {
+            taskInstances(teamId: $teamId) { id currentPrize }
+        }"""
+        response = self.client.post(
+            "/graphql/",
+            json.dumps({"query": query, "variables": {"teamId": self.team.id}}),
+            content_type="application/json",
+            HTTP_AUTHORIZATION=f"JWT {get_token(self.user)}",
+        )
+        self.assertEqual(len(response.json()["data"]["taskInstances"]), 3)
+
+        lines = self.get_metrics().splitlines()
+        self.assertIn(
+            "homekeeper_graphql_operation_duration_seconds_count"
+            '{operation="TeamTasks",type="query"} 1',
+            lines,
+        )
+        self.assertIn(
+            'homekeeper_graphql_field_calls_total{field="TaskInstanceType.currentPrize"} 3',
+            lines,
+        )
+        self.assertIn(
+            'homekeeper_graphql_field_calls_total{field="Query.taskInstances"} 1',
+            lines,
+        )
+        # The membership check of the resolver
+        self.assertTrue(
+            any(
+                line.startswith(
+                    'homekeeper_graphql_field_sql_queries_total{field="Query.taskInstances"}'
+                )
+                and not line.endswith(" 0")
+                for line in lines
+            )
+        )
+
+    @override_settings(METRICS={"TOKEN": None})
+    def test_not_recorded_when_disabled(self):
+        with mock.patch.object(instrumentation, "OperationRecorder") as recorder:
+            self.client.post(
+                "/graphql/",
+                json.dumps({"query": "{ __typename }"}),
+                content_type="application/json",
+            )
+        recorder.assert_not_called()
+
+    @override_settings(METRICS={"TOKEN": None})
+    def test_resolvers_not_wrapped_when_disabled(self):
+        with mock.patch.object(
+            instrumentation.InstrumentationMiddleware, "resolve"
+        ) as resolve:
+            response = self.client.post(
+                "/graphql/",
+                json.dumps({"query": "{ me { username } }"}),
+                content_type="application/json",
+                HTTP_AUTHORIZATION=f"JWT {get_token(self.user)}",
+            )
+        self.assertEqual(response.json()["data"]["me"]["username"], self.user.username)
+        resolve.assert_not_called()
+
+
+class BenchmarkConnectionsTestCase(TransactionTestCase):
+    def test_benchmark(self):
+        out = StringIO()
+        call_command("benchmarkconnections", threads=2, iterations=3, stdout=out)
+        self.assertIn("6 connections by 2 threads", out.getvalue())
@@ -0,0 +1,142 @@
+import io
+import json
+import tempfile
+from pathlib import Path
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+
+from common import persisted_queries
+
+QUERY = "query { teams { id name } }"
+
+
+def persisted_query_extension(query: str) -> dict:
+    return {
+        "persistedQuery": {
+            "version": 1,
+            "sha256Hash": persisted_queries.query_hash(query),
+        }
+    }
+
+
+class PersistedQueriesTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.allowlist_path = Path(self.tmp_dir.name) / "persisted_queries.json"
+
+    def post(self, data):
+        response = self.client.post(
+            "/graphql/", json.dumps(data), content_type="application/json"
+        )
+        return response, json.loads(response.content.decode("utf-8"))
+
+    def test_hash_only_miss_asks_for_query(self):
+        response, content = self.post({"extensions": persisted_query_extension(QUERY)})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(content["errors"][0]["message"], "PersistedQueryNotFound")
+        self.assertEqual(
+            content["errors"][0]["extensions"]["code"], "PERSISTED_QUERY_NOT_FOUND"
+        )
+
+    def test_register_and_execute_by_hash(self):
+        extensions = persisted_query_extension(QUERY)
+        response, content = self.post({"query": QUERY, "extensions": extensions})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(content["data"], {"teams": []})
+
+        response, content = self.post({"extensions": extensions})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(content["data"], {"teams": []})
+
+    def test_get_by_hash(self):
+        extensions = persisted_query_extension(QUERY)
+        self.post({"query": QUERY, "extensions": extensions})
+        response = self.client.get(
+            "/graphql/",
+            {"extensions": json.dumps(extensions)},
+            HTTP_ACCEPT="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)["data"], {"teams": []})
+
+    def test_hash_mismatch(self):
+        extensions = persisted_query_extension("query { me { id } }")
+        response, _ = self.post({"query": QUERY, "extensions": extensions})
+        self.assertEqual(response.status_code, 400)
+
+    def test_unsupported_version(self):
+        extensions = persisted_query_extension(QUERY)
+        extensions["persistedQuery"]["version"] = 2
+        response, _ = self.post({"query": QUERY, "extensions": extensions})
+        self.assertEqual(response.status_code, 400)
+
+    def test_strict_mode(self):
+        allowed_query = "query { teams { id } }"
+        self.allowlist_path.write_text(
+            json.dumps({persisted_queries.query_hash(allowed_query): allowed_query})
+        )
+        with override_settings(
+            GRAPHQL_PERSISTED_QUERIES={
+                "ALLOWLIST_PATH": self.allowlist_path,
+                "STRICT": True,
+            }
+        ):
+            _, content = self.post({"query": QUERY})
+            self.assertEqual(
+                content["errors"][0]["message"], "PersistedQueryNotAllowed"
+            )
+            _, content = self.post(
+                {"query": QUERY, "extensions": persisted_query_extension(QUERY)}
+            )
+            self.assertEqual(
+                content["errors"][0]["message"], "PersistedQueryNotAllowed"
+            )
+
+            _, content = self.post(
+                {"extensions": persisted_query_extension(allowed_query)}
+            )
+            self.assertEqual(content["data"], {"teams": []})
+            _, content = self.post({"query": allowed_query})
+            self.assertEqual(content["data"], {"teams": []})
+
+    def test_parse_and_validate_is_cached(self):
+        from homekeeper.schema import schema
+
+        first = persisted_queries.parse_and_validate(schema.graphql_schema, QUERY)
+        second = persisted_queries.parse_and_validate(schema.graphql_schema, QUERY)
+        self.assertIs(first[0], second[0])
+        self.assertFalse(first[1])
+
+        _, errors = persisted_queries.parse_and_validate(
+            schema.graphql_schema, "query { notAField }"
+        )
+        self.assertTrue(errors)
+
+
+class DumpPersistedQueriesCommandTestCase(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.operations = Path(self.tmp_dir.name) / "operations"
+        self.operations.mkdir()
+        self.out = Path(self.tmp_dir.name) / "persisted_queries.json"
+
+    def test_dump(self):
+        (self.operations / "teams.graphql").write_text(QUERY)
+        call_command(
+            "dumppersistedqueries", self.operations, out=self.out, stdout=io.StringIO()
+        )
+        self.assertEqual(
+            json.loads(self.out.read_text()),
+            {persisted_queries.query_hash(QUERY): QUERY},
+        )
+
+    def test_invalid_operation(self):
+        (self.operations / "invalid.graphql").write_text("query { notAField }")
+        with self.assertRaises(CommandError):
+            call_command("dumppersistedqueries", self.operations, out=self.out)
@@ -0,0 +1,117 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+from io import StringIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from graphql_jwt.shortcuts import get_token
+
+from common import profiling
+from common.tests import factories
+
+TASKS = """query Tasks($teamId: Int!) { tasks(teamId: $teamId) { id name } }"""
+
+
+def busy_loop(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+class ProfilingTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        settings_override = override_settings(
+            GRAPHQL_PROFILING={
+                **settings.GRAPHQL_PROFILING,
+                "DIRECTORY": self.directory,
+                "SAMPLING_INTERVAL": 0.001,
+            }
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.user = factories.UserFactory(is_staff=True)
+        self.team = factories.TeamFactory(members=[self.user])
+        factories.TaskFactory.create_batch(3, team=self.team)
+
+    def post(self, user=None, **extra):
+        self.client.post(
+            "/graphql/",
+            json.dumps({"query": TASKS, "variables": {"teamId": self.team.id}}),
+            content_type="application/json",
+            HTTP_AUTHORIZATION=f"JWT {get_token(user or self.user)}",
+            **extra,
+        )
+        return sorted(os.listdir(self.directory))
+
+    def test_cprofile_on_request(self):
+        [profile] = self.post(HTTP_X_PROFILE="cprofile")
+        self.assertTrue(profile.startswith("Tasks."))
+        self.assertTrue(profile.endswith(".prof"))
+
+        out = StringIO()
+        call_command("mergeprofiles", self.directory, top=5, stdout=out)
+        self.assertIn("cProfile, 1 profiles", out.getvalue())
+
+    def test_sampling_on_request(self):
+        [profile] = self.post(HTTP_X_PROFILE="sampling")
+        self.assertTrue(profile.startswith("Tasks."))
+        self.assertTrue(profile.endswith(".collapsed"))
+
+    def test_header_of_other_users_is_ignored(self):
+        user = factories.UserFactory()
+        self.team.members.add(user)
+        self.assertEqual(self.post(user, HTTP_X_PROFILE="cprofile"), [])
+
+    def test_sampled_requests(self):
+        with override_settings(
+            GRAPHQL_PROFILING={**settings.GRAPHQL_PROFILING, "SAMPLE_RATE": 1}
+        ):
+            self.assertEqual(len(self.post()), 1)
+        self.assertEqual(len(self.post()), 1)
+
+
+class SamplingProfilerTestCase(SimpleTestCase):
+    def test_samples_the_started_thread(self):
+        profiler = profiling.SamplingProfiler(interval=0.001)
+        profiler.start()
+        busy_loop(0.05)
+        profiler.stop()
+
+        self.assertTrue(profiler.samples)
+        self.assertTrue(
+            any(stack.endswith(f"{__name__}:busy_loop") for stack in profiler.samples)
+        )
+
+    def test_merge(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        for name, lines in [
+            ("Tasks.1.1.collapsed", ["a:main;b:resolve 3", "a:main;c:query 1"]),
+            ("Tasks.2.1.collapsed", ["a:main;b:resolve 2"]),
+            ("Other.3.1.collapsed", ["a:main;d:other 10"]),
+        ]:
+            with open(os.path.join(directory, name), "w") as f:
+                f.write("\n".join(lines) + "\n")
+
+        out = StringIO()
+        merged = os.path.join(directory, "merged.out.collapsed")
+        call_command(
+            "mergeprofiles",
+            directory,
+            operation="Tasks",
+            output=merged,
+            stdout=out,
+        )
+        self.assertIn("Sampling, 2 profiles, 6 samples", out.getvalue())
+        self.assertIn(" 83.3%       5 b:resolve", out.getvalue())
+        self.assertIn("100.0%       6 a:main", out.getvalue())
+        with open(merged) as f:
+            self.assertEqual(f.readline(), "a:main;b:resolve 5\n")
@@ -0,0 +1,119 @@
+import asyncio
+import importlib.util
+import queue
+import threading
+import unittest
+from unittest import mock
+
+from django.db import connection
+from django.test import SimpleTestCase, TransactionTestCase
+
+from common import listen_notify, pubsub
+
+
+async def receive(backend, channel, publish):
+    """Subscribes to the channel, calls publish and returns the first message."""
+    subscription = backend.subscribe(channel)
+    receiving = asyncio.ensure_future(subscription.__anext__())
+    while not backend.subscribers_count(channel):
+        await asyncio.sleep(0.01)
+    publish()
+    try:
+        return await asyncio.wait_for(receiving, timeout=5)
+    finally:
+        await subscription.aclose()
+
+
+def in_thread(target, *args):
+    def run():
+        try:
+            target(*args)
+        finally:
+            connection.close()
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    thread.join()
+
+
+class InProcessBackendTestCase(SimpleTestCase):
+    async def test_publish(self):
+        backend = pubsub.InProcessBackend()
+        message = await receive(
+            backend, "team:1", lambda: backend.publish("team:1", {"id": 1})
+        )
+        self.assertEqual(message, {"id": 1})
+        self.assertEqual(backend.subscribers_count("team:1"), 0)
+
+    async def test_publish_from_another_thread(self):
+        backend = pubsub.InProcessBackend()
+        message = await receive(
+            backend,
+            "team:1",
+            lambda: in_thread(backend.publish, "team:1", {"id": 1}),
+        )
+        self.assertEqual(message, {"id": 1})
+
+    async def test_other_channels_are_not_delivered(self):
+        backend = pubsub.InProcessBackend()
+
+        def publish():
+            backend.publish("team:2", {"id": 2})
+            backend.publish("team:1", {"id": 1})
+
+        message = await receive(backend, "team:1", publish)
+        self.assertEqual(message, {"id": 1})
+
+
+@unittest.skipUnless(connection.vendor == "postgresql", "Requires PostgreSQL")
+class PostgresBackendTestCase(TransactionTestCase):
+    async def test_publish(self):
+        backend = pubsub.PostgresBackend()
+
+        def publish():
+            backend.listener.listening.wait(timeout=5)
+            in_thread(backend.publish, "team:1", {"id": 1})
+
+        message = await receive(backend, "team:1", publish)
+        self.assertEqual(message, {"id": 1})
+
+    @unittest.skipUnless(importlib.util.find_spec("psycopg"), "Requires psycopg 3")
+    def test_listener_with_pool(self):
+        from django.db.backends.postgresql.base import DatabaseWrapper
+
+        settings_dict = connection.settings_dict
+        pooled = DatabaseWrapper(
+            {
+                **settings_dict,
+                "OPTIONS": {
+                    **settings_dict["OPTIONS"],
+                    "pool": {"min_size": 1, "max_size": 2},
+                },
+            }
+        )
+        self.addCleanup(pooled.close_pool)
+        received: queue.Queue = queue.Queue()
+        listener = listen_notify.PostgresListener("test-pool", received.put)
+        with mock.patch.object(listen_notify, "connection", pooled):
+            listener.start()
+            self.assertTrue(listener.listening.wait(timeout=5))
+
+        listen_notify.notify("test-pool", "payload")
+        self.assertEqual(received.get(timeout=5), "payload")
+
+
+class PostgresListenerTestCase(SimpleTestCase):
+    def test_connects_with_the_driver_of_django(self):
+        database = mock.MagicMock()
+        params = {"dbname": "homekeeper", "cursor_factory": object, "context": None}
+        with mock.patch.object(listen_notify, "connection") as django_connection:
+            django_connection.Database = database
+            django_connection.get_connection_params.return_value = params
+            conn = listen_notify.PostgresListener("channel", print).connect()
+
+        database.connect.assert_called_once_with(**params)
+        self.assertIs(conn, database.connect.return_value)
+        self.assertIs(conn.autocommit, True)
+        conn.cursor.return_value.__enter__.return_value.execute.assert_called_once_with(
+            'LISTEN "channel"'
+        )
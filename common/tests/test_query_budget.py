@@ -0,0 +1,44 @@
+from graphene.utils.str_converters import to_camel_case
+from django.test import SimpleTestCase
+
+from common.tests import factories
+from common.tests.query_budget import QueryBudgetTestCase, budgeted_fields, query_budget
+from tasks import schema as tasks_schema
+from tasks.tests import test_query_budgets as tasks_budgets  # noqa: F401
+from teams import schema as teams_schema
+from teams.tests import tests_query_budgets as teams_budgets  # noqa: F401
+from users import schema as users_schema
+from users.tests import test_query_budgets as users_budgets  # noqa: F401
+
+TASKS = "query Tasks($teamId: Int!) { tasks(teamId: $teamId) { id active } }"
+
+
+class BudgetCoverageTestCase(SimpleTestCase):
+    def test_every_field_has_a_budget(self):
+        fields = {
+            f"{root.__name__}.{to_camel_case(name)}"
+            for schema in (tasks_schema, teams_schema, users_schema)
+            for root in (schema.Query, schema.Mutation)
+            for name in root._meta.fields
+        }
+        self.assertEqual(fields - budgeted_fields, set())
+
+
+class BudgetAssertionTestCase(QueryBudgetTestCase):
+    def create_tasks(self, rows):
+        factories.TaskFactory.create_batch(rows, team=self.team)
+        return TASKS, {"teamId": self.team.id}
+
+    def test_queries_over_budget(self):
+        test = query_budget("Query.tasks", queries=1, per_row=100)(
+            BudgetAssertionTestCase.create_tasks
+        )
+        with self.assertRaisesRegex(AssertionError, "the budget is 1\n"):
+            test(self)
+
+    def test_queries_growing_with_rows(self):
+        test = query_budget("Query.tasks", queries=100)(
+            BudgetAssertionTestCase.create_tasks
+        )
+        with self.assertRaisesRegex(AssertionError, "the budget is 0 per row"):
+            test(self)
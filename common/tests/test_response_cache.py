@@ -0,0 +1,141 @@
+import datetime
+import json
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from graphql_jwt.shortcuts import get_token
+
+from common import response_cache
+from common.tests import factories
+from teams import versions
+
+TASKS_QUERY = """query Tasks($teamId: Int!) {
+    tasks(teamId: $teamId) { id name }
+}"""
+
+
+@override_settings(
+    GRAPHQL_RESPONSE_CACHE={**settings.GRAPHQL_RESPONSE_CACHE, "ACTIVE": True}
+)
+class ResponseCacheTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = factories.UserFactory()
+        self.team = factories.TeamFactory(members=[self.user])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.task = factories.TaskFactory(team=self.team)
+
+    def post(self, query=TASKS_QUERY, variables=None):
+        response = self.client.post(
+            "/graphql/",
+            json.dumps(
+                {"query": query, "variables": variables or {"teamId": self.team.id}}
+            ),
+            content_type="application/json",
+            HTTP_AUTHORIZATION=f"JWT {get_token(self.user)}",
+        )
+        return json.loads(response.content.decode("utf-8"))
+
+    def assert_served_from_cache(self, query=TASKS_QUERY, variables=None):
+        with mock.patch("common.views.execute") as execute:
+            content = self.post(query, variables)
+            execute.assert_not_called()
+        return content
+
+    def test_second_request_is_served_from_cache(self):
+        content = self.post()
+        self.assertFalse(content.get("errors"))
+        self.assertEqual(content, self.assert_served_from_cache())
+
+    def test_write_invalidates_cache(self):
+        self.post()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.task.name = "Renamed"
+            self.task.save()
+
+        content = self.post()
+        self.assertEqual(content["data"]["tasks"][0]["name"], "Renamed")
+
+    def test_completion_invalidates_cache(self):
+        self.post()
+        team_version = versions.get_team_versions([self.team.id])[self.team.id]
+        with self.captureOnCommitCallbacks(execute=True):
+            factories.TaskInstanceCompletionFactory(
+                task_instance__task__team=self.team
+            )
+        self.assertGreater(
+            versions.get_team_versions([self.team.id])[self.team.id], team_version
+        )
+
+    def test_membership_change_invalidates_cache(self):
+        self.post()
+        membership_version = versions.get_membership_version(self.user.id)
+        other_team = factories.TeamFactory()
+        with self.captureOnCommitCallbacks(execute=True):
+            other_team.members.add(self.user)
+
+        self.assertGreater(
+            versions.get_membership_version(self.user.id), membership_version
+        )
+        self.assertIn(other_team.id, versions.get_user_team_ids(self.user.id))
+
+    def test_variables_are_part_of_the_key(self):
+        self.post()
+        other_team = factories.TeamFactory(members=[self.user])
+        content = self.post(variables={"teamId": other_team.id})
+        self.assertEqual(content["data"]["tasks"], [])
+
+    def test_errors_are_not_cached(self):
+        other_team = factories.TeamFactory()
+        content = self.post(variables={"teamId": other_team.id})
+        self.assertTrue(content["errors"])
+        with mock.patch("common.views.execute") as execute:
+            execute.return_value.errors = None
+            execute.return_value.data = {"tasks": []}
+            self.post(variables={"teamId": other_team.id})
+            execute.assert_called_once()
+
+    def test_not_cacheable_queries(self):
+        query = "query { me { id } }"
+        self.post(query)
+        with mock.patch("common.views.execute") as execute:
+            execute.return_value.errors = None
+            execute.return_value.data = {"me": None}
+            self.post(query)
+            execute.assert_called_once()
+
+    def test_timeout_is_capped_by_next_prize_step(self):
+        response = self.client.post(
+            "/graphql/",
+            json.dumps({"query": TASKS_QUERY, "variables": {"teamId": self.team.id}}),
+            content_type="application/json",
+            HTTP_AUTHORIZATION=f"JWT {get_token(self.user)}",
+        )
+        self.assertIn("max-age=300", response["Cache-Control"])
+
+        task_instance = self.task.taskinstance_set.get()
+        next_change = timezone.now() + datetime.timedelta(seconds=60)
+        with self.captureOnCommitCallbacks(execute=True):
+            task_instance.active_from = next_change
+            task_instance.save()
+        self.assertIn(response_cache.get_timeout(self.team_versions()), range(55, 60))
+
+    def test_no_caching_at_prize_step(self):
+        next_change = timezone.now().timestamp()
+        with mock.patch(
+            "common.response_cache.get_next_change_at",
+            mock.Mock(return_value=next_change),
+        ):
+            self.assertEqual(response_cache.get_timeout(self.team_versions()), 0)
+            self.post()
+            with mock.patch("common.views.execute") as execute:
+                execute.return_value.errors = None
+                execute.return_value.data = {"tasks": []}
+                self.post()
+                execute.assert_called_once()
+
+    def team_versions(self):
+        return versions.get_team_versions([self.team.id])
@@ -0,0 +1,129 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from graphql_jwt.shortcuts import get_token
+
+from common import slow_log
+from common.tests import factories
+
+COMPLETIONS = """query Completions($teamId: Int!) {
+    completions(teamId: $teamId) { id taskInstance { id currentPrize } }
+}"""
+
+
+class SlowLogTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, "slow.log")
+        self.user = factories.UserFactory()
+        self.team = factories.TeamFactory(members=[self.user])
+        for task in factories.TaskFactory.create_batch(2, team=self.team):
+            factories.TaskInstanceCompletionFactory(
+                task_instance=task.taskinstance_set.get(),
+                user_who_completed_task=self.user,
+            )
+
+    def tearDown(self):
+        for handler in slow_log.get_logger(self.path).handlers:
+            handler.close()
+
+    def execute(self, threshold):
+        with override_settings(
+            GRAPHQL_SLOW_LOG={
+                **settings.GRAPHQL_SLOW_LOG,
+                "THRESHOLD": threshold,
+                "PATH": self.path,
+            }
+        ):
+            response = self.client.post(
+                "/graphql/",
+                json.dumps(
+                    {"query": COMPLETIONS, "variables": {"teamId": self.team.id}}
+                ),
+                content_type="application/json",
+                HTTP_AUTHORIZATION=f"JWT {get_token(self.user)}",
+            )
+        self.assertNotIn("errors", response.json())
+
+    def read_records(self):
+        with open(self.path) as f:
+            return [json.loads(line) for line in f]
+
+    def test_slow_operation_is_logged(self):
+        self.execute(threshold=0)
+
+        [record] = self.read_records()
+        self.assertEqual(record["operation"], "Completions")
+        self.assertEqual(record["type"], "query")
+        self.assertEqual(record["variables"], {"teamId": "int"})
+        self.assertEqual(record["sql_queries"], len(record["statements"]))
+        self.assertGreater(record["sql_queries"], 0)
+        self.assertIn(
+            "TaskInstanceCompletionType.taskInstance",
+            {statement["field"] for statement in record["statements"]},
+        )
+        plans = [s["plan"] for s in record["statements"] if "plan" in s]
+        self.assertTrue(plans)
+        self.assertLessEqual(
+            len(plans), settings.GRAPHQL_SLOW_LOG["EXPLAINED_STATEMENTS"]
+        )
+
+    def test_fast_operation_is_not_logged(self):
+        self.execute(threshold=60)
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_summary(self):
+        self.execute(threshold=0)
+        cache.clear()  # Executes it again rather than serving the cached response
+        self.execute(threshold=0)
+
+        out = StringIO()
+        call_command("slowoperations", path=self.path, stdout=out)
+        self.assertIn("Slowest operations of 2 logged", out.getvalue())
+        self.assertIn("query Completions: 2 times", out.getvalue())
+        self.assertIn("Statements with the longest total time", out.getvalue())
+
+
+class VariablesShapeTestCase(SimpleTestCase):
+    def test_shape(self):
+        self.assertEqual(
+            slow_log.get_shape(
+                {"teamId": 1, "input": {"name": "x", "ids": [1, 2, 3]}, "since": None}
+            ),
+            {
+                "teamId": "int",
+                "input": {"name": "str", "ids": ["int", "... 3 items"]},
+                "since": "NoneType",
+            },
+        )
+
+
+@override_settings(
+    GRAPHQL_SLOW_LOG={**settings.GRAPHQL_SLOW_LOG, "EXPLAIN_ANALYZE": True}
+)
+class ExplainPrefixTestCase(SimpleTestCase):
+    def test_analyze(self):
+        self.assertEqual(
+            slow_log.get_explain_prefix("postgresql", 'SELECT * FROM "tasks_task"'),
+            "EXPLAIN ANALYZE ",
+        )
+
+    def test_locking_reads_are_not_analyzed(self):
+        for clause in ["FOR UPDATE", "FOR NO KEY UPDATE", "for share", "FOR KEY SHARE"]:
+            with self.subTest(clause):
+                self.assertEqual(
+                    slow_log.get_explain_prefix(
+                        "postgresql",
+                        f'SELECT * FROM "tasks_task" WHERE "id" = %s {clause}',
+                    ),
+                    "EXPLAIN ",
+                )
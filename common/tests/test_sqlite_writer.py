@@ -0,0 +1,150 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from django.conf import settings
+from django.db import OperationalError, connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from graphql import ExecutionResult, GraphQLError
+from graphql_jwt.shortcuts import get_token
+
+from common import sqlite_writer
+from common.tests import factories
+from tasks.models import TaskInstanceCompletion
+
+ACTIVE = {"ACTIVE": True, "RETRIES": 2, "BACKOFF": 0}
+
+SUBMIT_COMPLETION = """mutation Submit($taskInstance: ID!) {
+    submitTaskInstanceCompletion(input: {taskInstance: $taskInstance}) {
+        taskInstanceCompletion { id }
+    }
+}"""
+
+requires_sqlite = unittest.skipUnless(
+    connection.vendor == "sqlite", "The default database is not SQLite"
+)
+
+
+@requires_sqlite
+@override_settings(SQLITE_WRITER=ACTIVE)
+class SerializedWriterTestCase(SimpleTestCase):
+    def test_retries_when_locked(self):
+        write = mock.Mock(
+            side_effect=[OperationalError("database is locked")] * 2 + ["done"]
+        )
+        self.assertEqual(sqlite_writer.run(write), "done")
+        self.assertEqual(write.call_count, 3)
+
+    def test_gives_up_after_retries(self):
+        write = mock.Mock(side_effect=OperationalError("database is locked"))
+        with self.assertRaises(OperationalError):
+            sqlite_writer.run(write)
+        self.assertEqual(write.call_count, 3)
+
+    def test_other_errors_are_not_retried(self):
+        write = mock.Mock(side_effect=OperationalError("no such table: x"))
+        with self.assertRaises(OperationalError):
+            sqlite_writer.run(write)
+        self.assertEqual(write.call_count, 1)
+
+    @override_settings(SQLITE_WRITER={**ACTIVE, "ACTIVE": False})
+    def test_inactive(self):
+        write = mock.Mock(side_effect=OperationalError("database is locked"))
+        with self.assertRaises(OperationalError):
+            sqlite_writer.run(write)
+        self.assertEqual(write.call_count, 1)
+
+    def test_find_lock_error(self):
+        lock_error = OperationalError("database is locked")
+        self.assertIs(
+            sqlite_writer.find_lock_error(
+                [
+                    GraphQLError("Other"),
+                    GraphQLError(str(lock_error), original_error=lock_error),
+                ]
+            ),
+            lock_error,
+        )
+        self.assertIsNone(sqlite_writer.find_lock_error(None))
+
+
+@requires_sqlite
+@override_settings(SQLITE_WRITER=ACTIVE)
+class LockedMutationTestCase(TestCase):
+    def setUp(self):
+        self.user = factories.UserFactory()
+        self.team = factories.TeamFactory(members=[self.user])
+        self.task_instance = factories.TaskFactory(
+            team=self.team
+        ).taskinstance_set.get()
+
+    def post(self):
+        return self.client.post(
+            "/graphql/",
+            json.dumps(
+                {
+                    "query": SUBMIT_COMPLETION,
+                    "variables": {"taskInstance": self.task_instance.id},
+                }
+            ),
+            content_type="application/json",
+            HTTP_AUTHORIZATION=f"JWT {get_token(self.user)}",
+        )
+
+    def test_locked_mutation_is_rolled_back_and_retried(self):
+        from common.views import execute
+
+        lock_error = OperationalError("database is locked")
+
+        def execute_locked_once(*args, **kwargs):
+            result = execute(*args, **kwargs)
+            if execute_mock.call_count == 1:
+                return ExecutionResult(
+                    data=result.data,
+                    errors=[GraphQLError(str(lock_error), original_error=lock_error)],
+                )
+            return result
+
+        with mock.patch(
+            "common.views.execute", side_effect=execute_locked_once
+        ) as execute_mock:
+            response = self.post()
+
+        self.assertEqual(execute_mock.call_count, 2)
+        self.assertNotIn("errors", response.json())
+        # The completion of the first attempt was rolled back
+        self.assertEqual(TaskInstanceCompletion.objects.count(), 1)
+
+
+class StressTestCase(SimpleTestCase):
+    """Submits completions from several processes to an SQLite file."""
+
+    def run_command(self, env, *args):
+        return subprocess.run(
+            [sys.executable, "manage.py", *args],
+            cwd=settings.BASE_DIR,
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+            timeout=120,
+        ).stdout
+
+    def test_no_lock_errors(self):
+        with tempfile.TemporaryDirectory() as directory:
+            env = {
+                **os.environ,
+                "DATABASE_URL": f"sqlite:///{directory}/db.sqlite3",
+                "SQLITE_PRODUCTION": "True",
+            }
+            self.run_command(env, "migrate", "-v0")
+            output = self.run_command(
+                env, "stresssqlitewrites", "--processes", "4", "--writes", "25"
+            )
+
+        self.assertIn("100 completions by 4 processes", output)
+        self.assertIn("0 errors, 0 lock errors", output)
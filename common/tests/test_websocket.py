@@ -0,0 +1,225 @@
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import time
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.test import TestCase
+from graphql_jwt.settings import jwt_settings
+from graphql_jwt.shortcuts import get_token
+
+from common import persisted_queries, pubsub, websocket
+from common.tests import factories
+from tasks import events
+
+TEAM_EVENTS = """subscription TeamEvents($teamId: Int!) {
+    teamEvents(teamId: $teamId) { kind taskId taskInstanceId completionId userId }
+}"""
+
+
+class WebSocketClient:
+    """Drives the ASGI application like a WebSocket client."""
+
+    def __init__(self, subprotocols=(websocket.PROTOCOL,)):
+        self.input: asyncio.Queue = asyncio.Queue()
+        self.output: asyncio.Queue = asyncio.Queue()
+        scope = {"type": "websocket", "path": "/graphql/", "subprotocols": subprotocols}
+        self.task = asyncio.ensure_future(
+            websocket.GraphQLWebSocketApp()(scope, self.input.get, self.output.put)
+        )
+
+    async def connect(self) -> dict:
+        await self.input.put({"type": "websocket.connect"})
+        return await self.receive_raw()
+
+    async def send(self, message: dict) -> None:
+        await self.input.put({"type": "websocket.receive", "text": json.dumps(message)})
+
+    async def receive_raw(self) -> dict:
+        return await asyncio.wait_for(self.output.get(), timeout=5)
+
+    async def receive(self) -> dict:
+        return json.loads((await self.receive_raw())["text"])
+
+    async def disconnect(self) -> None:
+        await self.input.put({"type": "websocket.disconnect", "code": 1000})
+        await asyncio.wait_for(self.task, timeout=5)
+
+
+class GraphQLWebSocketTestCase(TestCase):
+    def setUp(self):
+        self.user = factories.UserFactory()
+        self.team = factories.TeamFactory(members=[self.user])
+        self.task = factories.TaskFactory(team=self.team)
+        self.task_instance = self.task.taskinstance_set.get()
+        self.token = get_token(self.user)
+
+    async def init(self, client, token=None):
+        self.assertEqual((await client.connect())["type"], "websocket.accept")
+        await client.send(
+            {
+                "type": "connection_init",
+                "payload": {"Authorization": f"JWT {token or self.token}"},
+            }
+        )
+
+    async def subscribe(self, client, team_id):
+        await self.init(client)
+        self.assertEqual(await client.receive(), {"type": "connection_ack"})
+        await client.send(
+            {
+                "type": "subscribe",
+                "id": "1",
+                "payload": {"query": TEAM_EVENTS, "variables": {"teamId": team_id}},
+            }
+        )
+
+    def complete_task_instance(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return factories.TaskInstanceCompletionFactory(
+                task_instance=self.task_instance, user_who_completed_task=self.user
+            )
+
+    async def test_team_events(self):
+        client = WebSocketClient()
+        await self.subscribe(client, self.team.id)
+        channel = events.get_channel(self.team.id)
+        while not pubsub.get_backend().subscribers_count(channel):
+            await asyncio.sleep(0.01)
+
+        completion = await sync_to_async(self.complete_task_instance)()
+        message = await client.receive()
+        self.assertEqual(message["type"], "next")
+        self.assertEqual(message["id"], "1")
+        self.assertEqual(
+            message["payload"]["data"]["teamEvents"],
+            {
+                "kind": "COMPLETION_SUBMITTED",
+                "taskId": str(self.task.id),
+                "taskInstanceId": str(self.task_instance.id),
+                "completionId": str(completion.id),
+                "userId": str(self.user.id),
+            },
+        )
+
+        await client.send({"type": "complete", "id": "1"})
+        await client.disconnect()
+        self.assertEqual(pubsub.get_backend().subscribers_count(channel), 0)
+
+    async def test_not_a_member(self):
+        other_team = await sync_to_async(factories.TeamFactory)()
+        client = WebSocketClient()
+        await self.subscribe(client, other_team.id)
+        message = await client.receive()
+        self.assertEqual(message["type"], "error")
+        self.assertIn("is not a member", message["payload"][0]["message"])
+        await client.disconnect()
+
+    async def wait_for_subscriber(self):
+        channel = events.get_channel(self.team.id)
+        while not pubsub.get_backend().subscribers_count(channel):
+            await asyncio.sleep(0.01)
+
+    async def test_member_leaves_while_subscribed(self):
+        client = WebSocketClient()
+        await self.subscribe(client, self.team.id)
+        await self.wait_for_subscriber()
+
+        await sync_to_async(self.team.members.remove)(self.user)
+        await sync_to_async(self.complete_task_instance)()
+        message = await client.receive()
+        self.assertEqual(message["type"], "error")
+        self.assertEqual(message["id"], "1")
+        self.assertIn("is not a member", message["payload"][0]["message"])
+        await client.disconnect()
+
+    async def test_token_expires_while_subscribed(self):
+        client = WebSocketClient()
+        await self.subscribe(client, self.team.id)
+        await self.wait_for_subscriber()
+
+        expired = time.time() + jwt_settings.JWT_EXPIRATION_DELTA.total_seconds() + 1
+        with mock.patch("common.websocket.time.time", return_value=expired):
+            await sync_to_async(self.complete_task_instance)()
+            message = await client.receive_raw()
+        self.assertEqual(message["type"], "websocket.close")
+        self.assertEqual(message["code"], websocket.FORBIDDEN)
+        await client.disconnect()
+
+    async def test_strict_persisted_queries(self):
+        allowlist_path = os.path.join(tempfile.mkdtemp(), "persisted_queries.json")
+        self.addCleanup(shutil.rmtree, os.path.dirname(allowlist_path))
+        with open(allowlist_path, "w") as f:
+            json.dump({persisted_queries.query_hash(TEAM_EVENTS): TEAM_EVENTS}, f)
+        not_allowed = TEAM_EVENTS.replace("userId", "")
+        client = WebSocketClient()
+        await self.init(client)
+        self.assertEqual(await client.receive(), {"type": "connection_ack"})
+
+        with self.settings(
+            GRAPHQL_PERSISTED_QUERIES={"ALLOWLIST_PATH": allowlist_path, "STRICT": True}
+        ):
+            await client.send(
+                {
+                    "type": "subscribe",
+                    "id": "1",
+                    "payload": {"query": not_allowed, "variables": {"teamId": 1}},
+                }
+            )
+            message = await client.receive()
+            self.assertEqual(message["type"], "error")
+            self.assertEqual(
+                message["payload"][0]["extensions"]["code"],
+                "PERSISTED_QUERY_NOT_ALLOWED",
+            )
+
+            await client.send(
+                {
+                    "type": "subscribe",
+                    "id": "2",
+                    "payload": {
+                        "extensions": {
+                            "persistedQuery": {
+                                "version": 1,
+                                "sha256Hash": persisted_queries.query_hash(TEAM_EVENTS),
+                            }
+                        },
+                        "variables": {"teamId": self.team.id},
+                    },
+                }
+            )
+            await self.wait_for_subscriber()
+        await client.send({"type": "complete", "id": "2"})
+        await client.disconnect()
+
+    async def test_ping(self):
+        client = WebSocketClient()
+        await client.connect()
+        await client.send({"type": "ping"})
+        self.assertEqual(await client.receive(), {"type": "pong"})
+        await client.disconnect()
+
+    async def test_invalid_token(self):
+        client = WebSocketClient()
+        await self.init(client, token="invalid")
+        message = await client.receive_raw()
+        self.assertEqual(message["type"], "websocket.close")
+        self.assertEqual(message["code"], websocket.FORBIDDEN)
+
+    async def test_subscribe_before_init(self):
+        client = WebSocketClient()
+        await client.connect()
+        await client.send(
+            {"type": "subscribe", "id": "1", "payload": {"query": TEAM_EVENTS}}
+        )
+        message = await client.receive_raw()
+        self.assertEqual(message["code"], websocket.UNAUTHORIZED)
+
+    async def test_unsupported_subprotocol(self):
+        client = WebSocketClient(subprotocols=["graphql-ws"])
+        message = await client.connect()
+        self.assertEqual(message["type"], "websocket.close")
+        self.assertEqual(message["code"], websocket.SUBPROTOCOL_NOT_ACCEPTABLE)
@@ -0,0 +1,391 @@
+import hashlib
+
+from django.conf import settings
+from django.contrib.auth import authenticate
+from django.db import connection, transaction
+from django.http import (
+    Http404,
+    HttpResponse,
+    HttpResponseBadRequest,
+    HttpResponseForbidden,
+    HttpResponseNotAllowed,
+    HttpResponseNotModified,
+)
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.crypto import constant_time_compare
+from django.utils.http import parse_etags, quote_etag
+from graphql import (
+    ExecutionResult,
+    OperationType,
+    execute,
+    get_operation_ast,
+    validate_schema,
+)
+
+from graphene_django.constants import MUTATION_ERRORS_FLAG
+from graphene_django.settings import graphene_settings
+from graphene_django.views import GraphQLView, HttpError
+from graphql_jwt.exceptions import JSONWebTokenError
+from graphql_jwt.utils import get_http_authorization
+
+from common import (
+    db_router,
+    idempotency,
+    instrumentation,
+    introspection,
+    metrics,
+    persisted_queries,
+    profiling,
+    response_cache,
+    sqlite_writer,
+)
+
+
+class NotModified(Exception):
+    def __init__(self, max_age: int):
+        super().__init__()
+        self.max_age = max_age
+
+
+class HomeKeeperGraphQLView(GraphQLView):
+    """
+    GraphQLView with support for automatic persisted queries, cached
+    parsing/validation of query documents, cached introspection,
+    team-versioned response cache, conditional requests (ETag)
+    and idempotency keys for mutations.
+    """
+
+    instrumentation_middleware = instrumentation.InstrumentationMiddleware()
+
+    def dispatch(self, request, *args, **kwargs):
+        try:
+            response = super().dispatch(request, *args, **kwargs)
+        except NotModified as e:
+            response = HttpResponseNotModified()
+            request.response_max_age = e.max_age
+        else:
+            if (
+                response.status_code == 200
+                and getattr(request, "graphql_operation", None) == OperationType.QUERY
+                and getattr(request, "response_etag", None) is None
+            ):
+                # No version based tag, fall back to a hash of the response
+                request.response_etag = quote_etag(
+                    hashlib.sha256(response.content).hexdigest()
+                )
+                if self.etag_matches(request, request.response_etag):
+                    response = HttpResponseNotModified()
+
+        if response.status_code in (200, 304):
+            self.patch_cache_headers(request, response)
+        if getattr(request, "idempotent_replayed", False):
+            response["Idempotent-Replayed"] = "true"
+        return response
+
+    @staticmethod
+    def patch_cache_headers(request, response):
+        etag = getattr(request, "response_etag", None)
+        if etag is not None:
+            response["ETag"] = etag
+            patch_vary_headers(response, ["Authorization"])
+        max_age = getattr(request, "response_max_age", None)
+        if max_age is not None:
+            patch_cache_control(response, private=True, max_age=max_age)
+
+    @staticmethod
+    def etag_matches(request, etag: str) -> bool:
+        if_none_match = parse_etags(request.META.get("HTTP_IF_NONE_MATCH", ""))
+        return etag in if_none_match or "*" in if_none_match
+
+    def get_response(self, request, data, show_graphiql=False):
+        try:
+            extensions = persisted_queries.get_extensions(request, data)
+            query = request.GET.get("query") or data.get("query")
+            query = persisted_queries.resolve_query(query, extensions)
+            request.idempotency_key = idempotency.get_key(request, extensions)
+        except ValueError as e:
+            raise HttpError(HttpResponseBadRequest(str(e)))
+        except persisted_queries.PersistedQueryError as e:
+            return self.json_encode(request, {"errors": [e.formatted]}), 200
+
+        if query:
+            data = dict(data.items()) if hasattr(data, "items") else {}
+            data["query"] = query
+        return self.get_idempotent_response(request, data, show_graphiql)
+
+    def get_idempotent_response(self, request, data, show_graphiql=False):
+        """
+        Stores the response of a mutation sent with an idempotency key once
+        it committed without errors, answers retries with the stored response.
+        """
+        try:
+            result, status_code = super().get_response(request, data, show_graphiql)
+        except idempotency.Replay as e:
+            request.idempotent_replayed = True
+            return e.record.response, e.record.status_code
+        except Exception:
+            record = getattr(request, "idempotency_record", None)
+            if record is not None:
+                idempotency.release(record)
+            raise
+
+        record = getattr(request, "idempotency_record", None)
+        if record is not None:
+            if getattr(request, "mutation_committed", False):
+                idempotency.store(record, result, status_code)
+            else:
+                # Nothing was written, a retry may succeed
+                idempotency.release(record)
+        return result, status_code
+
+    def execute_graphql_request(
+        self, request, data, query, variables, operation_name, show_graphiql=False
+    ):
+        if not query:
+            if show_graphiql:
+                return None
+            raise HttpError(HttpResponseBadRequest("Must provide query string."))
+
+        schema = self.schema.graphql_schema
+
+        schema_validation_errors = validate_schema(schema)
+        if schema_validation_errors:
+            return ExecutionResult(data=None, errors=schema_validation_errors)
+
+        validation_rules = (
+            tuple(self.validation_rules) if self.validation_rules else None
+        )
+        document, errors = persisted_queries.parse_and_validate(
+            schema, query, validation_rules
+        )
+        if errors:
+            return ExecutionResult(data=None, errors=errors)
+
+        operation_ast = get_operation_ast(document, operation_name)
+        if operation_ast is not None:
+            request.graphql_operation = operation_ast.operation
+
+        if (
+            request.method.lower() == "get"
+            and operation_ast is not None
+            and operation_ast.operation != OperationType.QUERY
+        ):
+            if show_graphiql:
+                return None
+
+            raise HttpError(
+                HttpResponseNotAllowed(
+                    ["POST"],
+                    "Can only perform a {} operation from a POST request.".format(
+                        operation_ast.operation.value
+                    ),
+                )
+            )
+
+        return self.execute_cached(
+            request, schema, document, operation_ast, query, variables, operation_name
+        )
+
+    def execute_cached(
+        self, request, schema, document, operation_ast, query, variables, operation_name
+    ):
+        """Serves the operation from one of the caches if possible."""
+
+        def execute_document():
+            return self.execute_document(
+                request, schema, document, operation_ast, variables, operation_name
+            )
+
+        if (
+            getattr(request, "idempotency_key", None) is not None
+            and operation_ast is not None
+            and operation_ast.operation == OperationType.MUTATION
+        ):
+            self.claim_idempotency_key(request, query, variables, operation_name)
+        if introspection.is_introspection(operation_ast):
+            return introspection.get_or_execute(
+                schema, query, operation_name, variables, execute_document
+            )
+        if response_cache.is_cacheable(operation_ast):
+            user = self.authenticate(request)
+            if user is not None and user.is_authenticated:
+                return self.execute_versioned(
+                    request, user, query, variables, operation_name, execute_document
+                )
+        return execute_document()
+
+    def execute_versioned(
+        self, request, user, query, variables, operation_name, execute_document
+    ):
+        """
+        Serves the operation from the team-versioned response cache, answers
+        with 304 Not Modified without executing it when the client's ETag
+        is up to date.
+        """
+        team_versions = response_cache.get_team_versions(user.id)
+        cache_key = response_cache.get_cache_key(
+            user.id, query, operation_name, variables, team_versions
+        )
+        request.response_etag = response_cache.get_etag(cache_key, team_versions)
+        if self.etag_matches(request, request.response_etag):
+            raise NotModified(max_age=response_cache.get_timeout(team_versions))
+
+        # Stored under the current team versions, must not lag behind them
+        request.response_cacheable = True
+        result, request.response_max_age = response_cache.get_or_execute(
+            cache_key, team_versions, execute_document
+        )
+        return result
+
+    def claim_idempotency_key(self, request, query, variables, operation_name):
+        """
+        Claims the idempotency key of the authenticated user, raises
+        idempotency.Replay when the mutation was already executed.
+        Keys of anonymous requests are ignored.
+        """
+        user = self.authenticate(request)
+        if user is None or not user.is_authenticated:
+            return
+        try:
+            request.idempotency_record = idempotency.claim(
+                user.id,
+                request.idempotency_key,
+                idempotency.get_request_hash(query, variables, operation_name),
+            )
+        except idempotency.IdempotencyKeyError as e:
+            raise HttpError(HttpResponse(str(e), status=e.status_code))
+
+    @staticmethod
+    def authenticate(request):
+        """
+        Authenticates the request with JWT ahead of execution (normally done
+        by JSONWebTokenMiddleware in resolvers), so cache keys can depend
+        on the user.
+        """
+        if request.user.is_authenticated or get_http_authorization(request) is None:
+            return request.user
+        try:
+            user = authenticate(request=request)
+        except JSONWebTokenError:
+            return None
+        if user is not None:
+            request.user = user
+        return user
+
+    def can_use_replicas(self, request) -> bool:
+        """
+        Users who executed a mutation recently read their writes from
+        the primary, so do operations whose result goes to the response cache.
+        """
+        if not db_router.get_replicas() or getattr(
+            request, "response_cacheable", False
+        ):
+            return False
+        user = self.authenticate(request)
+        return (
+            user is None
+            or not user.is_authenticated
+            or not db_router.is_sticky(user.id)
+        )
+
+    def get_middleware(self, request):
+        """Adds InstrumentationMiddleware when operations are measured."""
+        middleware = super().get_middleware(request)
+        if not instrumentation.is_measuring():
+            return middleware
+        return [*(middleware or ()), self.instrumentation_middleware]
+
+    def execute_document(
+        self, request, schema, document, operation_ast, variables, operation_name
+    ):
+        try:
+            execute_options = {
+                "root_value": self.get_root_value(request),
+                "context_value": self.get_context(request),
+                "variable_values": variables,
+                "operation_name": operation_name,
+                "middleware": self.get_middleware(request),
+            }
+            if self.execution_context_class:
+                execute_options["execution_context_class"] = (
+                    self.execution_context_class
+                )
+
+            operation = operation_ast.operation if operation_ast else None
+            labels = instrumentation.get_operation_labels(operation_ast, operation_name)
+            profiler_name = profiling.get_profiler_name(
+                request, lambda: self.authenticate(request)
+            )
+            with profiling.profile(profiler_name, labels["operation"]):
+                with instrumentation.measure_operation(
+                    operation_ast, operation_name, variables
+                ):
+                    return self.execute_operation(
+                        request, schema, document, operation, execute_options
+                    )
+        except Exception as e:
+            return ExecutionResult(errors=[e])
+
+    def execute_operation(self, request, schema, document, operation, execute_options):
+        if operation == OperationType.QUERY and self.can_use_replicas(request):
+            with db_router.use_replicas():
+                return execute(schema, document, **execute_options)
+        if operation != OperationType.MUTATION:
+            return execute(schema, document, **execute_options)
+
+        try:
+            if (
+                graphene_settings.ATOMIC_MUTATIONS is True
+                or connection.settings_dict.get("ATOMIC_MUTATIONS", False) is True
+            ):
+                return sqlite_writer.run(
+                    lambda: self.execute_atomic(
+                        request, schema, document, execute_options
+                    )
+                )
+            result = execute(schema, document, **execute_options)
+            request.mutation_committed = not self.has_errors(request, result)
+            return result
+        finally:
+            if request.user.is_authenticated:
+                db_router.stick_to_primary(request.user.id)
+
+    @staticmethod
+    def execute_atomic(request, schema, document, execute_options):
+        with transaction.atomic():
+            result = execute(schema, document, **execute_options)
+            lock_error = sqlite_writer.find_lock_error(result.errors)
+            if lock_error is not None:
+                # Rolls back, so the writer can retry the whole mutation
+                raise lock_error
+            # Also when a resolver raised after writing, e.g. the completion
+            # of an already completed task instance
+            request.mutation_committed = not HomeKeeperGraphQLView.has_errors(
+                request, result
+            )
+            if not request.mutation_committed:
+                transaction.set_rollback(True)
+        return result
+
+    @staticmethod
+    def has_errors(request, result: ExecutionResult) -> bool:
+        return bool(result.errors) or (
+            getattr(request, MUTATION_ERRORS_FLAG, False) is True
+        )
+
+
+def metrics_view(request):
+    """
+    Internal metrics in the Prometheus text format, available with
+    the ``Authorization: Bearer <METRICS_TOKEN>`` header only.
+    """
+    token = settings.METRICS["TOKEN"]
+    if not token:
+        raise Http404()
+    if not constant_time_compare(
+        request.META.get("HTTP_AUTHORIZATION", ""), f"Bearer {token}"
+    ):
+        return HttpResponseForbidden()
+    return HttpResponse(
+        metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
@@ -0,0 +1,268 @@
+"""
+GraphQL subscriptions over WebSocket for the ASGI application.
+
+Implements the ``graphql-transport-ws`` protocol
+(https://github.com/enisdenjo/graphql-ws/blob/master/PROTOCOL.md), as spoken
+by Apollo, urql and graphql_flutter clients. Clients authenticate with the
+``Authorization`` key of the ``connection_init`` payload, the same
+``JWT <token>`` value as in the HTTP header. The connection is closed once
+the token expires, clients reconnect with a refreshed one.
+"""
+
+import asyncio
+import json
+import time
+import types
+import typing
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from graphql import (
+    ExecutionResult,
+    GraphQLError,
+    OperationType,
+    get_operation_ast,
+    located_error,
+    subscribe,
+)
+
+from graphene_django.settings import graphene_settings
+from graphql_jwt.exceptions import JSONWebTokenError
+from graphql_jwt.settings import jwt_settings
+from graphql_jwt.utils import get_payload, get_user_by_payload
+
+from common import persisted_queries
+
+PROTOCOL = "graphql-transport-ws"
+
+# Close codes defined by the protocol
+BAD_REQUEST = 4400
+UNAUTHORIZED = 4401
+FORBIDDEN = 4403
+SUBPROTOCOL_NOT_ACCEPTABLE = 4406
+SUBSCRIBER_ALREADY_EXISTS = 4409
+TOO_MANY_INITIALISATION_REQUESTS = 4429
+
+
+class CloseConnection(Exception):
+    def __init__(self, code: int, reason: str):
+        super().__init__(reason)
+        self.code = code
+        self.reason = reason
+
+
+def authenticate(token: str) -> typing.Tuple[typing.Any, typing.Optional[int]]:
+    """Returns the user of the token and its expiration (a UNIX timestamp)."""
+    payload = get_payload(token)
+    return get_user_by_payload(payload), payload.get("exp")
+
+
+class GraphQLWebSocketApp:
+    """ASGI application serving GraphQL subscriptions of the schema."""
+
+    def __init__(self, schema=None):
+        self.schema = schema
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "websocket":
+            raise ValueError(f"Unsupported scope type {scope['type']}")
+        schema = self.schema or graphene_settings.SCHEMA
+        await GraphQLWebSocketConnection(
+            schema.graphql_schema, scope, receive, send
+        ).run()
+
+
+class GraphQLWebSocketConnection:
+    def __init__(self, schema, scope, receive, send):
+        self.schema = schema
+        self.scope = scope
+        self.receive = receive
+        self.send = send
+        self.context: typing.Optional[types.SimpleNamespace] = None
+        self.subscriptions: typing.Dict[str, asyncio.Task] = {}
+
+    async def run(self) -> None:
+        message = await self.receive()
+        if message["type"] != "websocket.connect":
+            return
+        if PROTOCOL not in self.scope.get("subprotocols", []):
+            await self.send(
+                {"type": "websocket.close", "code": SUBPROTOCOL_NOT_ACCEPTABLE}
+            )
+            return
+        await self.send({"type": "websocket.accept", "subprotocol": PROTOCOL})
+
+        try:
+            while True:
+                message = await self.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+                await self.handle(message.get("text") or message.get("bytes"))
+        except CloseConnection as e:
+            await self.send(
+                {"type": "websocket.close", "code": e.code, "reason": e.reason}
+            )
+        finally:
+            for task in self.subscriptions.values():
+                task.cancel()
+
+    async def handle(self, text: typing.Union[str, bytes, None]) -> None:
+        try:
+            message = json.loads(text or "")
+            message_type = message["type"]
+        except (ValueError, TypeError, KeyError):
+            raise CloseConnection(BAD_REQUEST, "Invalid message")
+
+        if message_type == "connection_init":
+            await self.init(message.get("payload") or {})
+        elif message_type == "ping":
+            await self.send_message({"type": "pong"})
+        elif message_type == "pong":
+            pass
+        elif message_type == "subscribe":
+            self.start(message)
+        elif message_type == "complete":
+            task = self.subscriptions.pop(message.get("id"), None)
+            if task is not None:
+                task.cancel()
+        else:
+            raise CloseConnection(BAD_REQUEST, f"Unknown message type {message_type}")
+
+    async def init(self, payload: dict) -> None:
+        if self.context is not None:
+            raise CloseConnection(
+                TOO_MANY_INITIALISATION_REQUESTS, "Too many initialisation requests"
+            )
+        user, expires_at = AnonymousUser(), None
+        authorization = payload.get("Authorization") or payload.get("authorization")
+        if authorization:
+            prefix, _, token = authorization.partition(" ")
+            if prefix.lower() != jwt_settings.JWT_AUTH_HEADER_PREFIX.lower():
+                raise CloseConnection(FORBIDDEN, "Forbidden")
+            try:
+                user, expires_at = await sync_to_async(authenticate)(token)
+            except JSONWebTokenError:
+                raise CloseConnection(FORBIDDEN, "Forbidden")
+        self.context = types.SimpleNamespace(
+            user=user, scope=self.scope, expires_at=expires_at
+        )
+        await self.send_message({"type": "connection_ack"})
+
+    def is_expired(self) -> bool:
+        expires_at = self.context.expires_at
+        return expires_at is not None and time.time() >= expires_at
+
+    async def close(self, code: int, reason: str) -> None:
+        """Closes the connection from a subscription, ending the other ones."""
+        current = asyncio.current_task()
+        for task in self.subscriptions.values():
+            if task is not current:
+                task.cancel()
+        await self.send({"type": "websocket.close", "code": code, "reason": reason})
+
+    def start(self, message: dict) -> None:
+        if self.context is None:
+            raise CloseConnection(UNAUTHORIZED, "Unauthorized")
+        if self.is_expired():
+            raise CloseConnection(FORBIDDEN, "Token expired")
+        subscription_id = message.get("id")
+        payload = message.get("payload")
+        if not isinstance(subscription_id, str) or not isinstance(payload, dict):
+            raise CloseConnection(BAD_REQUEST, "Invalid subscribe message")
+        if subscription_id in self.subscriptions:
+            raise CloseConnection(
+                SUBSCRIBER_ALREADY_EXISTS,
+                f"Subscriber for {subscription_id} already exists",
+            )
+        self.subscriptions[subscription_id] = asyncio.ensure_future(
+            self.run_subscription(subscription_id, payload)
+        )
+
+    async def run_subscription(self, subscription_id: str, payload: dict) -> None:
+        try:
+            result = await self.subscribe(payload)
+            if isinstance(result, ExecutionResult):
+                await self.send_message(
+                    {
+                        "type": "error",
+                        "id": subscription_id,
+                        "payload": [error.formatted for error in result.errors],
+                    }
+                )
+                return
+
+            try:
+                async for item in result:
+                    if self.is_expired():
+                        await self.close(FORBIDDEN, "Token expired")
+                        return
+                    await self.send_message(
+                        {
+                            "type": "next",
+                            "id": subscription_id,
+                            "payload": self.format_result(item),
+                        }
+                    )
+            except Exception as e:
+                # E.g. the user left the team, ends the subscription
+                await self.send_message(
+                    {
+                        "type": "error",
+                        "id": subscription_id,
+                        "payload": [located_error(e).formatted],
+                    }
+                )
+                return
+            await self.send_message({"type": "complete", "id": subscription_id})
+        finally:
+            self.subscriptions.pop(subscription_id, None)
+
+    async def subscribe(
+        self, payload: dict
+    ) -> typing.Union[ExecutionResult, typing.AsyncIterator[ExecutionResult]]:
+        # Same persisted queries and allowlist (strict mode) as over HTTP
+        extensions = payload.get("extensions") or {}
+        try:
+            if not isinstance(extensions, dict):
+                raise ValueError("Extensions must be an object.")
+            query = persisted_queries.resolve_query(payload.get("query"), extensions)
+        except ValueError as e:
+            return ExecutionResult(data=None, errors=[GraphQLError(str(e))])
+        except persisted_queries.PersistedQueryError as e:
+            return ExecutionResult(data=None, errors=[e.to_graphql_error()])
+        if not isinstance(query, str):
+            return ExecutionResult(
+                data=None, errors=[GraphQLError("Must provide query string.")]
+            )
+        document, errors = persisted_queries.parse_and_validate(self.schema, query)
+        if errors:
+            return ExecutionResult(data=None, errors=errors)
+
+        operation_name = payload.get("operationName")
+        operation_ast = get_operation_ast(document, operation_name)
+        if operation_ast is None or operation_ast.operation != (
+            OperationType.SUBSCRIPTION
+        ):
+            return ExecutionResult(
+                data=None,
+                errors=[
+                    GraphQLError("Only subscriptions are supported over WebSocket.")
+                ],
+            )
+        return await subscribe(
+            self.schema,
+            document,
+            context_value=self.context,
+            variable_values=payload.get("variables"),
+            operation_name=operation_name,
+        )
+
+    @staticmethod
+    def format_result(result: ExecutionResult) -> dict:
+        response: typing.Dict[str, typing.Any] = {"data": result.data}
+        if result.errors:
+            response["errors"] = [error.formatted for error in result.errors]
+        return response
+
+    async def send_message(self, message: dict) -> None:
+        await self.send({"type": "websocket.send", "text": json.dumps(message)})
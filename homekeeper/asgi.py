@@ -2,6 +2,7 @@
 ASGI config for homekeeper project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+GraphQL subscriptions are served over WebSocket at /graphql/.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/3.1/howto/deployment/asgi/
@@ -13,4 +14,19 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'homekeeper.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported after Django is set up
+from common.websocket import GraphQLWebSocketApp  # noqa: E402
+
+websocket_application = GraphQLWebSocketApp()
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "websocket":
+        if scope["path"] == "/graphql/":
+            await websocket_application(scope, receive, send)
+        else:
+            await send({"type": "websocket.close"})
+    else:
+        await django_application(scope, receive, send)
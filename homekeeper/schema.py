@@ -35,4 +35,8 @@ class Mutation(
     refresh_token = graphql_jwt.Refresh.Field()
 
 
-schema = AtomicSchema(query=Query, mutation=Mutation)
+class Subscription(tasks_schema.Subscription, graphene.ObjectType):
+    pass
+
+
+schema = AtomicSchema(query=Query, mutation=Mutation, subscription=Subscription)
@@ -109,6 +109,158 @@ import dj_database_url  # noqa
 db_from_env = dj_database_url.config(conn_max_age=500)
 DATABASES["default"].update(db_from_env)
 
+# Read replicas, comma separated URLs in $DATABASE_REPLICA_URLS.
+# GraphQL queries are routed to them, see common/db_router.py.
+# In tests replicas are separate (empty) databases, so routing is observable.
+DATABASE_REPLICAS = []
+for number, url in enumerate(
+    filter(None, os.environ.get("DATABASE_REPLICA_URLS", "").split(",")), 1
+):
+    DATABASES[f"replica{number}"] = dj_database_url.parse(url, conn_max_age=500)
+    DATABASE_REPLICAS.append(f"replica{number}")
+
+# Connection pool of psycopg 3 (poetry install --extras pool), used instead of
+# persistent connections when DATABASE_POOL=True. Sizes are per worker process.
+if os.environ.get("DATABASE_POOL") == "True":
+    for database in DATABASES.values():
+        if database["ENGINE"] != "django.db.backends.postgresql":
+            continue
+        try:
+            import psycopg_pool  # noqa
+        except ImportError:
+            from django.core.exceptions import ImproperlyConfigured
+
+            raise ImproperlyConfigured(
+                "DATABASE_POOL=True requires psycopg 3 with psycopg_pool, "
+                "install them with: poetry install --extras pool"
+            )
+        database["CONN_MAX_AGE"] = 0
+        database["CONN_HEALTH_CHECKS"] = (
+            os.environ.get("DATABASE_POOL_HEALTH_CHECKS") != "False"
+        )
+        database.setdefault("OPTIONS", {})["pool"] = {
+            "min_size": int(os.environ.get("DATABASE_POOL_MIN_SIZE", 2)),
+            "max_size": int(os.environ.get("DATABASE_POOL_MAX_SIZE", 10)),
+            # Seconds to wait for a connection before failing
+            "timeout": float(os.environ.get("DATABASE_POOL_TIMEOUT", 10)),
+            # Seconds after which idle connections above min_size are closed
+            "max_idle": float(os.environ.get("DATABASE_POOL_MAX_IDLE", 300)),
+        }
+
+# SQLite in production (SQLITE_PRODUCTION=True), for small installs running
+# several workers on the SQLite database, see common/sqlite_writer.py.
+SQLITE_WRITER = {
+    "ACTIVE": os.environ.get("SQLITE_PRODUCTION") == "True",
+    "RETRIES": 5,
+    "BACKOFF": 0.05,  # seconds, doubled after every attempt
+}
+if SQLITE_WRITER["ACTIVE"]:
+    for database in DATABASES.values():
+        if database["ENGINE"] != "django.db.backends.sqlite3":
+            continue
+        database.setdefault("OPTIONS", {}).update(
+            {
+                "transaction_mode": "IMMEDIATE",
+                "init_command": (
+                    "PRAGMA journal_mode=WAL;"
+                    "PRAGMA busy_timeout=5000;"
+                    "PRAGMA synchronous=NORMAL;"
+                    "PRAGMA mmap_size=134217728;"
+                ),
+            }
+        )
+
+DATABASE_ROUTERS = ["common.db_router.ReplicaRouter"]
+
+DATABASE_REPLICA_ROUTING = {
+    # Users read from the primary for this long after a mutation
+    "STICKY_SECONDS": 5,
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# Local memory cache is per process, set DJANGO_CACHE_DIR to share
+# the cache (and team versions) between workers on the same node.
+
+if os.environ.get("DJANGO_CACHE_DIR"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": os.environ["DJANGO_CACHE_DIR"],
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+# Broadcasts invalidations of the per-worker caches, see common/invalidation.py.
+# Use common.invalidation.PostgresBus (or PollingBus on SQLite) when running
+# several workers with the local memory cache.
+CACHE_INVALIDATION = {
+    "BACKEND": os.environ.get(
+        "CACHE_INVALIDATION_BACKEND", "common.invalidation.LocalBus"
+    ),
+    "POLL_INTERVAL": 1,  # seconds, PollingBus only
+}
+
+# Internal metrics endpoint (/internal/metrics), disabled without a token.
+# Timing of GraphQL operations and resolvers is recorded only when enabled,
+# see common/instrumentation.py.
+METRICS = {
+    "TOKEN": os.environ.get("METRICS_TOKEN"),
+}
+
+# Log of slow GraphQL operations with their SQL statements and plans,
+# see common/slow_log.py. Disabled when there is no threshold.
+GRAPHQL_SLOW_LOG = {
+    "THRESHOLD": (
+        float(os.environ["GRAPHQL_SLOW_LOG_THRESHOLD"])  # seconds
+        if os.environ.get("GRAPHQL_SLOW_LOG_THRESHOLD")
+        else None
+    ),
+    "PATH": os.environ.get("GRAPHQL_SLOW_LOG_PATH", BASE_DIR / "slow_operations.log"),
+    # Runs the explained statements again (not FOR UPDATE/SHARE), PostgreSQL only
+    "EXPLAIN_ANALYZE": os.environ.get("GRAPHQL_SLOW_LOG_EXPLAIN_ANALYZE") == "True",
+    "EXPLAINED_STATEMENTS": 3,  # slowest SELECT statements of an operation
+    "MAX_STATEMENTS": 1000,
+    "MAX_BYTES": 10 * 1024 * 1024,
+    "BACKUP_COUNT": 5,
+}
+
+# Profiling of GraphQL requests requested by staff users with the X-Profile
+# header or sampled, see common/profiling.py.
+GRAPHQL_PROFILING = {
+    "SAMPLE_RATE": float(os.environ.get("GRAPHQL_PROFILING_SAMPLE_RATE", 0)),
+    "PROFILER": os.environ.get("GRAPHQL_PROFILER", "sampling"),  # or cprofile
+    "DIRECTORY": os.environ.get("GRAPHQL_PROFILING_DIRECTORY", BASE_DIR / "profiles"),
+    "SAMPLING_INTERVAL": 0.005,  # seconds
+}
+
+# Memory profiling of GraphQL operations with tracemalloc, slows workers
+# down, see common/memory_profiling.py.
+GRAPHQL_MEMORY_PROFILING = {
+    "ACTIVE": os.environ.get("GRAPHQL_MEMORY_PROFILING") == "True",
+    "DIRECTORY": os.environ.get(
+        "GRAPHQL_MEMORY_SNAPSHOTS_DIRECTORY", BASE_DIR / "memory_snapshots"
+    ),
+    "FRAMES": 10,  # of tracebacks of allocations
+    "TOP_SITES": 10,
+}
+
+# Memory-mapped membership index shared by workers on a node,
+# see teams/membership_index.py. Disabled when there is no path.
+MEMBERSHIP_INDEX = {
+    "PATH": os.environ.get("MEMBERSHIP_INDEX_PATH"),
+    # Seconds after which a node rebuilds its index from the database
+    "MAX_AGE": 60 * 60,
+    # Seconds the membership log is kept, must be well above MAX_AGE
+    "LOG_RETENTION": 24 * 60 * 60,
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.1/ref/settings/#auth-password-validators
@@ -158,12 +310,51 @@ STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
 
 GRAPHENE = {
     "SCHEMA": "homekeeper.schema.schema",
+    # common.instrumentation.InstrumentationMiddleware is added by the view
+    # when operations are measured, see HomeKeeperGraphQLView.get_middleware
     "MIDDLEWARE": [
         "graphql_jwt.middleware.JSONWebTokenMiddleware",
     ],
     "ATOMIC_MUTATIONS": True,
 }
 
+# Response cache of read-only queries, see common/response_cache.py.
+# Entries are invalidated by team versions bumped in post_save handlers.
+# Opt-in, with several workers it needs a shared cache or an invalidation bus.
+GRAPHQL_RESPONSE_CACHE = {
+    "ACTIVE": os.environ.get("GRAPHQL_RESPONSE_CACHE") == "True",
+    "TIMEOUT": 300,  # seconds
+    "FIELDS": [
+        "tasks",
+        "taskInstances",
+        "completions",
+        "teamMembersPoints",
+        "teamChanges",
+        "dashboard",
+    ],
+}
+
+# Values-based fast path of hot list fields, see common/fast_lists.py.
+GRAPHQL_FAST_LISTS = {
+    "ACTIVE": os.environ.get("GRAPHQL_FAST_LISTS") == "True",
+}
+
+# Pub/sub backend of GraphQL subscriptions, see common/pubsub.py.
+# common.pubsub.PostgresBackend shares events between workers with LISTEN/NOTIFY.
+GRAPHQL_SUBSCRIPTIONS = {
+    "BACKEND": os.environ.get(
+        "GRAPHQL_SUBSCRIPTIONS_BACKEND", "common.pubsub.InProcessBackend"
+    ),
+}
+
+# Responses of mutations sent with an Idempotency-Key, see common/idempotency.py.
+# Expired keys are removed by `python manage.py purgeidempotencykeys`.
+GRAPHQL_IDEMPOTENCY = {
+    "TTL": 24 * 60 * 60,  # seconds
+    # Seconds after which a key of an unfinished request can be claimed again
+    "LEASE": 60,
+}
+
 GRAPHENE_DJANGO_EXTRAS = {
     "DEFAULT_PAGINATION_CLASS": "graphene_django_extras.paginations.LimitOffsetGraphqlPagination",
     "DEFAULT_PAGE_SIZE": 20,
@@ -172,6 +363,14 @@ GRAPHENE_DJANGO_EXTRAS = {
     "CACHE_TIMEOUT": 300,  # seconds
 }
 
+# Automatic persisted queries, the allowlist is generated with
+# `python manage.py dumppersistedqueries`. In strict mode only allowlisted
+# queries are executed.
+GRAPHQL_PERSISTED_QUERIES = {
+    "ALLOWLIST_PATH": BASE_DIR / "persisted_queries.json",
+    "STRICT": os.environ.get("GRAPHQL_PERSISTED_QUERIES_STRICT", "") == "True",
+}
+
 AUTHENTICATION_BACKENDS = [
     "graphql_jwt.backends.JSONWebTokenBackend",
     "django.contrib.auth.backends.ModelBackend",
@@ -17,9 +17,10 @@ from django.contrib import admin
 from django.urls import path
 from django.views.decorators.csrf import csrf_exempt
 
-from graphene_django.views import GraphQLView
+from common.views import HomeKeeperGraphQLView, metrics_view
 
 urlpatterns = [
     path("admin/", admin.site.urls),
-    path("graphql/", csrf_exempt(GraphQLView.as_view(graphiql=True))),
+    path("graphql/", csrf_exempt(HomeKeeperGraphQLView.as_view(graphiql=True))),
+    path("internal/metrics", metrics_view),
 ]
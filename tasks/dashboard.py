@@ -0,0 +1,106 @@
+"""
+Everything the app shows on open, for all teams of the user at once.
+
+Instead of listing tasks, instances, completions and points team by team,
+the dashboard is assembled from a fixed number of queries over all teams:
+teams, active task instances with their tasks, recent completions (limited
+per team with a window function), members and their points summed in SQL.
+"""
+
+import collections
+import typing
+
+from django.db.models import F, Sum, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+
+from tasks.models import TaskInstance, TaskInstanceCompletion
+from teams.models import Team
+
+
+class MemberPoints(typing.NamedTuple):
+    member: typing.Any
+    points: int
+
+
+class TeamDashboard(typing.NamedTuple):
+    team: Team
+    active_task_instances: typing.List[TaskInstance]
+    recent_completions: typing.List[TaskInstanceCompletion]
+    members_points: typing.List[MemberPoints]
+
+
+def get_dashboard(user_id: int, completions_limit: int) -> typing.List[TeamDashboard]:
+    """
+    Returns teams of the user with their active task instances, up to
+    completions_limit latest completions and points of every member.
+    Deleted completions, instances and tasks are left out and grant no points.
+    """
+    teams = list(Team.objects.filter(members=user_id).order_by("id"))
+    team_ids = [team.id for team in teams]
+
+    task_instances = collections.defaultdict(list)
+    for task_instance in (
+        TaskInstance.objects.filter(
+            task__team__in=team_ids,
+            completed=False,
+            active_from__lte=timezone.now(),
+            deleted_at=None,
+            task__deleted_at=None,
+        )
+        .select_related("task")
+        .order_by("active_from", "id")
+    ):
+        task_instances[task_instance.task.team_id].append(task_instance)
+
+    granted = TaskInstanceCompletion.objects.filter(
+        task_instance__task__team__in=team_ids,
+        deleted_at=None,
+        task_instance__deleted_at=None,
+        task_instance__task__deleted_at=None,
+    )
+    completions = collections.defaultdict(list)
+    for completion in (
+        granted.annotate(
+            team_row=Window(
+                RowNumber(),
+                partition_by=F("task_instance__task__team"),
+                order_by=[F("created_at").desc(), F("id").desc()],
+            )
+        )
+        .filter(team_row__lte=completions_limit)
+        .select_related("task_instance__task", "user_who_completed_task")
+        .order_by("-created_at", "-id")
+    ):
+        completions[completion.task_instance.task.team_id].append(completion)
+
+    points = {
+        (row["task_instance__task__team"], row["user_who_completed_task"]): row[
+            "points"
+        ]
+        for row in granted.values(
+            "task_instance__task__team", "user_who_completed_task"
+        ).annotate(points=Sum("points_granted"))
+    }
+    members_points = collections.defaultdict(list)
+    for membership in (
+        Team.members.through.objects.filter(team__in=team_ids)
+        .select_related("user")
+        .order_by("user_id")
+    ):
+        members_points[membership.team_id].append(
+            MemberPoints(
+                membership.user,
+                points.get((membership.team_id, membership.user_id), 0),
+            )
+        )
+
+    return [
+        TeamDashboard(
+            team=team,
+            active_task_instances=task_instances[team.id],
+            recent_completions=completions[team.id],
+            members_points=members_points[team.id],
+        )
+        for team in teams
+    ]
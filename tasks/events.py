@@ -0,0 +1,77 @@
+"""
+Team events published to ``teamEvents`` subscribers, so clients can refresh
+(e.g. with ``teamChanges``) when something changes instead of polling.
+"""
+
+import datetime
+import enum
+import typing
+
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from django.utils import timezone
+
+from common import pubsub
+from teams.models import Team
+
+
+class TeamEventKind(enum.Enum):
+    TASK_CREATED = "task_created"
+    TASK_UPDATED = "task_updated"
+    TASK_DELETED = "task_deleted"
+    COMPLETION_SUBMITTED = "completion_submitted"
+    COMPLETION_REVERTED = "completion_reverted"
+
+
+class TeamEvent(typing.NamedTuple):
+    kind: TeamEventKind
+    team_id: int
+    task_id: int
+    occurred_at: datetime.datetime
+    task_instance_id: typing.Optional[int] = None
+    completion_id: typing.Optional[int] = None
+    user_id: typing.Optional[int] = None
+
+    def to_message(self) -> dict:
+        return {
+            **self._asdict(),
+            "kind": self.kind.value,
+            "occurred_at": self.occurred_at.isoformat(),
+        }
+
+    @classmethod
+    def from_message(cls, message: dict) -> "TeamEvent":
+        return cls(
+            **{
+                **message,
+                "kind": TeamEventKind(message["kind"]),
+                "occurred_at": datetime.datetime.fromisoformat(message["occurred_at"]),
+            }
+        )
+
+
+def get_channel(team_id: int) -> str:
+    return f"team-events:{team_id}"
+
+
+def publish(kind: TeamEventKind, team_id: int, task_id: int, **kwargs) -> None:
+    """Publishes the event once the current transaction is committed."""
+    event = TeamEvent(kind, team_id, task_id, timezone.now(), **kwargs)
+    # Robust, a failing backend must not fail the committed request
+    transaction.on_commit(
+        lambda: pubsub.publish(get_channel(team_id), event.to_message()),
+        robust=True,
+    )
+
+
+async def subscribe(
+    team_id: int, user_id: typing.Optional[int] = None
+) -> typing.AsyncIterator[TeamEvent]:
+    """
+    Yields events of the team. With user_id, the membership is checked again
+    before every event, as the user may leave the team while subscribed.
+    """
+    async for message in pubsub.subscribe(get_channel(team_id)):
+        if user_id is not None:
+            await sync_to_async(Team.check_membership)(user_id, team_id)
+        yield TeamEvent.from_message(message)
@@ -0,0 +1,34 @@
+# Generated by Django 5.1.15 on 2026-10-19 14:33
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tasks", "0006_auto_20210724_2330"),
+        ("teams", "0008_auto_20210724_2330"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="task",
+            index=models.Index(
+                fields=["team", "modified_at"], name="tasks_task_team_id_f217c5_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="taskinstance",
+            index=models.Index(
+                fields=["modified_at"], name="tasks_taski_modifie_c91182_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="taskinstancecompletion",
+            index=models.Index(
+                fields=["modified_at"], name="tasks_taski_modifie_027f45_idx"
+            ),
+        ),
+    ]
@@ -14,6 +14,42 @@ from common.models import TrackingFieldsMixin
 POINTS_INCREASE_INTERVAL = 7
 
 
+def prize_step(
+    refresh_interval: typing.Optional[datetime.timedelta],
+) -> datetime.timedelta:
+    """Returns the period after which the task instance prize increases."""
+    multiplication_interval = refresh_interval or datetime.timedelta(
+        days=POINTS_INCREASE_INTERVAL
+    )
+    return multiplication_interval * 2
+
+
+def next_prize_step_at(
+    active_from: datetime.datetime,
+    refresh_interval: typing.Optional[datetime.timedelta],
+    at: datetime.datetime,
+) -> datetime.datetime:
+    """
+    Returns the moment after which the prize (a ceil of elapsed prize steps)
+    changes next. The first step boundary is active_from itself.
+    """
+    step = prize_step(refresh_interval)
+    steps_elapsed = -((active_from - at) // step)  # ceil((at - active_from) / step)
+    return active_from + steps_elapsed * step
+
+
+def prize_at(
+    base_points_prize: int,
+    refresh_interval: typing.Optional[datetime.timedelta],
+    active_from: datetime.datetime,
+    at: datetime.datetime,
+) -> int:
+    """Returns the prize of a task instance active from active_from at the moment."""
+    return base_points_prize * math.ceil(
+        (at - active_from) / prize_step(refresh_interval)
+    )
+
+
 class Task(TrackingFieldsMixin):
     """Data model representing task, includes description of the task."""
 
@@ -26,6 +62,9 @@ class Task(TrackingFieldsMixin):
     refresh_interval = models.DurationField(blank=True, null=True)
     is_recurring = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [models.Index(fields=["team", "modified_at"])]
+
     @property
     def active(self) -> bool:
         """
@@ -40,6 +79,20 @@ class Task(TrackingFieldsMixin):
             ).all()
         )
 
+    @staticmethod
+    def active_filter(prefix: str = "") -> models.Q:
+        """
+        SQL counterpart of `active` for tasks at the lookup prefix,
+        e.g. "task_instance__task__".
+        """
+        return models.Q(**{f"{prefix}deleted_at": None}) & models.Q(
+            models.Exists(
+                TaskInstance.objects.filter(
+                    TaskInstance.active_filter(), task=models.OuterRef(f"{prefix}id")
+                )
+            )
+        )
+
 
 class TaskInstance(TrackingFieldsMixin):
     """
@@ -51,6 +104,9 @@ class TaskInstance(TrackingFieldsMixin):
     active_from = models.DateTimeField()
     completed = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [models.Index(fields=["modified_at"])]
+
     @property
     def active(self) -> bool:
         """
@@ -69,6 +125,18 @@ class TaskInstance(TrackingFieldsMixin):
             and self.task.deleted_at is None
         )
 
+    @staticmethod
+    def active_filter(prefix: str = "") -> models.Q:
+        """SQL counterpart of `active` for task instances at the lookup prefix."""
+        return models.Q(
+            **{
+                f"{prefix}completed": False,
+                f"{prefix}active_from__lte": now(),
+                f"{prefix}deleted_at": None,
+                f"{prefix}task__deleted_at": None,
+            }
+        )
+
     @property
     def current_prize(self) -> int:
         """Calculates current value of the points reward for task instance completion.
@@ -78,11 +146,34 @@ class TaskInstance(TrackingFieldsMixin):
         by the number of times that interval has passed twice. For single tasks,
         the constant is taken as interval - currently 7 days.
         """
-        multiplication_interval = self.task.refresh_interval or datetime.timedelta(
-            days=POINTS_INCREASE_INTERVAL
+        return prize_at(
+            self.task.base_points_prize,
+            self.task.refresh_interval,
+            self.active_from,
+            now(),
         )
-        return self.task.base_points_prize * math.ceil(
-            (now() - self.active_from) / (multiplication_interval * 2)
+
+    @staticmethod
+    def next_change_at(team_id: int) -> typing.Optional[datetime.datetime]:
+        """
+        Returns the nearest moment (not earlier than now) at which `active` or
+        `current_prize` of any uncompleted task instance in the given team changes,
+        i.e. the instance becomes active or its prize increases.
+        Returns None when nothing is going to change without a write.
+        """
+        current = now()
+        instances = TaskInstance.objects.filter(
+            task__team=team_id,
+            completed=False,
+            deleted_at=None,
+            task__deleted_at=None,
+        ).values_list("active_from", "task__refresh_interval")
+        return min(
+            (
+                next_prize_step_at(active_from, refresh_interval, current)
+                for active_from, refresh_interval in instances
+            ),
+            default=None,
         )
 
 
@@ -97,6 +188,9 @@ class TaskInstanceCompletion(TrackingFieldsMixin):
     )
     points_granted = models.IntegerField()
 
+    class Meta:
+        indexes = [models.Index(fields=["modified_at"])]
+
     def save(self, *args, **kwargs):
         if self._state.adding is True:
             self.grant_points_prize()
@@ -104,9 +198,17 @@ class TaskInstanceCompletion(TrackingFieldsMixin):
 
     def grant_points_prize(self):
         """
-        Sets current reward of the task as granted points. Does not save.
+        Sets the reward of the task at the time of the completion as granted
+        points, created_at is in the past for completions synced by offline
+        clients. Does not save.
         """
-        self.points_granted = self.task_instance.current_prize
+        task = self.task_instance.task
+        self.points_granted = prize_at(
+            task.base_points_prize,
+            task.refresh_interval,
+            self.task_instance.active_from,
+            self.created_at,
+        )
 
     @staticmethod
     def count_user_points(
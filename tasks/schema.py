@@ -1,16 +1,23 @@
 import graphene
+from asgiref.sync import sync_to_async
+from django.db.models import Q
+from django.utils import timezone
 
 from graphene_django import DjangoObjectType
 from graphene_django_extras import DjangoSerializerMutation
 
 from graphql.type import GraphQLResolveInfo
 from graphql_jwt.decorators import login_required
+from graphql_jwt.exceptions import PermissionDenied
 
+from common import fast_lists
 from common.schema import AuthDjangoSerializerMutationMixin
-from tasks.models import Task, TaskInstance, TaskInstanceCompletion
+from tasks import dashboard, events, sync
+from tasks.models import Task, TaskInstance, TaskInstanceCompletion, prize_at
 from tasks.serializers import TaskSerializer, TaskInstanceCompletionSerializer
 
 from teams.models import Team
+from teams.schema import TeamType
 
 from users.schema import UserType
 
@@ -67,6 +74,69 @@ class TaskInstanceCompletionType(DjangoObjectType):
         )
 
 
+# Fields of list queries read with values() on the fast path, see common/fast_lists.py
+TASK_COLUMNS = {
+    "id": "id",
+    "name": "name",
+    "description": "description",
+    "base_points_prize": "base_points_prize",
+    "refresh_interval": "refresh_interval",
+    "is_recurring": "is_recurring",
+}
+
+TASK_ROWS = fast_lists.Shape(
+    TaskType,
+    columns=TASK_COLUMNS,
+    conditions={"active": Task.active_filter},
+)
+
+TASK_INSTANCE_ROWS = fast_lists.Shape(
+    TaskInstanceType,
+    columns={
+        "id": "id",
+        "active_from": "active_from",
+        "completed": "completed",
+        "deleted_at": "deleted_at",
+    },
+    relations={"task": ("task", TASK_ROWS)},
+    conditions={"active": TaskInstance.active_filter},
+    computed={
+        "current_prize": (
+            ("task__base_points_prize", "task__refresh_interval", "active_from"),
+            lambda base_points_prize, refresh_interval, active_from: prize_at(
+                base_points_prize, refresh_interval, active_from, timezone.now()
+            ),
+        )
+    },
+)
+
+USER_ROWS = fast_lists.Shape(
+    UserType,
+    columns={
+        "id": "id",
+        "username": "username",
+        "first_name": "first_name",
+        "last_name": "last_name",
+        "email": "email",
+    },
+)
+
+COMPLETION_ROWS = fast_lists.Shape(
+    TaskInstanceCompletionType,
+    columns={
+        "id": "id",
+        "points_granted": "points_granted",
+        "created_at": "created_at",
+        "deleted_at": "deleted_at",
+    },
+    relations={
+        "task_instance": ("task_instance", TASK_INSTANCE_ROWS),
+        "user_who_completed_task": ("user_who_completed_task", USER_ROWS),
+    },
+    conditions={"active": lambda prefix: Q(**{f"{prefix}deleted_at": None})},
+)
+
+
 class TaskSerializerMutation(
     AuthDjangoSerializerMutationMixin, DjangoSerializerMutation
 ):
@@ -128,6 +198,111 @@ class MemberPointsType(graphene.ObjectType):
     points = graphene.Int()
 
 
+class TeamDashboardType(graphene.ObjectType):
+    team = graphene.Field(TeamType)
+    active_task_instances = graphene.List(TaskInstanceType)
+    recent_completions = graphene.List(TaskInstanceCompletionType)
+    members_points = graphene.List(MemberPointsType)
+
+
+class TombstoneType(graphene.ObjectType):
+    model = graphene.String()
+    id = graphene.ID()
+    deleted_at = graphene.DateTime()
+
+
+class TeamChangesType(graphene.ObjectType):
+    tasks = graphene.List(TaskType)
+    task_instances = graphene.List(TaskInstanceType)
+    completions = graphene.List(TaskInstanceCompletionType)
+    deleted = graphene.List(TombstoneType)
+    cursor = graphene.String()
+
+
+class SyncOperationKind(graphene.Enum):
+    SUBMIT_TASK_INSTANCE_COMPLETION = sync.SUBMIT_TASK_INSTANCE_COMPLETION
+    REVERT_TASK_INSTANCE_COMPLETION = sync.REVERT_TASK_INSTANCE_COMPLETION
+    UPDATE_TASK = sync.UPDATE_TASK
+
+
+SyncStatusType = graphene.Enum.from_enum(sync.SyncStatus, name="SyncStatus")
+
+
+class TaskUpdateInput(graphene.InputObjectType):
+    name = graphene.String()
+    description = graphene.String()
+    base_points_prize = graphene.Int()
+    refresh_interval = graphene.String()
+    is_recurring = graphene.Boolean()
+
+
+class SyncOperationInput(graphene.InputObjectType):
+    client_id = graphene.String(required=True)
+    kind = SyncOperationKind(required=True)
+    client_timestamp = graphene.DateTime(required=True)
+    task_instance_id = graphene.Int(
+        description="TaskInstance to complete (SUBMIT_TASK_INSTANCE_COMPLETION)."
+    )
+    completion_id = graphene.Int(
+        description="Completion to revert (REVERT_TASK_INSTANCE_COMPLETION)."
+    )
+    completion_client_id = graphene.String(
+        description="""Client id of an earlier operation in the same batch
+            that submitted the completion to revert.""",
+    )
+    task_id = graphene.Int(description="Task to update (UPDATE_TASK).")
+    task = TaskUpdateInput(description="Changed Task fields (UPDATE_TASK).")
+
+
+class SyncOperationResultType(graphene.ObjectType):
+    client_id = graphene.String()
+    status = graphene.Field(SyncStatusType)
+    object_id = graphene.ID()
+    message = graphene.String()
+
+
+class SyncPush(graphene.Mutation):
+    """
+    Applies mutations queued by an offline client in a single request.
+    Operations are applied in the given order, each of them succeeds or
+    fails separately. See tasks.sync.apply_operations for conflict rules.
+    """
+
+    class Arguments:
+        operations = graphene.List(graphene.NonNull(SyncOperationInput), required=True)
+
+    results = graphene.List(SyncOperationResultType)
+
+    @login_required
+    def mutate(root, info, operations):
+        results = sync.apply_operations(
+            info.context,
+            [
+                sync.SyncOperation(
+                    **{
+                        **operation,
+                        "kind": getattr(operation.kind, "value", operation.kind),
+                    }
+                )
+                for operation in operations
+            ],
+        )
+        return SyncPush(results=results)
+
+
+TeamEventKindType = graphene.Enum.from_enum(events.TeamEventKind, name="TeamEventKind")
+
+
+class TeamEventType(graphene.ObjectType):
+    kind = graphene.Field(TeamEventKindType)
+    team_id = graphene.ID()
+    task_id = graphene.ID()
+    task_instance_id = graphene.ID()
+    completion_id = graphene.ID()
+    user_id = graphene.ID()
+    occurred_at = graphene.DateTime()
+
+
 class Query(graphene.ObjectType):
     tasks = graphene.Field(
         graphene.List(TaskType),
@@ -173,6 +348,24 @@ class Query(graphene.ObjectType):
             Logged in user has to be member of the given team.
         """,
     )
+    dashboard = graphene.Field(
+        graphene.List(TeamDashboardType),
+        completions_limit=graphene.Int(default_value=20),
+        description="""Lists teams of the logged in user with their active
+            TaskInstances, latest TaskInstanceCompletions (up to the limit
+            per team) and points of members, for all teams at once.
+        """,
+    )
+    team_changes = graphene.Field(
+        TeamChangesType,
+        team_id=graphene.Int(required=True),
+        since=graphene.String(),
+        description="""Lists Tasks, TaskInstances and TaskInstanceCompletions
+            of the given team created, modified or deleted since the cursor
+            (everything when there is no cursor). Deleted rows are returned
+            as tombstones. Pass the returned cursor in the next call.
+        """,
+    )
 
     @login_required
     def resolve_tasks(
@@ -180,6 +373,13 @@ class Query(graphene.ObjectType):
     ):
         Team.check_membership(info.context.user.id, team_id)
         tasks = Task.objects.filter(team=team_id)
+        rows = fast_lists.resolve(
+            info,
+            tasks.filter(Task.active_filter()) if only_active else tasks,
+            TASK_ROWS,
+        )
+        if rows is not None:
+            return rows
         return [t for t in tasks.all() if t.active] if only_active else tasks
 
     @login_required
@@ -188,6 +388,17 @@ class Query(graphene.ObjectType):
     ):
         Team.check_membership(info.context.user.id, team_id)
         task_instances = TaskInstance.objects.filter(task__team=team_id)
+        rows = fast_lists.resolve(
+            info,
+            (
+                task_instances.filter(TaskInstance.active_filter())
+                if only_active
+                else task_instances
+            ),
+            TASK_INSTANCE_ROWS,
+        )
+        if rows is not None:
+            return rows
         return (
             [t for t in task_instances.all() if t.active]
             if only_active
@@ -211,6 +422,17 @@ class Query(graphene.ObjectType):
         task_completions = TaskInstanceCompletion.objects.filter(
             task_instance__task__team=team_id
         ).order_by("-created_at")
+        rows = fast_lists.resolve(
+            info,
+            (
+                task_completions.filter(deleted_at=None)
+                if only_active
+                else task_completions
+            ),
+            COMPLETION_ROWS,
+        )
+        if rows is not None:
+            return rows
 
         return (
             [t for t in task_completions.all() if t.active]
@@ -251,6 +473,17 @@ class Query(graphene.ObjectType):
             for member in team.members.all()
         ]
 
+    @login_required
+    def resolve_dashboard(self, info: GraphQLResolveInfo, completions_limit: int = 20):
+        return dashboard.get_dashboard(info.context.user.id, completions_limit)
+
+    @login_required
+    def resolve_team_changes(
+        self, info: GraphQLResolveInfo, team_id: int, since: str = None
+    ):
+        Team.check_membership(info.context.user.id, team_id)
+        return sync.get_team_changes(team_id, since)
+
 
 class Mutation(graphene.ObjectType):
     create_task = TaskSerializerMutation.CreateField()
@@ -263,3 +496,20 @@ class Mutation(graphene.ObjectType):
     revert_task_instance_completion = (
         TaskInstanceCompletionSerializerMutation.DeleteField()
     )
+
+    sync_push = SyncPush.Field()
+
+
+class Subscription(graphene.ObjectType):
+    team_events = graphene.Field(
+        TeamEventType,
+        team_id=graphene.Int(required=True),
+        description="Tasks and completions of the team being changed.",
+    )
+
+    async def subscribe_team_events(root, info: GraphQLResolveInfo, team_id: int):
+        # login_required does not support async resolvers
+        if not info.context.user.is_authenticated:
+            raise PermissionDenied()
+        await sync_to_async(Team.check_membership)(info.context.user.id, team_id)
+        return events.subscribe(team_id, user_id=info.context.user.id)
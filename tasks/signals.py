@@ -3,7 +3,9 @@ from django.db import transaction
 from django.dispatch import receiver
 from django.utils import timezone
 
+from tasks import events
 from tasks.models import Task, TaskInstance, TaskInstanceCompletion
+from teams import versions
 
 
 @receiver(post_save, sender=Task)
@@ -43,8 +45,9 @@ def update_task_instance_on_completion(
         ):
             TaskInstance.objects.create(
                 task=instance.task_instance.task,
+                # From the time of the completion, also when synced later
                 active_from=(
-                    timezone.now() + instance.task_instance.task.refresh_interval
+                    instance.created_at + instance.task_instance.task.refresh_interval
                 ),
             )
     elif instance.deleted_at is not None:
@@ -70,3 +73,53 @@ def update_task_instance_on_completion(
         else:
             instance.task_instance.completed = False
             instance.task_instance.save()
+
+
+@receiver(post_save, sender=Task)
+def bump_team_version_on_task_change(sender, instance: Task, **kwargs):
+    versions.bump_team_versions(instance.team_id)
+
+
+@receiver(post_save, sender=TaskInstance)
+def bump_team_version_on_task_instance_change(
+    sender, instance: TaskInstance, **kwargs
+):
+    versions.bump_team_versions(instance.task.team_id)
+
+
+@receiver(post_save, sender=TaskInstanceCompletion)
+def bump_team_version_on_completion_change(
+    sender, instance: TaskInstanceCompletion, **kwargs
+):
+    versions.bump_team_versions(instance.task_instance.task.team_id)
+
+
+@receiver(post_save, sender=Task)
+def publish_task_event(sender, instance: Task, created, **kwargs):
+    if created:
+        kind = events.TeamEventKind.TASK_CREATED
+    elif instance.deleted_at is not None:
+        kind = events.TeamEventKind.TASK_DELETED
+    else:
+        kind = events.TeamEventKind.TASK_UPDATED
+    events.publish(kind, instance.team_id, instance.id)
+
+
+@receiver(post_save, sender=TaskInstanceCompletion)
+def publish_completion_event(
+    sender, instance: TaskInstanceCompletion, created, **kwargs
+):
+    if created:
+        kind = events.TeamEventKind.COMPLETION_SUBMITTED
+    elif instance.deleted_at is not None:
+        kind = events.TeamEventKind.COMPLETION_REVERTED
+    else:
+        return
+    events.publish(
+        kind,
+        instance.task_instance.task.team_id,
+        instance.task_instance.task_id,
+        task_instance_id=instance.task_instance_id,
+        completion_id=instance.id,
+        user_id=instance.user_who_completed_task_id,
+    )
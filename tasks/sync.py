@@ -0,0 +1,260 @@
+"""
+Synchronization of team data with offline clients.
+
+Clients keep a local copy of tasks, task instances and completions and ask
+only for rows modified after a cursor. Soft-deleted rows are returned as
+tombstones, so clients can apply deltas locally. Mutations queued while
+offline are pushed back in a single request and applied in order.
+"""
+
+import base64
+import binascii
+import datetime
+import enum
+import typing
+
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import transaction
+from django.db.models import QuerySet
+from django.utils import timezone
+from graphql import GraphQLError
+from rest_framework.exceptions import ValidationError
+
+from tasks.models import Task, TaskInstance, TaskInstanceCompletion
+from tasks.serializers import TaskInstanceCompletionSerializer, TaskSerializer
+from teams.models import Team
+
+# Rows are saved with modified_at set before their transaction commits, so the
+# cursor lags behind to not skip rows committed after the changes were listed.
+# Clients may receive some rows twice and are expected to upsert them.
+CURSOR_LAG = datetime.timedelta(seconds=10)
+
+
+class Tombstone(typing.NamedTuple):
+    model: str
+    id: int
+    deleted_at: datetime.datetime
+
+
+class TeamChanges(typing.NamedTuple):
+    tasks: typing.List[Task]
+    task_instances: typing.List[TaskInstance]
+    completions: typing.List[TaskInstanceCompletion]
+    deleted: typing.List[Tombstone]
+    cursor: str
+
+
+def encode_cursor(moment: datetime.datetime) -> str:
+    return base64.urlsafe_b64encode(moment.isoformat().encode()).decode()
+
+
+def decode_cursor(cursor: str) -> datetime.datetime:
+    try:
+        return datetime.datetime.fromisoformat(
+            base64.urlsafe_b64decode(cursor.encode()).decode()
+        )
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError(f"Invalid cursor {cursor}")
+
+
+def get_team_changes(team_id: int, since: typing.Optional[str] = None) -> TeamChanges:
+    """
+    Returns rows of the given team created, modified or soft-deleted after
+    the cursor (all rows when there is no cursor) and a cursor for the next call.
+    """
+    cursor = encode_cursor(timezone.now() - CURSOR_LAG)
+
+    tasks = Task.objects.filter(team=team_id)
+    task_instances = TaskInstance.objects.filter(task__team=team_id).select_related(
+        "task"
+    )
+    completions = TaskInstanceCompletion.objects.filter(
+        task_instance__task__team=team_id
+    ).select_related("task_instance", "user_who_completed_task")
+
+    if since is not None:
+        modified_after = decode_cursor(since)
+        tasks = tasks.filter(modified_at__gt=modified_after)
+        task_instances = task_instances.filter(modified_at__gt=modified_after)
+        completions = completions.filter(modified_at__gt=modified_after)
+
+    deleted: typing.List[Tombstone] = []
+    return TeamChanges(
+        tasks=split_deleted(tasks, deleted, since is not None),
+        task_instances=split_deleted(task_instances, deleted, since is not None),
+        completions=split_deleted(completions, deleted, since is not None),
+        deleted=deleted,
+        cursor=cursor,
+    )
+
+
+def split_deleted(
+    queryset: QuerySet, deleted: typing.List[Tombstone], with_tombstones: bool
+) -> list:
+    """
+    Returns rows that are not soft-deleted, adds tombstones of the
+    deleted ones to the `deleted` list if requested.
+    """
+    rows = []
+    for row in queryset.order_by("modified_at"):
+        if row.deleted_at is None:
+            rows.append(row)
+        elif with_tombstones:
+            deleted.append(Tombstone(queryset.model.__name__, row.id, row.deleted_at))
+    return rows
+
+
+class SyncStatus(enum.Enum):
+    APPLIED = "applied"
+    NO_OP = "no_op"
+    FAILED = "failed"
+
+
+class SyncOperation(typing.NamedTuple):
+    """An operation queued by an offline client."""
+
+    client_id: str
+    kind: str
+    client_timestamp: datetime.datetime
+    task_instance_id: typing.Optional[int] = None
+    completion_id: typing.Optional[int] = None
+    completion_client_id: typing.Optional[str] = None
+    task_id: typing.Optional[int] = None
+    task: typing.Optional[dict] = None
+
+
+class SyncResult(typing.NamedTuple):
+    client_id: str
+    status: SyncStatus
+    object_id: typing.Optional[int] = None
+    message: typing.Optional[str] = None
+
+
+SUBMIT_TASK_INSTANCE_COMPLETION = "submit_task_instance_completion"
+REVERT_TASK_INSTANCE_COMPLETION = "revert_task_instance_completion"
+UPDATE_TASK = "update_task"
+
+
+def apply_operations(
+    request, operations: typing.Iterable[SyncOperation]
+) -> typing.List[SyncResult]:
+    """
+    Applies operations queued by an offline client in the given order,
+    each one in its own savepoint, so a failing operation does not roll back
+    the others. Conflicts are resolved as follows:
+        - completing an already completed task instance is a no-op,
+        - reverting an already reverted completion is a no-op,
+        - updating a task modified on the server after the client timestamp
+          is a no-op (the later write wins).
+    Completions may be reverted by the client id of an earlier operation
+    in the same batch.
+    """
+    handlers = {
+        SUBMIT_TASK_INSTANCE_COMPLETION: submit_task_instance_completion,
+        REVERT_TASK_INSTANCE_COMPLETION: revert_task_instance_completion,
+        UPDATE_TASK: update_task,
+    }
+    object_ids: typing.Dict[str, int] = {}
+    results = []
+    for operation in operations:
+        try:
+            with transaction.atomic():
+                result = handlers[operation.kind](request, operation, object_ids)
+        except (
+            ObjectDoesNotExist,
+            GraphQLError,
+            ValidationError,
+            ValueError,
+            RuntimeError,
+        ) as e:
+            result = SyncResult(operation.client_id, SyncStatus.FAILED, message=str(e))
+        if result.object_id is not None:
+            object_ids[operation.client_id] = result.object_id
+        results.append(result)
+    return results
+
+
+def submit_task_instance_completion(
+    request, operation: SyncOperation, object_ids: typing.Dict[str, int]
+) -> SyncResult:
+    task_instance = (
+        TaskInstance.objects.select_for_update(of=("self",))
+        .select_related("task")
+        .get(pk=operation.task_instance_id)
+    )
+    Team.check_membership(request.user.id, task_instance.task.team_id)
+    if task_instance.completed:
+        completion = (
+            TaskInstanceCompletion.objects.filter(
+                task_instance=task_instance, deleted_at=None
+            )
+            .order_by("-created_at")
+            .first()
+        )
+        return SyncResult(
+            operation.client_id,
+            SyncStatus.NO_OP,
+            object_id=completion.id if completion else None,
+            message="TaskInstance is already completed",
+        )
+
+    serializer = TaskInstanceCompletionSerializer(
+        data={"task_instance": task_instance.id}, context={"request": request}
+    )
+    serializer.is_valid(raise_exception=True)
+    # Completions made offline are recorded at the time they were made,
+    # which can't be before the instance became active
+    created_at = min(operation.client_timestamp, timezone.now())
+    completion = serializer.save(created_at=max(created_at, task_instance.active_from))
+    return SyncResult(operation.client_id, SyncStatus.APPLIED, object_id=completion.id)
+
+
+def revert_task_instance_completion(
+    request, operation: SyncOperation, object_ids: typing.Dict[str, int]
+) -> SyncResult:
+    completion_id = operation.completion_id
+    if completion_id is None:
+        if operation.completion_client_id not in object_ids:
+            raise ValueError(
+                f"Unknown completion operation {operation.completion_client_id}"
+            )
+        completion_id = object_ids[operation.completion_client_id]
+    completion = TaskInstanceCompletion.objects.select_related(
+        "task_instance__task"
+    ).get(pk=completion_id)
+    Team.check_membership(request.user.id, completion.task_instance.task.team_id)
+
+    try:
+        completion.delete()
+    except RuntimeError as e:
+        return SyncResult(
+            operation.client_id,
+            SyncStatus.NO_OP,
+            object_id=completion.id,
+            message=str(e),
+        )
+    return SyncResult(operation.client_id, SyncStatus.APPLIED, object_id=completion.id)
+
+
+def update_task(
+    request, operation: SyncOperation, object_ids: typing.Dict[str, int]
+) -> SyncResult:
+    task = Task.objects.select_for_update().get(pk=operation.task_id)
+    Team.check_membership(request.user.id, task.team_id)
+    if task.deleted_at is not None:
+        raise ValueError(f"Task {task.id} is deleted")
+    if task.modified_at > operation.client_timestamp:
+        return SyncResult(
+            operation.client_id,
+            SyncStatus.NO_OP,
+            object_id=task.id,
+            message="Task was modified after the operation",
+        )
+
+    data = {k: v for k, v in (operation.task or {}).items() if v is not None}
+    serializer = TaskSerializer(
+        task, data=data, partial=True, context={"request": request}
+    )
+    serializer.is_valid(raise_exception=True)
+    serializer.save()
+    return SyncResult(operation.client_id, SyncStatus.APPLIED, object_id=task.id)
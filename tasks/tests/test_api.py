@@ -5,12 +5,14 @@ from unittest import mock
 
 from graphene_django.utils.testing import GraphQLTestCase
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 from graphql_jwt.testcases import JSONWebTokenTestCase
 
 from common.tests import factories
 
 from teams.models import Team
-from tasks.models import TaskInstance, Task
+from tasks import sync
+from tasks.models import Task, TaskInstance, TaskInstanceCompletion
 
 
 def create_task_query(name, team_id, base_prize=10, interval=None):
@@ -434,9 +436,13 @@ class TaskTestCase(GraphQLTestCase, JSONWebTokenTestCase):
         )
         task_instances = TaskInstance.objects.filter(task=task)
         self.assertEqual(len(list(task_instances.all())), 2)
-        active_instance = task_instances.filter(completed=False).first()
-        self.assertTrue(active_instance.active)
-        self.assertEqual(mocked + refresh_interval, active_instance.active_from)
+        next_instance = task_instances.filter(completed=False).first()
+        completion = TaskInstanceCompletion.objects.get(task_instance=task_instance)
+        # Scheduled from the time of the completion, active once the interval passed
+        self.assertEqual(
+            completion.created_at + refresh_interval, next_instance.active_from
+        )
+        self.assertFalse(next_instance.active)
 
     def test_revert_completion(self):
         completion = factories.TaskInstanceCompletionFactory(
@@ -607,3 +613,295 @@ class TaskTestCase(GraphQLTestCase, JSONWebTokenTestCase):
             response.data["teamMembersPoints"][1]["points"],
             sum(comp.points_granted for comp in member_completions),
         )
+
+    def test_dashboard(self):
+        other_team = factories.TeamFactory()
+        other_team.members.add(self.user)
+        factories.TeamFactory().members.add(self.member)
+        older = factories.TaskInstanceCompletionFactory(
+            user_who_completed_task=self.member,
+            task_instance__task__team=self.team,
+            created_at=datetime.datetime(2018, 4, 4, 0, 0, 0, tzinfo=pytz.utc),
+        )
+        latest = factories.TaskInstanceCompletionFactory(
+            user_who_completed_task=self.member,
+            task_instance__task__team=self.team,
+            created_at=datetime.datetime(2018, 4, 16, 0, 0, 0, tzinfo=pytz.utc),
+        )
+        reverted = factories.TaskInstanceCompletionFactory(
+            user_who_completed_task=self.user,
+            task_instance__task__team=self.team,
+        )
+        TaskInstanceCompletion.objects.filter(id=reverted.id).update(
+            deleted_at=timezone.now()
+        )
+        TaskInstance.objects.filter(task=self.tasks[2]).update(
+            active_from=timezone.now() + datetime.timedelta(days=1)
+        )
+
+        response = self.client.execute("""query {
+                dashboard(completionsLimit: 1) {
+                    team { id }
+                    activeTaskInstances { task { name } currentPrize }
+                    recentCompletions { id }
+                    membersPoints { member { username } points }
+                }
+            }""")
+
+        self.assertFalse(response.errors)
+        team_dashboard, other_team_dashboard = response.data["dashboard"]
+        self.assertEqual(team_dashboard["team"]["id"], str(self.team.id))
+        self.assertEqual(
+            team_dashboard["activeTaskInstances"],
+            [
+                {"task": {"name": "1"}, "currentPrize": 10},
+                {"task": {"name": "2"}, "currentPrize": 10},
+            ],
+        )
+        self.assertEqual(team_dashboard["recentCompletions"], [{"id": str(latest.id)}])
+        self.assertEqual(
+            team_dashboard["membersPoints"],
+            [
+                {"member": {"username": self.user.username}, "points": 0},
+                {
+                    "member": {"username": self.member.username},
+                    "points": older.points_granted + latest.points_granted,
+                },
+            ],
+        )
+        self.assertEqual(other_team_dashboard["team"]["id"], str(other_team.id))
+        self.assertEqual(other_team_dashboard["activeTaskInstances"], [])
+        self.assertEqual(other_team_dashboard["recentCompletions"], [])
+        self.assertEqual(
+            [
+                points["member"]["username"]
+                for points in other_team_dashboard["membersPoints"]
+            ],
+            [member.username for member in other_team.members.order_by("id")],
+        )
+
+    def test_team_changes(self):
+        query = """query TeamChanges($teamId: Int!, $since: String) {
+            teamChanges(teamId: $teamId, since: $since) {
+                tasks { id name }
+                taskInstances { id }
+                completions { id }
+                deleted { model id deletedAt }
+                cursor
+            }
+        }"""
+        response = self.client.execute(query, {"teamId": self.team.id})
+        self.assertFalse(response.errors)
+        changes = response.data["teamChanges"]
+        self.assertEqual(len(changes["tasks"]), 3)
+        self.assertEqual(len(changes["taskInstances"]), 3)
+        self.assertEqual(changes["completions"], [])
+        self.assertEqual(changes["deleted"], [])
+        self.assertTrue(changes["cursor"])
+
+        cursor = sync.encode_cursor(timezone.now())
+        self.tasks[1].name = "Renamed"
+        self.tasks[1].save()
+        self.tasks[2].delete()
+
+        response = self.client.execute(query, {"teamId": self.team.id, "since": cursor})
+        self.assertFalse(response.errors)
+        changes = response.data["teamChanges"]
+        self.assertEqual(
+            changes["tasks"], [{"id": str(self.tasks[1].id), "name": "Renamed"}]
+        )
+        self.assertEqual(changes["taskInstances"], [])
+        self.assertEqual(len(changes["deleted"]), 1)
+        self.assertEqual(changes["deleted"][0]["model"], "Task")
+        self.assertEqual(changes["deleted"][0]["id"], str(self.tasks[2].id))
+
+    def test_team_changes_invalid_cursor(self):
+        query = f"""query {{
+            teamChanges(teamId: {self.team.id}, since: "not a cursor") {{ cursor }}
+        }}"""
+        response = self.client.execute(query)
+        self.assertEqual(response.errors[0].message, "Invalid cursor not a cursor")
+
+    def test_team_changes_not_a_member(self):
+        team = Team(name="SomeOtherTeam")
+        team.save()
+        query = f"""query {{ teamChanges(teamId: {team.id}) {{ cursor }} }}"""
+        response = self.client.execute(query)
+        self.assertTrue(response.errors)
+
+    def test_sync_push(self):
+        task_instance = TaskInstance.objects.get(task=self.tasks[0])
+        other_task = factories.TaskFactory()
+        now = timezone.now()
+        offline_at = now - datetime.timedelta(hours=1)
+        TaskInstance.objects.filter(id=task_instance.id).update(
+            active_from=now - datetime.timedelta(hours=2)
+        )
+        query = """mutation SyncPush($operations: [SyncOperationInput!]!) {
+            syncPush(operations: $operations) {
+                results { clientId status objectId message }
+            }
+        }"""
+        operations = [
+            {
+                "clientId": "complete",
+                "kind": "SUBMIT_TASK_INSTANCE_COMPLETION",
+                "clientTimestamp": offline_at.isoformat(),
+                "taskInstanceId": task_instance.id,
+            },
+            {
+                "clientId": "complete-again",
+                "kind": "SUBMIT_TASK_INSTANCE_COMPLETION",
+                "clientTimestamp": offline_at.isoformat(),
+                "taskInstanceId": task_instance.id,
+            },
+            {
+                "clientId": "revert",
+                "kind": "REVERT_TASK_INSTANCE_COMPLETION",
+                "clientTimestamp": offline_at.isoformat(),
+                "completionClientId": "complete",
+            },
+            {
+                "clientId": "update",
+                "kind": "UPDATE_TASK",
+                "clientTimestamp": (now + datetime.timedelta(seconds=1)).isoformat(),
+                "taskId": self.tasks[1].id,
+                "task": {"name": "Renamed", "basePointsPrize": 20},
+            },
+            {
+                "clientId": "stale-update",
+                "kind": "UPDATE_TASK",
+                "clientTimestamp": offline_at.isoformat(),
+                "taskId": self.tasks[2].id,
+                "task": {"name": "Stale"},
+            },
+            {
+                "clientId": "other-team",
+                "kind": "UPDATE_TASK",
+                "clientTimestamp": now.isoformat(),
+                "taskId": other_task.id,
+                "task": {"name": "Not mine"},
+            },
+        ]
+        response = self.client.execute(query, {"operations": operations})
+        self.assertFalse(response.errors)
+        results = {
+            result["clientId"]: result
+            for result in response.data["syncPush"]["results"]
+        }
+        self.assertEqual(
+            [result["clientId"] for result in response.data["syncPush"]["results"]],
+            [operation["clientId"] for operation in operations],
+        )
+
+        self.assertEqual(results["complete"]["status"], "APPLIED")
+        completion = TaskInstanceCompletion.objects.get(
+            id=results["complete"]["objectId"]
+        )
+        self.assertEqual(completion.created_at, offline_at)
+        self.assertEqual(completion.user_who_completed_task, self.user)
+
+        self.assertEqual(results["complete-again"]["status"], "NO_OP")
+        self.assertEqual(
+            results["complete-again"]["objectId"], results["complete"]["objectId"]
+        )
+
+        self.assertEqual(results["revert"]["status"], "APPLIED")
+        completion.refresh_from_db()
+        task_instance.refresh_from_db()
+        self.assertIsNotNone(completion.deleted_at)
+        self.assertFalse(task_instance.completed)
+
+        self.assertEqual(results["update"]["status"], "APPLIED")
+        self.tasks[1].refresh_from_db()
+        self.assertEqual(self.tasks[1].name, "Renamed")
+        self.assertEqual(self.tasks[1].base_points_prize, 20)
+
+        self.assertEqual(results["stale-update"]["status"], "NO_OP")
+        self.tasks[2].refresh_from_db()
+        self.assertEqual(self.tasks[2].name, "3")
+
+        self.assertEqual(results["other-team"]["status"], "FAILED")
+        other_task.refresh_from_db()
+        self.assertNotEqual(other_task.name, "Not mine")
+
+    def test_sync_push_completions(self):
+        task_instance = TaskInstance.objects.get(task=self.tasks[0])
+        other_task_instance = TaskInstance.objects.get(task=factories.TaskFactory())
+        factories.TaskInstanceCompletionFactory(task_instance=other_task_instance)
+        before_active = task_instance.active_from - datetime.timedelta(days=1)
+        query = """mutation SyncPush($operations: [SyncOperationInput!]!) {
+            syncPush(operations: $operations) {
+                results { clientId status objectId }
+            }
+        }"""
+        operations = [
+            {
+                "clientId": "before-active",
+                "kind": "SUBMIT_TASK_INSTANCE_COMPLETION",
+                "clientTimestamp": before_active.isoformat(),
+                "taskInstanceId": task_instance.id,
+            },
+            {
+                "clientId": "other-team",
+                "kind": "SUBMIT_TASK_INSTANCE_COMPLETION",
+                "clientTimestamp": timezone.now().isoformat(),
+                "taskInstanceId": other_task_instance.id,
+            },
+        ]
+        response = self.client.execute(query, {"operations": operations})
+        self.assertFalse(response.errors)
+        before_active_result, other_team_result = response.data["syncPush"][
+            "results"
+        ]
+
+        self.assertEqual(before_active_result["status"], "APPLIED")
+        completion = TaskInstanceCompletion.objects.get(
+            id=before_active_result["objectId"]
+        )
+        self.assertEqual(completion.created_at, task_instance.active_from)
+
+        # Completions of other teams are not revealed
+        self.assertEqual(
+            other_team_result,
+            {"clientId": "other-team", "status": "FAILED", "objectId": None},
+        )
+
+    def test_sync_push_old_completion_of_recurring_task(self):
+        task = Task.objects.create(
+            name="Recurring",
+            team=self.team,
+            base_points_prize=10,
+            is_recurring=True,
+            refresh_interval=datetime.timedelta(days=1),
+        )
+        now = timezone.now()
+        task_instance = TaskInstance.objects.get(task=task)
+        TaskInstance.objects.filter(id=task_instance.id).update(
+            active_from=now - datetime.timedelta(days=10)
+        )
+        completed_at = now - datetime.timedelta(days=8, hours=1)
+        query = """mutation SyncPush($operations: [SyncOperationInput!]!) {
+            syncPush(operations: $operations) { results { status objectId } }
+        }"""
+        operations = [
+            {
+                "clientId": "complete",
+                "kind": "SUBMIT_TASK_INSTANCE_COMPLETION",
+                "clientTimestamp": completed_at.isoformat(),
+                "taskInstanceId": task_instance.id,
+            }
+        ]
+        response = self.client.execute(query, {"operations": operations})
+        self.assertFalse(response.errors)
+        [result] = response.data["syncPush"]["results"]
+        self.assertEqual(result["status"], "APPLIED")
+
+        # The prize of the instance 1 day 23 hours after it became active
+        completion = TaskInstanceCompletion.objects.get(id=result["objectId"])
+        self.assertEqual(completion.created_at, completed_at)
+        self.assertEqual(completion.points_granted, 10)
+        next_instance = TaskInstance.objects.get(task=task, completed=False)
+        self.assertEqual(
+            next_instance.active_from, completed_at + datetime.timedelta(days=1)
+        )
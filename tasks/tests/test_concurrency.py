@@ -0,0 +1,65 @@
+import json
+import unittest
+
+from django.db import connection
+from django.test import TransactionTestCase
+from graphene_django.utils.testing import GraphQLTestCase
+
+from common.management.commands import stresscompletions
+from tasks.models import TaskInstance, TaskInstanceCompletion
+
+
+class CompletionInvariantsTestCase(GraphQLTestCase):
+    GRAPHQL_URL = "/graphql/"
+
+    def setUp(self):
+        self.token, self.task_ids = stresscompletions.create_tasks(1)
+
+    def submit(self, task_instance_id):
+        response = self.query(
+            stresscompletions.SUBMIT_COMPLETION,
+            variables={"taskInstance": task_instance_id},
+            headers={"Authorization": f"JWT {self.token}"},
+        )
+        return json.loads(response.content)
+
+    def test_completing_twice_is_rolled_back(self):
+        task_instance = TaskInstance.objects.get(task=self.task_ids[0])
+        self.assertNotIn("errors", self.submit(task_instance.id))
+
+        result = self.submit(task_instance.id)
+
+        self.assertIn("already completed", result["errors"][0]["message"])
+        self.assertEqual(
+            TaskInstanceCompletion.objects.filter(task_instance=task_instance).count(),
+            1,
+        )
+        self.assertEqual(stresscompletions.find_violations(self.task_ids), [])
+
+    def test_find_violations(self):
+        task_instance = TaskInstance.objects.get(task=self.task_ids[0])
+        self.submit(task_instance.id)
+        TaskInstance.objects.filter(id=task_instance.id).update(completed=False)
+
+        self.assertEqual(
+            stresscompletions.find_violations(self.task_ids),
+            [
+                f"Task {self.task_ids[0]} has 2 uncompleted instances",
+                f"TaskInstance {task_instance.id} is completed=False "
+                "with 1 completions",
+            ],
+        )
+
+
+@unittest.skipUnless(connection.vendor == "postgresql", "Requires PostgreSQL")
+class CompletionRacesTestCase(TransactionTestCase):
+    def test_completions_and_reverts_from_threads(self):
+        token, task_ids = stresscompletions.create_tasks(1)
+
+        counts, elapsed = stresscompletions.run(
+            token, task_ids, threads=8, operations=25, revert_ratio=0.3
+        )
+
+        self.assertGreater(counts["completions"], 0)
+        self.assertGreater(counts["reverts"], 0)
+        self.assertEqual(stresscompletions.find_violations(task_ids), [])
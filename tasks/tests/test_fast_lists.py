@@ -0,0 +1,140 @@
+import datetime
+
+from django.conf import settings
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from graphene_django.utils.testing import GraphQLTestCase
+from graphql_jwt.shortcuts import get_token
+
+from common.tests import factories
+from tasks.models import Task, TaskInstance, TaskInstanceCompletion
+
+TASKS = """query Tasks($teamId: Int!, $onlyActive: Boolean) {
+    tasks(teamId: $teamId, onlyActive: $onlyActive) {
+        id name description basePointsPrize refreshInterval isRecurring active
+    }
+}"""
+
+TASK_INSTANCES = """query TaskInstances($teamId: Int!, $onlyActive: Boolean) {
+    taskInstances(teamId: $teamId, onlyActive: $onlyActive) {
+        id activeFrom completed active deletedAt currentPrize
+        task { id name isRecurring }
+    }
+}"""
+
+COMPLETIONS = """query Completions($teamId: Int!, $onlyActive: Boolean) {
+    completions(teamId: $teamId, onlyActive: $onlyActive) {
+        ...completion
+        taskInstance { id task { id name } }
+    }
+}
+fragment completion on TaskInstanceCompletionType {
+    __typename id createdAt pointsGranted active deletedAt
+    userWhoCompletedTask { id username }
+    taskInstance { activeFrom currentPrize }
+}"""
+
+
+@override_settings(
+    GRAPHQL_RESPONSE_CACHE={**settings.GRAPHQL_RESPONSE_CACHE, "ACTIVE": False}
+)
+class FastListsTestCase(GraphQLTestCase):
+    GRAPHQL_URL = "/graphql/"
+
+    def setUp(self):
+        self.user = factories.UserFactory()
+        self.team = factories.TeamFactory(members=[self.user])
+        recurring = factories.TaskFactory(
+            team=self.team,
+            is_recurring=True,
+            refresh_interval=datetime.timedelta(days=1),
+        )
+        for days_ago in (30, 10, 3):
+            task_instance = TaskInstance.objects.filter(
+                task=recurring, completed=False
+            ).latest("id")
+            TaskInstance.objects.filter(id=task_instance.id).update(
+                active_from=timezone.now() - datetime.timedelta(days=days_ago)
+            )
+            factories.TaskInstanceCompletionFactory(
+                task_instance=task_instance, user_who_completed_task=self.user
+            )
+        TaskInstanceCompletion.objects.filter(task_instance__task=recurring).latest(
+            "id"
+        ).delete()
+        factories.TaskFactory.create_batch(2, team=self.team)
+        deleted = factories.TaskFactory(team=self.team)
+        deleted.delete()
+        future = factories.TaskFactory(team=self.team)
+        TaskInstance.objects.filter(task=future).update(
+            active_from=timezone.now() + datetime.timedelta(days=1)
+        )
+
+    def execute(self, query, fast, **variables):
+        with override_settings(GRAPHQL_FAST_LISTS={"ACTIVE": fast}):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.query(
+                    query,
+                    variables={"teamId": self.team.id, **variables},
+                    headers={"Authorization": f"JWT {get_token(self.user)}"},
+                )
+        self.assertResponseNoErrors(response)
+        return response.json()["data"], len(queries)
+
+    def assertSameAsModels(self, query, **variables):
+        data, queries = self.execute(query, False, **variables)
+        fast_data, fast_queries = self.execute(query, True, **variables)
+        self.assertTrue(next(iter(data.values())))
+        self.assertEqual(fast_data, data)
+        return queries, fast_queries
+
+    def test_tasks(self):
+        for only_active in (False, True):
+            queries, fast_queries = self.assertSameAsModels(
+                TASKS, onlyActive=only_active
+            )
+            self.assertLess(fast_queries, queries)
+
+    def test_task_instances(self):
+        for only_active in (False, True):
+            queries, fast_queries = self.assertSameAsModels(
+                TASK_INSTANCES, onlyActive=only_active
+            )
+            self.assertLess(fast_queries, queries)
+
+    def test_completions(self):
+        for only_active in (False, True):
+            queries, fast_queries = self.assertSameAsModels(
+                COMPLETIONS, onlyActive=only_active
+            )
+            self.assertLess(fast_queries, queries)
+
+    def test_unsupported_fields_fall_back_to_models(self):
+        for query in (
+            "query Tasks($teamId: Int!) { tasks(teamId: $teamId) { id team { id } } }",
+            """query Completions($teamId: Int!, $withUser: Boolean!) {
+                completions(teamId: $teamId) {
+                    id userWhoCompletedTask @include(if: $withUser) { id }
+                }
+            }""",
+        ):
+            with self.subTest(query=query):
+                variables = {"withUser": True} if "withUser" in query else {}
+                queries, fast_queries = self.assertSameAsModels(query, **variables)
+                self.assertEqual(fast_queries, queries)
+
+    def test_active_filters(self):
+        self.assertEqual(
+            set(Task.objects.filter(Task.active_filter())),
+            {task for task in Task.objects.all() if task.active},
+        )
+        self.assertEqual(
+            set(TaskInstance.objects.filter(TaskInstance.active_filter())),
+            {
+                task_instance
+                for task_instance in TaskInstance.objects.all()
+                if task_instance.active
+            },
+        )
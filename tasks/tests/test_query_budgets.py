@@ -0,0 +1,237 @@
+import datetime
+
+from django.utils import timezone
+
+from common.tests import factories
+from common.tests.query_budget import QueryBudgetTestCase, query_budget
+from tasks.models import TaskInstance
+
+
+class TaskQueryBudgetTestCase(QueryBudgetTestCase):
+    def setUp(self):
+        super().setUp()
+        self.task = factories.TaskFactory(
+            team=self.team,
+            is_recurring=True,
+            refresh_interval=datetime.timedelta(days=1),
+        )
+
+    def create_instances(self, rows):
+        """Completed instances of the task, as by completing it repeatedly."""
+        return [
+            factories.TaskInstanceCompletionFactory(
+                task_instance=TaskInstance.objects.filter(
+                    task=self.task, completed=False
+                ).latest("id"),
+                user_who_completed_task=self.user,
+            ).task_instance
+            for _ in range(rows)
+        ]
+
+    # N+1: instances of every task for active, filtered in Python
+    @query_budget("Query.tasks", queries=16, per_row=4)
+    def test_tasks(self, rows):
+        factories.TaskFactory.create_batch(rows, team=self.team)
+        return (
+            """query Tasks($teamId: Int!) {
+                tasks(teamId: $teamId, onlyActive: true) {
+                    id name refreshInterval isRecurring active
+                }
+            }""",
+            {"teamId": self.team.id},
+        )
+
+    # N+1: the task of every instance
+    @query_budget("Query.taskInstances", queries=7, per_row=1)
+    def test_task_instances(self, rows):
+        factories.TaskFactory.create_batch(rows, team=self.team)
+        return (
+            """query TaskInstances($teamId: Int!) {
+                taskInstances(teamId: $teamId, onlyActive: true) {
+                    id activeFrom active currentPrize task { id name }
+                }
+            }""",
+            {"teamId": self.team.id},
+        )
+
+    # N+1: the task of every instance for currentPrize
+    @query_budget("Query.relatedTaskInstances", queries=5, per_row=1)
+    def test_related_task_instances(self, rows):
+        self.create_instances(rows)
+        return (
+            """query RelatedTaskInstances($taskId: Int!) {
+                relatedTaskInstances(taskId: $taskId) {
+                    id activeFrom completed currentPrize
+                }
+            }""",
+            {"taskId": self.task.id},
+        )
+
+    # N+1: user, instance and task of every completion
+    @query_budget("Query.completions", queries=8, per_row=3)
+    def test_completions(self, rows):
+        self.create_instances(rows)
+        return (
+            """query Completions($teamId: Int!) {
+                completions(teamId: $teamId) {
+                    id createdAt pointsGranted
+                    userWhoCompletedTask { id username }
+                    taskInstance { id task { id name } }
+                }
+            }""",
+            {"teamId": self.team.id},
+        )
+
+    @query_budget("Query.userPoints", queries=6)
+    def test_user_points(self, rows):
+        self.create_instances(rows)
+        return (
+            """query UserPoints($userId: Int!, $teamId: Int!) {
+                userPoints(userId: $userId, teamId: $teamId)
+            }""",
+            {"userId": self.user.id, "teamId": self.team.id},
+        )
+
+    # N+1: points of every member
+    @query_budget("Query.teamMembersPoints", queries=9, per_row=1)
+    def test_team_members_points(self, rows):
+        members = factories.UserFactory.create_batch(rows)
+        self.team.members.add(*members)
+        self.create_instances(2)
+        return (
+            """query TeamMembersPoints($teamId: Int!) {
+                teamMembersPoints(teamId: $teamId) { member { id username } points }
+            }""",
+            {"teamId": self.team.id},
+        )
+
+    @query_budget("Query.dashboard", queries=6)
+    def test_dashboard(self, rows):
+        self.create_instances(2)
+        for team in factories.TeamFactory.create_batch(rows):
+            team.members.add(self.user, factories.UserFactory())
+            factories.TaskInstanceCompletionFactory(
+                task_instance__task__team=team, user_who_completed_task=self.user
+            )
+            factories.TaskFactory(team=team)
+        return (
+            """query Dashboard {
+                dashboard {
+                    team { id name }
+                    activeTaskInstances { id activeFrom currentPrize task { id name } }
+                    recentCompletions {
+                        id createdAt pointsGranted
+                        userWhoCompletedTask { id username }
+                        taskInstance { id task { id name } }
+                    }
+                    membersPoints { member { id username } points }
+                }
+            }""",
+            None,
+        )
+
+    @query_budget("Query.teamChanges", queries=6)
+    def test_team_changes(self, rows):
+        self.create_instances(rows)
+        return (
+            """query TeamChanges($teamId: Int!) {
+                teamChanges(teamId: $teamId) {
+                    tasks { id name }
+                    taskInstances { id completed }
+                    completions { id pointsGranted }
+                    deleted { model id }
+                    cursor
+                }
+            }""",
+            {"teamId": self.team.id},
+        )
+
+    @query_budget("Mutation.createTask", queries=7)
+    def test_create_task(self, rows):
+        factories.TaskFactory.create_batch(rows, team=self.team)
+        return (
+            """mutation CreateTask($team: ID!) {
+                createTask(input: {name: "Dishes", team: $team, basePointsPrize: 5}) {
+                    errors { field messages }
+                    task { id name team { id name } }
+                }
+            }""",
+            {"team": self.team.id},
+        )
+
+    @query_budget("Mutation.updateTask", queries=6)
+    def test_update_task(self, rows):
+        self.create_instances(rows)
+        return (
+            """mutation UpdateTask($id: ID!) {
+                updateTask(input: {id: $id, name: "Dishes"}) {
+                    errors { field messages }
+                    task { id name active }
+                }
+            }""",
+            {"id": self.task.id},
+        )
+
+    @query_budget("Mutation.deleteTask", queries=13)
+    def test_delete_task(self, rows):
+        self.create_instances(rows)
+        return (
+            """mutation DeleteTask($id: ID!) {
+                deleteTask(id: $id) { ok errors { field messages } }
+            }""",
+            {"id": self.task.id},
+        )
+
+    @query_budget("Mutation.submitTaskInstanceCompletion", queries=16)
+    def test_submit_task_instance_completion(self, rows):
+        self.create_instances(rows)
+        task_instance = TaskInstance.objects.get(task=self.task, completed=False)
+        return (
+            """mutation SubmitTaskInstanceCompletion($taskInstance: ID!) {
+                submitTaskInstanceCompletion(input: {taskInstance: $taskInstance}) {
+                    errors { field messages }
+                    taskInstanceCompletion {
+                        id pointsGranted taskInstance { id completed }
+                    }
+                }
+            }""",
+            {"taskInstance": task_instance.id},
+        )
+
+    @query_budget("Mutation.revertTaskInstanceCompletion", queries=27)
+    def test_revert_task_instance_completion(self, rows):
+        completion = self.create_instances(rows)[-1].taskinstancecompletion_set.get()
+        return (
+            """mutation RevertTaskInstanceCompletion($id: ID!) {
+                revertTaskInstanceCompletion(id: $id) {
+                    errors { field messages }
+                    taskInstanceCompletion { id taskInstance { id completed } }
+                }
+            }""",
+            {"id": completion.id},
+        )
+
+    # Every operation is applied separately
+    @query_budget("Mutation.syncPush", queries=15, per_row=6)
+    def test_sync_push(self, rows):
+        tasks = factories.TaskFactory.create_batch(rows, team=self.team)
+        now = timezone.now().isoformat()
+        return (
+            """mutation SyncPush($operations: [SyncOperationInput!]!) {
+                syncPush(operations: $operations) {
+                    results { clientId status objectId message }
+                }
+            }""",
+            {
+                "operations": [
+                    {
+                        "clientId": str(task.id),
+                        "kind": "UPDATE_TASK",
+                        "clientTimestamp": now,
+                        "taskId": task.id,
+                        "task": {"name": "Renamed"},
+                    }
+                    for task in tasks
+                ]
+            },
+        )
@@ -8,6 +8,7 @@ from django.utils import timezone
 
 from common.tests import factories
 
+from tasks import events
 from tasks.models import TaskInstance, TaskInstanceCompletion
 
 
@@ -72,6 +73,65 @@ class TaskUnitPrizeBiggerIntervalTestCase(TestCase):
             )
 
 
+class TaskInstanceNextChangeTestCase(TestCase):
+    def setUp(self):
+        self.team = factories.TeamFactory()
+        self.task = factories.TaskFactoryNoSignals(
+            team=self.team,
+            is_recurring=True,
+            refresh_interval=datetime.timedelta(days=1),
+        )
+        self.task_instance = factories.TaskInstanceFactory(
+            task=self.task,
+            active_from=datetime.datetime(2018, 4, 2, 0, 0, 0, tzinfo=pytz.utc),
+        )
+
+    @parameterized.expand(
+        [
+            (
+                datetime.datetime(2018, 4, 1, 12, 0, 0, tzinfo=pytz.utc),
+                datetime.datetime(2018, 4, 2, 0, 0, 0, tzinfo=pytz.utc),
+            ),
+            (
+                datetime.datetime(2018, 4, 2, 1, 0, 0, tzinfo=pytz.utc),
+                datetime.datetime(2018, 4, 4, 0, 0, 0, tzinfo=pytz.utc),
+            ),
+            (
+                datetime.datetime(2018, 4, 5, 23, 0, 0, tzinfo=pytz.utc),
+                datetime.datetime(2018, 4, 6, 0, 0, 0, tzinfo=pytz.utc),
+            ),
+        ]
+    )
+    def test_next_prize_step(self, now, next_change):
+        with mock.patch("tasks.models.now", mock.Mock(return_value=now)):
+            self.assertEqual(TaskInstance.next_change_at(self.team.id), next_change)
+            prize = self.task_instance.current_prize
+        with mock.patch(
+            "tasks.models.now",
+            mock.Mock(return_value=next_change - datetime.timedelta(seconds=1)),
+        ):
+            self.assertEqual(self.task_instance.current_prize, prize)
+        with mock.patch(
+            "tasks.models.now",
+            mock.Mock(return_value=next_change + datetime.timedelta(seconds=1)),
+        ):
+            self.assertNotEqual(self.task_instance.current_prize, prize)
+
+    def test_nearest_activation(self):
+        now = datetime.datetime(2018, 4, 2, 1, 0, 0, tzinfo=pytz.utc)
+        active_from = datetime.datetime(2018, 4, 2, 6, 0, 0, tzinfo=pytz.utc)
+        factories.TaskInstanceFactory(
+            task__team=self.team, active_from=active_from
+        )
+        with mock.patch("tasks.models.now", mock.Mock(return_value=now)):
+            self.assertEqual(TaskInstance.next_change_at(self.team.id), active_from)
+
+    def test_completed_instances_are_ignored(self):
+        self.task_instance.completed = True
+        self.task_instance.save()
+        self.assertIsNone(TaskInstance.next_change_at(self.team.id))
+
+
 class TaskInstanceCompletionUserPointsTestCase(TestCase):
     def setUp(self):
         self.user = factories.UserFactory()
@@ -243,13 +303,11 @@ class TaskInstanceCompletionSignalsTestCase(TestCase):
         task_instance = factories.TaskInstanceFactory(
             task=task, active_from=task.created_at
         )
-        with mock.patch(
-            "tasks.models.now",
-            mock.Mock(return_value=task.created_at + datetime.timedelta(days=2)),
-        ):
-            completion = factories.TaskInstanceCompletionFactory(
-                task_instance=task_instance, user_who_completed_task=self.member
-            )
+        completion = factories.TaskInstanceCompletionFactory(
+            task_instance=task_instance,
+            user_who_completed_task=self.member,
+            created_at=task.created_at + datetime.timedelta(days=2),
+        )
         task_instance.refresh_from_db()
         self.assertEqual(
             completion.points_granted, task_instance.task.base_points_prize
@@ -303,13 +361,11 @@ class TaskInstanceCompletionSignalsTestCase(TestCase):
         task_instance = factories.TaskInstanceFactory(
             task=task, active_from=task.created_at
         )
-        with mock.patch(
-            "tasks.models.now",
-            mock.Mock(return_value=task.created_at + datetime.timedelta(days=2)),
-        ):
-            completion = factories.TaskInstanceCompletionFactory(
-                task_instance=task_instance, user_who_completed_task=self.member
-            )
+        completion = factories.TaskInstanceCompletionFactory(
+            task_instance=task_instance,
+            user_who_completed_task=self.member,
+            created_at=task.created_at + datetime.timedelta(days=2),
+        )
 
         now = task.created_at + datetime.timedelta(days=8)
         new_task_instance = TaskInstance.objects.filter(
@@ -375,3 +431,69 @@ class TaskInstanceCompletionSignalsTestCase(TestCase):
                 task_instance=task_instance, user_who_completed_task=self.member
             )
         self.assertTrue("TaskInstance is already completed" in str(context.exception))
+
+
+class TeamEventsSignalsTestCase(TestCase):
+    def setUp(self) -> None:
+        self.member = factories.UserFactory()
+        self.team = factories.TeamFactory(members=[self.member])
+
+    def published_kinds(self, publish: mock.Mock):
+        return [
+            events.TeamEvent.from_message(message).kind
+            for channel, message in (c.args for c in publish.call_args_list)
+            if channel == events.get_channel(self.team.id)
+        ]
+
+    @mock.patch("common.pubsub.publish")
+    def test_task_events(self, publish):
+        with self.captureOnCommitCallbacks(execute=True):
+            task = factories.TaskFactory(team=self.team)
+        with self.captureOnCommitCallbacks(execute=True):
+            task.name = "Renamed"
+            task.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            task.delete()
+
+        self.assertEqual(
+            self.published_kinds(publish),
+            [
+                events.TeamEventKind.TASK_CREATED,
+                events.TeamEventKind.TASK_UPDATED,
+                events.TeamEventKind.TASK_DELETED,
+            ],
+        )
+
+    @mock.patch("common.pubsub.publish")
+    def test_completion_events(self, publish):
+        task_instance = factories.TaskInstanceFactory(task__team=self.team)
+        with self.captureOnCommitCallbacks(execute=True):
+            completion = factories.TaskInstanceCompletionFactory(
+                task_instance=task_instance, user_who_completed_task=self.member
+            )
+        with self.captureOnCommitCallbacks(execute=True):
+            completion.delete()
+
+        self.assertEqual(
+            self.published_kinds(publish),
+            [
+                events.TeamEventKind.COMPLETION_SUBMITTED,
+                events.TeamEventKind.COMPLETION_REVERTED,
+            ],
+        )
+        event = events.TeamEvent.from_message(publish.call_args.args[1])
+        self.assertEqual(event.completion_id, completion.id)
+        self.assertEqual(event.user_id, self.member.id)
+
+    @mock.patch("common.pubsub.publish")
+    def test_no_events_on_rollback(self, publish):
+        with self.captureOnCommitCallbacks(execute=False):
+            factories.TaskFactory(team=self.team)
+        publish.assert_not_called()
+
+    @mock.patch("common.pubsub.publish", side_effect=ConnectionError)
+    def test_publish_failure_does_not_fail_the_request(self, publish):
+        with self.assertLogs("django", "ERROR"):
+            with self.captureOnCommitCallbacks(execute=True):
+                factories.TaskFactory(team=self.team)
+        publish.assert_called()
@@ -0,0 +1,64 @@
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+from teams import membership_index
+from teams.models import Team
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare latency of Team.check_membership served by the database "
+        "and by the memory-mapped membership index"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lookups", type=int, default=10000)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        memberships = list(
+            Team.members.through.objects.values_list("user_id", "team_id")
+        )
+        if not memberships:
+            raise CommandError("There are no team memberships to look up")
+        rng = random.Random(options["seed"])
+        lookups = [rng.choice(memberships) for _ in range(options["lookups"])]
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "memberships.idx")
+            with override_settings(
+                MEMBERSHIP_INDEX={**settings.MEMBERSHIP_INDEX, "PATH": None}
+            ):
+                self.report("database", self.measure(lookups))
+            with override_settings(
+                MEMBERSHIP_INDEX={**settings.MEMBERSHIP_INDEX, "PATH": path}
+            ):
+                membership_index.build(path)
+                self.report("index", self.measure(lookups))
+                self.stdout.write(
+                    f"index size: {os.path.getsize(path)} bytes, "
+                    f"{len(memberships)} memberships"
+                )
+
+    @staticmethod
+    def measure(lookups):
+        latencies = []
+        for user_id, team_id in lookups:
+            start = time.perf_counter_ns()
+            Team.check_membership(user_id, team_id)
+            latencies.append((time.perf_counter_ns() - start) / 1000)
+        return latencies
+
+    def report(self, name, latencies):
+        percentiles = statistics.quantiles(latencies, n=100)
+        self.stdout.write(
+            f"{name}: mean {statistics.mean(latencies):.1f} us, "
+            f"p50 {percentiles[49]:.1f} us, p99 {percentiles[98]:.1f} us"
+        )
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from teams import membership_index
+
+
+class Command(BaseCommand):
+    help = "Delete membership log entries older than the retention in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of entries deleted in one query",
+        )
+
+    def handle(self, *args, **options):
+        deleted = membership_index.purge_log(options["batch_size"])
+        self.stdout.write(f"Deleted {deleted} membership log entries")
@@ -0,0 +1,334 @@
+"""
+Memory-mapped index of team memberships shared by workers on a node.
+
+Membership checks run on almost every request. When
+``MEMBERSHIP_INDEX["PATH"]`` is set, the (user id -> team ids) mapping is
+kept in a file that every worker maps read-only, so the memberships are not
+loaded from the database on lookups (only the log is checked, see below) and
+the memory is shared between workers. The file consists of a header and three
+arrays of unsigned ints:
+
+    users    sorted ids of users that are members of any team
+    offsets  len(users) + 1 positions in teams, teams of users[i] are
+             teams[offsets[i]:offsets[i + 1]]
+    teams    sorted team ids of every user
+
+Membership edits are appended to the MembershipChange log in their
+transaction. After the commit the file is rewritten (and atomically replaced)
+with memberships of the changed users reloaded from the database, including
+users of log entries newer than the last one applied to the file. Readers
+notice the replaced file on the next lookup.
+
+Other nodes learn about edits only from the log, so before answering, a
+lookup checks the log for entries newer than the snapshot. Users with such
+entries are answered from the database (None) until the file catches up,
+which is updated once the current transaction commits.
+
+The log is purged (purgemembershipchanges) of entries older than
+``MEMBERSHIP_INDEX["LOG_RETENTION"]``. Files older than
+``MEMBERSHIP_INDEX["MAX_AGE"]`` are rebuilt from the database instead of
+being updated from the log, so no node relies on purged entries.
+
+The index only confirms memberships, callers fall back to the database when
+the user is not a member according to the index.
+"""
+
+import bisect
+import contextlib
+import datetime
+import fcntl
+import functools
+import mmap
+import os
+import struct
+import threading
+import time
+import typing
+from array import array
+
+from django.apps import apps
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+HEADER = struct.Struct("=4sIQII")  # magic, format version, last change, users, teams
+MAGIC = b"HKMI"
+FORMAT_VERSION = 1
+ITEM_SIZE = 4
+
+Memberships = typing.Dict[int, typing.List[int]]
+
+
+class Snapshot(typing.NamedTuple):
+    last_change_id: int
+    users: memoryview
+    offsets: memoryview
+    teams: memoryview
+
+    def get_team_ids(self, user_id: int) -> typing.Tuple[int, ...]:
+        i = bisect.bisect_left(self.users, user_id)
+        if i == len(self.users) or self.users[i] != user_id:
+            return ()
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return tuple(self.teams[start:end])
+
+    def to_dict(self) -> Memberships:
+        return {user_id: list(self.get_team_ids(user_id)) for user_id in self.users}
+
+
+def encode(memberships: Memberships, last_change_id: int) -> bytes:
+    users = array("I", sorted(user for user, teams in memberships.items() if teams))
+    offsets = array("I", [0])
+    teams = array("I")
+    for user_id in users:
+        teams.extend(sorted(memberships[user_id]))
+        offsets.append(len(teams))
+    assert users.itemsize == ITEM_SIZE
+    return (
+        HEADER.pack(MAGIC, FORMAT_VERSION, last_change_id, len(users), len(teams))
+        + users.tobytes()
+        + offsets.tobytes()
+        + teams.tobytes()
+    )
+
+
+def decode(buffer) -> Snapshot:
+    magic, version, last_change_id, users_count, teams_count = HEADER.unpack_from(
+        buffer
+    )
+    if magic != MAGIC or version != FORMAT_VERSION:
+        raise ValueError("Not a membership index")
+    view = memoryview(buffer)
+    sections = []
+    start = HEADER.size
+    for count in (users_count, users_count + 1, teams_count):
+        end = start + count * ITEM_SIZE
+        sections.append(view[start:end].cast("I"))
+        start = end
+    return Snapshot(last_change_id, *sections)
+
+
+class MembershipIndex:
+    """Read-only view of the index file, remapped when the file is replaced."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file_id: typing.Optional[tuple] = None
+        self._snapshot: typing.Optional[Snapshot] = None
+        self._lock = threading.Lock()
+
+    def get_snapshot(self) -> typing.Optional[Snapshot]:
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        file_id = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if file_id != self._file_id:
+            with self._lock:
+                if file_id != self._file_id:
+                    self._snapshot = self.load()
+                    self._file_id = file_id
+        return self._snapshot
+
+    def is_expired(self) -> bool:
+        """Tells whether the file of the current snapshot is older than MAX_AGE."""
+        if self._file_id is None:
+            return True
+        age = time.time() - self._file_id[1] / 1e9
+        return age > settings.MEMBERSHIP_INDEX["MAX_AGE"]
+
+    def load(self) -> typing.Optional[Snapshot]:
+        try:
+            with open(self.path, "rb") as f:
+                # Old snapshots keep their mapping alive until they are released
+                return decode(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+        except (FileNotFoundError, ValueError, struct.error):
+            return None
+
+    def get_teams_of_users(
+        self, user_ids: typing.Iterable[int]
+    ) -> typing.Dict[int, typing.Optional[typing.Tuple[int, ...]]]:
+        """
+        Returns team ids of every user, None for users whose memberships
+        changed after the snapshot (or for all users without a snapshot).
+        """
+        user_ids = set(user_ids)
+        snapshot = self.get_snapshot()
+        if snapshot is None:
+            return dict.fromkeys(user_ids)
+        MembershipChange = apps.get_model("teams", "MembershipChange")
+        changed_users = set(
+            MembershipChange.objects.filter(
+                id__gt=snapshot.last_change_id, user_id__in=user_ids
+            ).values_list("user_id", flat=True)
+        )
+        if changed_users:
+            # Written by another node, or not committed yet
+            transaction.on_commit(functools.partial(update, self.path))
+        return {
+            user_id: (
+                None if user_id in changed_users else snapshot.get_team_ids(user_id)
+            )
+            for user_id in user_ids
+        }
+
+    def get_team_ids(self, user_id: int) -> typing.Optional[typing.Tuple[int, ...]]:
+        return self.get_teams_of_users([user_id])[user_id]
+
+
+def get_path() -> typing.Optional[str]:
+    return getattr(settings, "MEMBERSHIP_INDEX", {}).get("PATH")
+
+
+@functools.lru_cache(maxsize=None)
+def _get_index(path: str) -> MembershipIndex:
+    return MembershipIndex(path)
+
+
+def get_index() -> typing.Optional[MembershipIndex]:
+    path = get_path()
+    if not path:
+        return None
+    index = _get_index(path)
+    if index.get_snapshot() is None or index.is_expired():
+        with _write_lock(path):
+            # Another worker may have rebuilt it meanwhile
+            if index.get_snapshot() is None or index.is_expired():
+                _build(path)
+    return index
+
+
+def get_team_ids(user_id: int) -> typing.Optional[typing.Tuple[int, ...]]:
+    """
+    Returns ids of teams of the user, None when the index is disabled
+    or does not include the latest changes of the user's memberships.
+    """
+    index = get_index()
+    return None if index is None else index.get_team_ids(user_id)
+
+
+def get_teams_of_users(
+    user_ids: typing.Iterable[int],
+) -> typing.Dict[int, typing.Optional[typing.Tuple[int, ...]]]:
+    """Like get_team_ids, for several users with one query."""
+    index = get_index()
+    if index is None:
+        return dict.fromkeys(user_ids)
+    return index.get_teams_of_users(user_ids)
+
+
+@contextlib.contextmanager
+def _write_lock(path: str):
+    with open(f"{path}.lock", "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _write(path: str, memberships: Memberships, last_change_id: int) -> None:
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(encode(memberships, last_change_id))
+    os.replace(tmp_path, path)
+
+
+def _load_memberships(user_ids: typing.Optional[typing.Iterable[int]] = None):
+    Team = apps.get_model("teams", "Team")
+    memberships = Team.members.through.objects.values_list("user_id", "team_id")
+    if user_ids is not None:
+        memberships = memberships.filter(user_id__in=user_ids)
+    return memberships
+
+
+def build(path: str) -> None:
+    """Builds the whole index from the database."""
+    with _write_lock(path):
+        _build(path)
+
+
+def _build(path: str) -> None:
+    MembershipChange = apps.get_model("teams", "MembershipChange")
+    # Read before memberships, so no change is missed (reapplying is harmless)
+    last_change_id = MembershipChange.objects.aggregate(Max("id"))["id__max"] or 0
+    memberships: Memberships = {}
+    for user_id, team_id in _load_memberships():
+        memberships.setdefault(user_id, []).append(team_id)
+    _write(path, memberships, last_change_id)
+
+
+def update(path: str, user_ids: typing.Iterable[int] = ()) -> None:
+    """
+    Reloads memberships of the given users and of users in log entries
+    newer than the last one applied to the index.
+    """
+    MembershipChange = apps.get_model("teams", "MembershipChange")
+    with _write_lock(path):
+        index = _get_index(path)
+        snapshot = index.get_snapshot()
+        if snapshot is None or index.is_expired():
+            _build(path)
+            return
+        memberships = snapshot.to_dict()
+        last_change_id = snapshot.last_change_id
+        changes = list(
+            MembershipChange.objects.filter(id__gt=last_change_id).values_list(
+                "id", "user_id"
+            )
+        )
+        changed_users = set(user_ids) | {user_id for _, user_id in changes}
+        if not changed_users:
+            return
+
+        for user_id in changed_users:
+            memberships[user_id] = []
+        for user_id, team_id in _load_memberships(changed_users):
+            memberships[user_id].append(team_id)
+        _write(
+            path,
+            memberships,
+            max((change_id for change_id, _ in changes), default=last_change_id),
+        )
+
+
+def record_changes(
+    action: str, team_ids: typing.Iterable[int], user_ids: typing.Iterable[int]
+) -> None:
+    """
+    Appends the membership edits to the change log and updates the index
+    once the transaction commits. Does nothing when the index is disabled.
+    """
+    path = get_path()
+    if not path:
+        return
+    MembershipChange = apps.get_model("teams", "MembershipChange")
+    user_ids = set(user_ids)
+    MembershipChange.objects.bulk_create(
+        MembershipChange(action=action, team_id=team_id, user_id=user_id)
+        for team_id in team_ids
+        for user_id in user_ids
+    )
+    transaction.on_commit(functools.partial(update, path, user_ids))
+
+
+def purge_log(batch_size: int = 1000) -> int:
+    """
+    Deletes log entries older than LOG_RETENTION in batches, so the table
+    is not locked for long. Returns the number of deleted entries.
+    """
+    MembershipChange = apps.get_model("teams", "MembershipChange")
+    created_before = timezone.now() - datetime.timedelta(
+        seconds=settings.MEMBERSHIP_INDEX["LOG_RETENTION"]
+    )
+    deleted = 0
+    while True:
+        ids = list(
+            MembershipChange.objects.filter(
+                created_at__lt=created_before
+            ).values_list("id", flat=True)[:batch_size]
+        )
+        if not ids:
+            return deleted
+        deleted += MembershipChange.objects.filter(id__in=ids).delete()[0]
@@ -0,0 +1,37 @@
+# Generated by Django 5.1.15 on 2026-10-19 14:44
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("teams", "0008_auto_20210724_2330"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MembershipChange",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "action",
+                    models.CharField(
+                        choices=[("join", "Join"), ("leave", "Leave")], max_length=5
+                    ),
+                ),
+                ("team_id", models.IntegerField()),
+                ("user_id", models.IntegerField()),
+                ("created_at", models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
@@ -1,8 +1,10 @@
 from django.db import models
 from django.conf import settings
 from common.models import TrackingFieldsMixin
+from teams import membership_index
 from django.contrib.auth import hashers
 from django.core.validators import MinLengthValidator
+from django.utils import timezone
 
 
 class TeamManager(models.Manager):
@@ -44,12 +46,17 @@ class Team(TrackingFieldsMixin):
 
     @staticmethod
     def check_membership(user_id: int, team_id: int) -> None:
+        if team_id in (membership_index.get_team_ids(user_id) or ()):
+            return
         team = Team.objects.get(pk=team_id)
         if not team.members.filter(id=user_id).exists():
             raise ValueError(f"User {user_id} is not a member of team {team_id}")
 
     @staticmethod
     def check_users_in_the_same_team(user_id: int, other_user_id: int) -> None:
+        team_ids = membership_index.get_teams_of_users([user_id, other_user_id])
+        if set(team_ids[user_id] or ()) & set(team_ids[other_user_id] or ()):
+            return
         if (
             not Team.objects.filter(members__id=user_id)
             .filter(members__id=other_user_id)
@@ -58,3 +65,20 @@ class Team(TrackingFieldsMixin):
             raise ValueError(
                 f"User {user_id} is not in the same team as {other_user_id}"
             )
+
+
+class MembershipChange(models.Model):
+    """
+    Ordered log of membership edits, applied incrementally
+    to the shared membership index (see teams/membership_index.py).
+    """
+
+    JOIN = "join"
+    LEAVE = "leave"
+    ACTIONS = [(JOIN, "Join"), (LEAVE, "Leave")]
+
+    action = models.CharField(max_length=5, choices=ACTIONS)
+    # Not foreign keys, the log outlives deleted teams and users
+    team_id = models.IntegerField()
+    user_id = models.IntegerField()
+    created_at = models.DateTimeField(default=timezone.now)
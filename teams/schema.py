@@ -4,6 +4,7 @@ from graphene_django import DjangoObjectType
 from graphql_jwt.decorators import login_required
 from graphql import GraphQLError
 
+from teams import membership_index
 from teams.models import Team
 from teams.forms import TeamForm
 from users.schema import UserType
@@ -95,6 +96,9 @@ class Query(graphene.ObjectType):
 
     @login_required
     def resolve_my_teams(self, info):
+        team_ids = membership_index.get_team_ids(info.context.user.id)
+        if team_ids is not None:
+            return Team.objects.filter(id__in=team_ids)
         return Team.objects.filter(members=info.context.user)
 
     @login_required
@@ -0,0 +1,50 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from teams import membership_index, versions
+from teams.models import MembershipChange, Team
+
+
+@receiver(post_save, sender=Team)
+@receiver(post_delete, sender=Team)
+def bump_team_version(sender, instance: Team, **kwargs):
+    versions.bump_team_versions(instance.id)
+
+
+@receiver(m2m_changed, sender=Team.members.through)
+def bump_membership_versions(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Handles members being added to or removed from a team, from both
+    sides of the relation (team.members.add(user), user.team_set.add(team)).
+    """
+    if action not in ("post_add", "post_remove", "pre_clear"):
+        return
+
+    if action == "pre_clear":
+        pk_set = set(
+            (instance.team_set if reverse else instance.members).values_list(
+                "id", flat=True
+            )
+        )
+    if reverse:
+        versions.bump_membership_versions(instance.id)
+        versions.bump_team_versions(*pk_set)
+    else:
+        versions.bump_membership_versions(*pk_set)
+        versions.bump_team_versions(instance.id)
+
+    membership_index.record_changes(
+        MembershipChange.JOIN if action == "post_add" else MembershipChange.LEAVE,
+        pk_set if reverse else [instance.id],
+        [instance.id] if reverse else pk_set,
+    )
+
+
+@receiver(pre_delete, sender=Team)
+def record_membership_changes_on_delete(sender, instance: Team, **kwargs):
+    # Memberships of deleted teams are removed without m2m_changed
+    membership_index.record_changes(
+        MembershipChange.LEAVE,
+        [instance.id],
+        instance.members.values_list("id", flat=True),
+    )
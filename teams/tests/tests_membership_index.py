@@ -0,0 +1,187 @@
+import io
+import os
+import shutil
+import tempfile
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from graphql_jwt.shortcuts import get_token
+
+from common.tests import factories
+from teams import membership_index
+from teams.models import MembershipChange, Team
+
+
+class MembershipIndexEncodingTestCase(TestCase):
+    def test_encode_decode(self):
+        memberships = {5: [3, 1], 2: [7], 9: []}
+        snapshot = membership_index.decode(membership_index.encode(memberships, 42))
+        self.assertEqual(snapshot.last_change_id, 42)
+        self.assertEqual(snapshot.get_team_ids(5), (1, 3))
+        self.assertEqual(snapshot.get_team_ids(2), (7,))
+        self.assertEqual(snapshot.get_team_ids(9), ())
+        self.assertEqual(snapshot.get_team_ids(1), ())
+        self.assertEqual(snapshot.to_dict(), {2: [7], 5: [1, 3]})
+
+    def test_decode_invalid(self):
+        with self.assertRaises(ValueError):
+            membership_index.decode(b"x" * membership_index.HEADER.size)
+
+
+class MembershipIndexTestCase(TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, "memberships.idx")
+        index_settings = override_settings(
+            MEMBERSHIP_INDEX={**settings.MEMBERSHIP_INDEX, "PATH": self.path}
+        )
+        index_settings.enable()
+        self.addCleanup(index_settings.disable)
+
+        self.user = factories.UserFactory()
+        self.team = factories.TeamFactory(members=[self.user])
+
+    def test_index_is_built_on_first_lookup(self):
+        self.assertEqual(membership_index.get_team_ids(self.user.id), (self.team.id,))
+        # Only the check for newer log entries
+        with self.assertNumQueries(1):
+            Team.check_membership(self.user.id, self.team.id)
+
+    def test_join_and_leave(self):
+        membership_index.build(self.path)
+        other_team = factories.TeamFactory()
+        with self.captureOnCommitCallbacks(execute=True):
+            other_team.members.add(self.user)
+        self.assertEqual(
+            membership_index.get_team_ids(self.user.id),
+            tuple(sorted([self.team.id, other_team.id])),
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.team_set.remove(self.team)
+        self.assertEqual(membership_index.get_team_ids(self.user.id), (other_team.id,))
+        with self.assertRaises(ValueError):
+            Team.check_membership(self.user.id, self.team.id)
+
+    def test_changes_are_logged(self):
+        other_user = factories.UserFactory()
+        last_change_id = MembershipChange.objects.latest("id").id
+        with self.captureOnCommitCallbacks(execute=True):
+            self.team.members.add(other_user)
+            members = sorted(self.team.members.values_list("id", flat=True))
+            self.team.members.clear()
+        self.assertEqual(
+            list(
+                MembershipChange.objects.filter(id__gt=last_change_id)
+                .order_by("id", "user_id")
+                .values_list("action", "user_id")
+            ),
+            [(MembershipChange.JOIN, other_user.id)]
+            + [(MembershipChange.LEAVE, user_id) for user_id in members],
+        )
+
+    def test_missed_changes_are_applied_from_the_log(self):
+        membership_index.build(self.path)
+        other_team = factories.TeamFactory()
+        # The worker that made the change did not update the index
+        with self.captureOnCommitCallbacks(execute=False):
+            other_team.members.add(self.user)
+
+        membership_index.update(self.path)
+        self.assertIn(other_team.id, membership_index.get_team_ids(self.user.id))
+        snapshot = membership_index.MembershipIndex(self.path).get_snapshot()
+        self.assertEqual(
+            snapshot.last_change_id, MembershipChange.objects.latest("id").id
+        )
+
+    def test_other_workers_see_replaced_file(self):
+        other_worker = membership_index.MembershipIndex(self.path)
+        membership_index.build(self.path)
+        self.assertEqual(other_worker.get_team_ids(self.user.id), (self.team.id,))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.team.members.remove(self.user)
+        self.assertEqual(other_worker.get_team_ids(self.user.id), ())
+
+    def test_changes_written_by_other_nodes(self):
+        membership_index.build(self.path)
+        other_node = membership_index.MembershipIndex(self.path)
+        self.assertEqual(other_node.get_team_ids(self.user.id), (self.team.id,))
+
+        # Another node logged the leave, this node's file is not updated
+        with self.captureOnCommitCallbacks(execute=False):
+            self.team.members.remove(self.user)
+
+        self.assertIsNone(other_node.get_team_ids(self.user.id))
+        with self.assertRaises(ValueError):
+            Team.check_membership(self.user.id, self.team.id)
+        self.assertEqual(self.get_my_team_ids(), [])
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            other_node.get_team_ids(self.user.id)
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(other_node.get_team_ids(self.user.id), ())
+
+    def get_my_team_ids(self):
+        response = self.client.post(
+            "/graphql/",
+            {"query": "{ myTeams { id } }"},
+            content_type="application/json",
+            HTTP_AUTHORIZATION=f"JWT {get_token(self.user)}",
+        )
+        return [int(team["id"]) for team in response.json()["data"]["myTeams"]]
+
+    def test_deleted_team(self):
+        membership_index.build(self.path)
+        with self.captureOnCommitCallbacks(execute=True):
+            Team.objects.filter(id=self.team.id).delete()
+        self.assertEqual(membership_index.get_team_ids(self.user.id), ())
+
+    def test_users_in_the_same_team(self):
+        other_user = factories.UserFactory()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.team.members.add(other_user)
+        with self.assertNumQueries(1):
+            Team.check_users_in_the_same_team(self.user.id, other_user.id)
+
+    def test_expired_index_is_rebuilt(self):
+        membership_index.build(self.path)
+        other_team = factories.TeamFactory()
+        # Changed without a log entry, e.g. the entry was purged
+        other_team.members.through.objects.create(
+            team_id=other_team.id, user_id=self.user.id
+        )
+        self.assertEqual(membership_index.get_team_ids(self.user.id), (self.team.id,))
+
+        expired = time.time() - settings.MEMBERSHIP_INDEX["MAX_AGE"] - 1
+        os.utime(self.path, (expired, expired))
+        self.assertEqual(
+            membership_index.get_team_ids(self.user.id),
+            tuple(sorted([self.team.id, other_team.id])),
+        )
+
+    def test_purge_log(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.team.members.add(factories.UserFactory(), factories.UserFactory())
+        retention = settings.MEMBERSHIP_INDEX["LOG_RETENTION"]
+        MembershipChange.objects.exclude(
+            id=MembershipChange.objects.latest("id").id
+        ).update(created_at=timezone.now() - timedelta(seconds=retention + 1))
+
+        out = io.StringIO()
+        call_command("purgemembershipchanges", "--batch-size", "2", stdout=out)
+        self.assertIn("Deleted 3", out.getvalue())
+        self.assertEqual(MembershipChange.objects.count(), 1)
+
+    def test_benchmark(self):
+        out = io.StringIO()
+        with override_settings(
+            MEMBERSHIP_INDEX={**settings.MEMBERSHIP_INDEX, "PATH": None}
+        ):
+            call_command("benchmarkmembershipindex", "--lookups", "10", stdout=out)
+        self.assertIn("database: mean", out.getvalue())
+        self.assertIn("index: mean", out.getvalue())
@@ -0,0 +1,63 @@
+from common.tests import factories
+from common.tests.query_budget import QueryBudgetTestCase, query_budget
+
+
+class TeamQueryBudgetTestCase(QueryBudgetTestCase):
+    # N+1: members of every team
+    @query_budget("Query.myTeams", queries=5, per_row=1)
+    def test_my_teams(self, rows):
+        factories.TeamFactory.create_batch(rows, members=[self.user])
+        return "query MyTeams { myTeams { id name members { id username } } }", None
+
+    @query_budget("Query.teams", queries=2)
+    def test_teams(self, rows):
+        factories.TeamFactory.create_batch(rows)
+        return "query Teams { teams { id name } }", None
+
+    # N+1: the profile of every member
+    @query_budget("Query.teamMembers", queries=8, per_row=1)
+    def test_team_members(self, rows):
+        self.team.members.add(*factories.UserFactory.create_batch(rows))
+        return (
+            """query TeamMembers($teamId: Int!) {
+                teamMembers(teamId: $teamId) { id username profile { imageId colorId } }
+            }""",
+            {"teamId": self.team.id},
+        )
+
+    @query_budget("Mutation.createTeam", queries=8)
+    def test_create_team(self, rows):
+        factories.TeamFactory.create_batch(rows, members=[self.user])
+        return (
+            """mutation CreateTeam {
+                createTeam(input: {name: "Flat", password: "secret"}) {
+                    errors { field messages }
+                    team { id name members { id username } }
+                }
+            }""",
+            None,
+        )
+
+    @query_budget("Mutation.joinTeam", queries=8)
+    def test_join_team(self, rows):
+        team = factories.TeamFactory(
+            members=factories.UserFactory.create_batch(rows), password="secret"
+        )
+        return (
+            """mutation JoinTeam($teamId: Int!) {
+                joinTeam(teamId: $teamId, password: "secret") {
+                    team { id name members { id username } }
+                }
+            }""",
+            {"teamId": team.id},
+        )
+
+    @query_budget("Mutation.leaveTeam", queries=5)
+    def test_leave_team(self, rows):
+        self.team.members.add(*factories.UserFactory.create_batch(rows))
+        return (
+            """mutation LeaveTeam($teamId: Int!) {
+                leaveTeam(teamId: $teamId) { team { id name } }
+            }""",
+            {"teamId": self.team.id},
+        )
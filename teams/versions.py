@@ -0,0 +1,90 @@
+"""
+Version counters used to invalidate cached responses.
+
+Every team has a data version that is bumped whenever anything visible
+to its members changes, and every user has a membership version that is
+bumped when the user joins or leaves a team. Counters are kept in Django's
+cache, they are initialized with the current time so that an evicted counter
+never goes back to a value that was already used. Bumps are broadcast to
+other workers, whose local caches have their own counters.
+"""
+import functools
+import time
+import typing
+
+from django.core.cache import cache
+from django.db import transaction
+
+from common import invalidation
+from teams.models import Team
+
+TEAM_VERSION_KEY = "team-version:{}"
+MEMBERSHIP_VERSION_KEY = "membership-version:{}"
+USER_TEAMS_KEY = "user-teams:{}:{}"
+
+INVALIDATION_KIND = "versions"
+
+
+def _get_version(key: str) -> int:
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns())
+        version = cache.get(key)
+    return version
+
+
+def _bump_version(key: str) -> None:
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, time.time_ns())
+
+
+def get_team_versions(team_ids: typing.Iterable[int]) -> typing.Dict[int, int]:
+    keys = {TEAM_VERSION_KEY.format(team_id): team_id for team_id in team_ids}
+    versions = cache.get_many(keys)
+    return {
+        team_id: versions.get(key) or _get_version(key)
+        for key, team_id in keys.items()
+    }
+
+
+def get_membership_version(user_id: int) -> int:
+    return _get_version(MEMBERSHIP_VERSION_KEY.format(user_id))
+
+
+def get_user_team_ids(user_id: int) -> typing.List[int]:
+    """Returns ids of teams the user is a member of, cached per membership version."""
+    key = USER_TEAMS_KEY.format(user_id, get_membership_version(user_id))
+    team_ids = cache.get(key)
+    if team_ids is None:
+        team_ids = sorted(
+            Team.objects.filter(members=user_id).values_list("id", flat=True)
+        )
+        cache.set(key, team_ids)
+    return team_ids
+
+
+def _bump_versions(keys: typing.Iterable[str]) -> None:
+    for key in keys:
+        _bump_version(key)
+
+
+invalidation.register(INVALIDATION_KIND, _bump_versions)
+
+
+def _bump_and_broadcast(keys: typing.Set[str]) -> None:
+    _bump_versions(keys)
+    invalidation.broadcast(INVALIDATION_KIND, sorted(keys))
+
+
+def bump_team_versions(*team_ids: typing.Optional[int]) -> None:
+    """Bumps data versions of the given teams once the transaction commits."""
+    keys = {TEAM_VERSION_KEY.format(id) for id in team_ids if id is not None}
+    transaction.on_commit(functools.partial(_bump_and_broadcast, keys))
+
+
+def bump_membership_versions(*user_ids: int) -> None:
+    """Bumps membership versions of the given users once the transaction commits."""
+    keys = {MEMBERSHIP_VERSION_KEY.format(id) for id in user_ids}
+    transaction.on_commit(functools.partial(_bump_and_broadcast, keys))
@@ -2,6 +2,8 @@ from django.db.models.signals import post_save
 from django.dispatch import receiver
 from django.contrib.auth import get_user_model
 
+from teams import versions
+from teams.models import Team
 from users.models import Profile
 
 
@@ -9,3 +11,14 @@ from users.models import Profile
 def create_task_instance(sender, instance: get_user_model(), created, **kwargs):
     if created:
         Profile.objects.create(user=instance)
+
+
+@receiver(post_save, sender=Profile)
+def bump_team_versions_on_profile_change(
+    sender, instance: Profile, created, **kwargs
+):
+    if created:
+        return  # new users are not members of any team yet
+    versions.bump_team_versions(
+        *Team.objects.filter(members=instance.user_id).values_list("id", flat=True)
+    )
@@ -0,0 +1,39 @@
+from common.tests import factories
+from common.tests.query_budget import QueryBudgetTestCase, query_budget
+
+
+class UserQueryBudgetTestCase(QueryBudgetTestCase):
+    @query_budget("Query.me", queries=2)
+    def test_me(self, rows):
+        factories.TeamFactory.create_batch(rows, members=[self.user])
+        return "query Me { me { id username profile { imageId colorId } } }", None
+
+    @query_budget("Mutation.register", queries=7)
+    def test_register(self, rows):
+        factories.UserFactory.create_batch(rows)
+        return (
+            """mutation Register {
+                register(input: {
+                    username: "Agatka"
+                    password1: "nieszczycielskiehaslo"
+                    password2: "nieszczycielskiehaslo"
+                    email: "agatka@example.com"
+                }) {
+                    username errors { field messages }
+                }
+            }""",
+            None,
+        )
+
+    @query_budget("Mutation.setProfileData", queries=8)
+    def test_set_profile_data(self, rows):
+        member = factories.UserFactory()
+        self.team.members.add(member, *factories.UserFactory.create_batch(rows))
+        return (
+            """mutation SetProfileData($userId: ID!) {
+                setProfileData(input: {userId: $userId, colorId: "red"}) {
+                    profile { imageId colorId }
+                }
+            }""",
+            {"userId": member.id},
+        )